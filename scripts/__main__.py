@@ -0,0 +1,54 @@
+"""
+Single entry point for the pipeline stages:
+
+    python -m scripts <command> [options]
+    python -m scripts compile manim --workers 8
+    python -m scripts describe --help
+
+Only the module of the chosen command is imported, so short commands do not pay for
+the OpenAI SDK, `datasets` or the render backends.
+"""
+import argparse
+import importlib
+import sys
+
+# command -> (module with a main(), description)
+COMMANDS = {
+    "import-stack": ("scripts.math_graph_importer", "Sample animation scripts of one library from The Stack"),
+    "import-animations": ("scripts.new_animation_importer", "Scan The Stack for other animation libraries"),
+    "import-slides": ("scripts.stack_importer", "Save slide decks from The Stack"),
+    "augment": ("scripts.data_augmenter", "Generate LLM variants of sampled scripts"),
+    "split-scenes": ("scripts.scene_extractor", "Split manim files into one file per scene"),
+    "compile": ("scripts.compile.compile_scripts", "Render sampled scripts"),
+    "fix": ("scripts.compile.code_fixer", "Fix failed scripts with the LLM"),
+    "clusters": ("scripts.error_clusters", "Cluster render errors"),
+    "count-errors": ("scripts.count_errors", "Estimate the tokens and cost of fixing the error logs"),
+    "normalize": ("scripts.compile.normalize_videos", "Normalize rendered videos with ffmpeg"),
+    "dedup": ("scripts.video_dedup", "Find rendered videos that show the same animation"),
+    "describe": ("scripts.description_extractor", "Describe rendered videos with batch requests"),
+    "pack": ("scripts.dataset_packer", "Pack described samples into parquet shards"),
+    "pipeline": ("scripts.pipeline", "Run the import, augment, render and describe stages concurrently"),
+    "benchmark": ("scripts.benchmark.run", "Benchmark the pipeline offline against a mock OpenAI API"),
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m scripts",
+        description="Run a pipeline stage.",
+        epilog="\n".join(f"  {name:<18} {help_text}" for name, (_, help_text) in COMMANDS.items()),
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("command", choices=list(COMMANDS), metavar="command", help="Stage to run (see below)")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help="Options of the stage")
+    args = parser.parse_args(argv)
+
+    module_name = COMMANDS[args.command][0]
+    module = importlib.import_module(module_name)
+    # the stages parse sys.argv themselves
+    sys.argv = [f"{parser.prog} {args.command}", *args.args]
+    module.main()
+
+
+if __name__ == "__main__":
+    main()
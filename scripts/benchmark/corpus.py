@@ -0,0 +1,150 @@
+"""
+Writes a synthetic Stack-style parquet corpus for the benchmark: the fixture animation
+scripts in fixtures/<library>/, each copy made unique with a comment so the content dedup
+keeps it, exact copies of earlier rows for the dedup stage to drop, and generated plain
+Python files that the library filter has to scan and reject. The same seed gives the
+same corpus, so runs are comparable.
+
+Usage
+-----
+    python -m scripts.benchmark.corpus --output corpus.parquet --examples 2000
+"""
+import argparse
+import hashlib
+import random
+from pathlib import Path
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+LIBRARIES = ("manim", "matplotlib")
+EXAMPLES = 1000
+ANIMATION_RATE = 0.2  # share of rows that are fixture scripts
+DUPLICATE_RATE = 0.05  # share of rows that repeat an earlier fixture row exactly
+SEED = 0
+
+# Plain Python files; some import matplotlib or numpy but do not animate anything.
+FILLER_TEMPLATES = [
+    '''import json
+
+
+def load_{name}(path):
+    """Reads the {name} settings from a JSON file."""
+    with open(path) as f:
+        return json.load(f)
+
+
+def {name}_total(values):
+    return sum(v * {factor} for v in values)
+''',
+    '''import matplotlib.pyplot as plt
+
+# Static plot of the {name} measurements
+values = [{values}]
+plt.plot(values)
+plt.title("{name}")
+plt.savefig("{name}.png")
+''',
+    '''import numpy as np
+
+
+class {title}:
+    """Keeps a running mean of the {name} samples."""
+
+    def __init__(self):
+        self.samples = []
+
+    def add(self, value):
+        self.samples.append(value)
+        return np.mean(self.samples) * {factor}
+''',
+]
+WORDS = ["sensor", "budget", "orbit", "invoice", "pixel", "harvest", "signal", "ledger", "voltage", "route"]
+
+
+def load_fixtures(library):
+    """
+    (name, code) of the fixture scripts of one library, in a fixed order.
+    """
+    return [(path.stem, path.read_text(encoding="utf-8")) for path in sorted((FIXTURES_DIR / library).glob("*.py"))]
+
+
+def filler_script(rng):
+    name = f"{rng.choice(WORDS)}_{rng.randrange(10_000)}"
+    return rng.choice(FILLER_TEMPLATES).format(
+        name=name,
+        title=name.title().replace("_", ""),
+        factor=rng.randint(2, 99),
+        values=", ".join(str(rng.randint(0, 100)) for _ in range(8)),
+    )
+
+
+def stack_row(code, path):
+    data = code.encode("utf-8")
+    return {
+        "hexsha": hashlib.sha1(data).hexdigest(),
+        "size": len(data),
+        "ext": "py",
+        "lang": "Python",
+        "max_stars_repo_path": path,
+        "content": code,
+    }
+
+
+def synthetic_rows(examples=EXAMPLES, animation_rate=ANIMATION_RATE, duplicate_rate=DUPLICATE_RATE,
+                   libraries=LIBRARIES, seed=SEED):
+    """
+    Yields `examples` rows with The Stack's columns in a random but seeded order.
+    """
+    rng = random.Random(seed)
+    fixtures = [(library, name, code) for library in libraries for name, code in load_fixtures(library)]
+    if not fixtures:
+        raise ValueError(f"No fixture scripts for {libraries} in {FIXTURES_DIR}")
+    animations = []
+    for i in range(examples):
+        roll = rng.random()
+        if roll < duplicate_rate and animations:
+            yield rng.choice(animations)
+        elif roll < duplicate_rate + animation_rate:
+            library, name, code = fixtures[i % len(fixtures)]
+            row = stack_row(f"{code.rstrip()}\n# copy {i}\n", f"{library}/{name}_{i}.py")
+            animations.append(row)
+            yield row
+        else:
+            yield stack_row(filler_script(rng), f"misc/file_{i}.py")
+
+
+def write_corpus(path, examples=EXAMPLES, animation_rate=ANIMATION_RATE, duplicate_rate=DUPLICATE_RATE,
+                 libraries=LIBRARIES, seed=SEED):
+    """
+    Writes the synthetic corpus to a parquet file.
+
+    Returns:
+        The path of the file.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    rows = list(synthetic_rows(examples, animation_rate, duplicate_rate, libraries, seed))
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    pq.write_table(pa.Table.from_pylist(rows), path)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a synthetic Stack-style parquet corpus.")
+    parser.add_argument("--output", type=Path, required=True, help="Parquet file to write")
+    parser.add_argument("--examples", type=int, default=EXAMPLES)
+    parser.add_argument("--animation_rate", type=float, default=ANIMATION_RATE,
+                        help="Share of rows that are fixture animation scripts")
+    parser.add_argument("--duplicate_rate", type=float, default=DUPLICATE_RATE,
+                        help="Share of rows that repeat an earlier animation row exactly")
+    parser.add_argument("--libraries", nargs="+", choices=LIBRARIES, default=list(LIBRARIES))
+    parser.add_argument("--seed", type=int, default=SEED)
+    args = parser.parse_args(argv)
+    path = write_corpus(args.output, args.examples, args.animation_rate, args.duplicate_rate, args.libraries,
+                        args.seed)
+    print(f"✅ {args.examples} rows written to {path}")
+
+
+if __name__ == "__main__":
+    main()
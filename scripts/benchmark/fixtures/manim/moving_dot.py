@@ -0,0 +1,18 @@
+from manim import *
+
+
+class MovingDot(Scene):
+    def construct(self):
+        axes = Axes(x_range=[0, 4, 1], y_range=[0, 4, 1], x_length=6, y_length=4)
+        dot = Dot(axes.c2p(0, 0), color=YELLOW)
+        self.play(Create(axes), FadeIn(dot))
+        self.play(dot.animate.move_to(axes.c2p(3, 3)))
+        self.wait(0.5)
+
+
+class GrowingArrow(Scene):
+    def construct(self):
+        arrow = Arrow(LEFT * 2, RIGHT * 2, color=RED)
+        label = Text("force").next_to(arrow, UP)
+        self.play(GrowArrow(arrow))
+        self.play(Write(label))
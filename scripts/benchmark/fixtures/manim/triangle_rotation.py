@@ -0,0 +1,9 @@
+from manim import *
+
+
+class TriangleRotation(Scene):
+    def construct(self):
+        triangle = Triangle(color=ORANGE).scale(1.5)
+        brace = Brace(triangle, DOWN)
+        self.play(Create(triangle), GrowFromCenter(brace))
+        self.play(Rotate(triangle, angle=PI), run_time=1.5)
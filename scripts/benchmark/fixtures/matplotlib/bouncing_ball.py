@@ -0,0 +1,19 @@
+import matplotlib.pyplot as plt
+from matplotlib.animation import FuncAnimation
+
+# A ball bouncing on the floor
+fig, ax = plt.subplots(figsize=(4, 3))
+ax.set_xlim(0, 10)
+ax.set_ylim(0, 5)
+ball, = ax.plot([], [], "o", markersize=12)
+
+
+def update(frame):
+    t = frame / 10
+    height = abs(4 * (1 - ((t % 2) - 1) ** 2))
+    ball.set_data([t * 1.5 % 10], [height])
+    return ball,
+
+
+ani = FuncAnimation(fig, update, frames=30, interval=50, blit=True)
+plt.show()
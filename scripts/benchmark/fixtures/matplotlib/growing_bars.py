@@ -0,0 +1,19 @@
+import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib.animation import FuncAnimation
+
+# Bars growing to their final heights
+fig, ax = plt.subplots(figsize=(4, 3))
+heights = np.array([3, 5, 2, 4, 6])
+bars = ax.bar(range(len(heights)), np.zeros(len(heights)))
+ax.set_ylim(0, 7)
+
+
+def update(frame):
+    for bar, height in zip(bars, heights):
+        bar.set_height(height * frame / 29)
+    return bars
+
+
+ani = FuncAnimation(fig, update, frames=30, interval=50)
+plt.show()
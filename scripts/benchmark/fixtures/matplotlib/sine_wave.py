@@ -0,0 +1,18 @@
+import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib.animation import FuncAnimation
+
+# A sine wave travelling to the right
+fig, ax = plt.subplots(figsize=(4, 3))
+x = np.linspace(0, 2 * np.pi, 200)
+line, = ax.plot(x, np.sin(x))
+ax.set_ylim(-1.2, 1.2)
+
+
+def update(frame):
+    line.set_ydata(np.sin(x - frame / 5))
+    return line,
+
+
+ani = FuncAnimation(fig, update, frames=30, interval=50, blit=True)
+plt.show()
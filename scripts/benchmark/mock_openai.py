@@ -0,0 +1,367 @@
+"""
+Local stand-in for the parts of the OpenAI API the pipeline uses, so it can be benchmarked
+without network access or API credits:
+
+    POST /v1/responses               canned code (a fixture script) or a canned description
+    POST /v1/files                   multipart upload of a batch input file
+    POST /v1/batches                 creates a batch over an uploaded file
+    GET  /v1/batches/{id}            completes the batch once batch_latency has passed
+    GET  /v1/files/{id}/content      batch output and error files
+
+Requests with an image get a description, all others a fenced fixture script of the
+library named in the prompt. Responses wait `latency` seconds (with jitter), and a share
+of them is refused with a 429 and a Retry-After header, like a throttled account. Point
+the SDK at it with OPENAI_BASE_URL=http://127.0.0.1:<port>/v1.
+
+Usage
+-----
+    python -m scripts.benchmark.mock_openai --port 8089 --latency 0.5 --rate_limit 0.05
+"""
+import argparse
+import itertools
+import json
+import random
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from email import policy
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from scripts.benchmark.corpus import load_fixtures
+
+CHARS_PER_TOKEN = 4
+DESCRIPTION = (
+    "The animation starts from an empty canvas. A single shape is drawn in the centre, then it "
+    "moves and changes form smoothly while the rest of the frame stays still, and it ends on "
+    "the final arrangement shown in the last frame."
+)
+
+
+@dataclass
+class MockSettings:
+    """
+    Behaviour of the mock server.
+
+    Attributes:
+        latency: Mean seconds before a /v1/responses request is answered.
+        jitter: Latency varies uniformly by this share of itself.
+        rate_limit: Share of /v1/responses requests refused with a 429.
+        retry_after: Seconds sent in the Retry-After header of a 429.
+        batch_latency: Seconds from creating a batch until it is completed.
+        batch_error_rate: Share of batch requests that end up in the error file.
+        seed: Seed of the jitter and of which requests fail.
+    """
+    latency: float = 0.5
+    jitter: float = 0.5
+    rate_limit: float = 0.05
+    retry_after: float = 1.0
+    batch_latency: float = 0.0
+    batch_error_rate: float = 0.0
+    seed: int = 0
+
+
+def request_text(body):
+    """
+    The text of a Responses request's input and whether it contains an image.
+    """
+    messages = body.get("input", "")
+    if isinstance(messages, str):
+        return messages, False
+    texts = []
+    has_image = False
+    for message in messages:
+        content = message.get("content", "")
+        if isinstance(content, str):
+            texts.append(content)
+            continue
+        for part in content:
+            if part.get("type") == "input_image":
+                has_image = True
+            elif "text" in part:
+                texts.append(part["text"])
+    return "\n".join(texts), has_image
+
+
+class CannedReplies:
+    """
+    Picks the answer to a request: the same input always gets the same fixture script.
+    """
+
+    def __init__(self):
+        self.fixtures = {library: [code for _, code in load_fixtures(library)] for library in ("manim", "matplotlib")}
+
+    def reply(self, body):
+        text, has_image = request_text(body)
+        if has_image:
+            return DESCRIPTION
+        library = "manim" if "manim" in text.lower() else "matplotlib"
+        scripts = self.fixtures[library]
+        return f"```python\n{scripts[zlib.crc32(text.encode('utf-8')) % len(scripts)]}```"
+
+
+def response_body(body, text):
+    input_tokens = len(json.dumps(body.get("input", ""))) // CHARS_PER_TOKEN
+    output_tokens = len(text) // CHARS_PER_TOKEN
+    return {
+        "id": f"resp_{random.getrandbits(64):016x}",
+        "object": "response",
+        "created_at": int(time.time()),
+        "status": "completed",
+        "model": body.get("model", "mock"),
+        "output": [{
+            "id": f"msg_{random.getrandbits(64):016x}",
+            "type": "message",
+            "role": "assistant",
+            "status": "completed",
+            "content": [{"type": "output_text", "text": text, "annotations": []}],
+        }],
+        "parallel_tool_calls": True,
+        "tool_choice": "auto",
+        "tools": [],
+        "usage": {
+            "input_tokens": input_tokens,
+            "input_tokens_details": {"cached_tokens": 0},
+            "output_tokens": output_tokens,
+            "output_tokens_details": {"reasoning_tokens": 0},
+            "total_tokens": input_tokens + output_tokens,
+        },
+    }
+
+
+def rate_limit_error():
+    return {"error": {"message": "Rate limit reached (mock server)", "type": "requests",
+                      "param": None, "code": "rate_limit_exceeded"}}
+
+
+def not_found(message):
+    return 404, {"error": {"message": message, "type": "invalid_request_error"}}, {}
+
+
+def parse_multipart(content_type, data):
+    """
+    Maps the field names of a multipart/form-data body to (filename, bytes).
+    """
+    message = BytesParser(policy=policy.HTTP).parsebytes(
+        f"Content-Type: {content_type}\r\n\r\n".encode("latin-1") + data
+    )
+    return {
+        part.get_param("name", header="content-disposition"): (part.get_filename(), part.get_payload(decode=True))
+        for part in message.iter_parts()
+    }
+
+
+class MockOpenAI:
+    """
+    The mock server's state: uploaded files, batches and request counters. Runs the HTTP
+    server on a background thread between start() and stop(), or as a context manager.
+    """
+
+    def __init__(self, settings=MockSettings(), host="127.0.0.1", port=0):
+        self.settings = settings
+        self.replies = CannedReplies()
+        self.files = {}
+        self.batches = {}
+        self.counts = {"responses": 0, "rate_limited": 0, "files": 0, "batches": 0, "batch_requests": 0}
+        self._rng = random.Random(settings.seed)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._batch_lock = threading.Lock()  # a batch is completed by one poll only
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name="mock-openai", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _new_id(self, prefix):
+        return f"{prefix}_mock{next(self._ids):06d}"
+
+    def _count(self, name, value=1):
+        with self._lock:
+            self.counts[name] += value
+
+    def _roll(self, rate):
+        with self._lock:
+            return self._rng.random() < rate
+
+    def _delay(self):
+        settings = self.settings
+        with self._lock:
+            factor = 1 + self._rng.uniform(-settings.jitter, settings.jitter)
+        return max(0.0, settings.latency * factor)
+
+    #################################
+    # Endpoints; each returns (status, payload, headers), bytes payloads are sent as is
+    def create_response(self, body):
+        time.sleep(self._delay())
+        if self._roll(self.settings.rate_limit):
+            self._count("rate_limited")
+            return 429, rate_limit_error(), {"retry-after": str(self.settings.retry_after)}
+        self._count("responses")
+        return 200, response_body(body, self.replies.reply(body)), {}
+
+    def create_file(self, fields):
+        filename, data = fields["file"]
+        purpose = fields.get("purpose", (None, b"batch"))[1].decode("utf-8")
+        file = {"id": self._new_id("file"), "object": "file", "bytes": len(data), "created_at": int(time.time()),
+                "filename": filename or "upload.jsonl", "purpose": purpose, "status": "processed"}
+        with self._lock:
+            self.files[file["id"]] = (file, data)
+        self._count("files")
+        return 200, file, {}
+
+    def file_content(self, file_id):
+        with self._lock:
+            entry = self.files.get(file_id)
+        if entry is None:
+            return not_found(f"No file {file_id}")
+        return 200, entry[1], {}
+
+    def create_batch(self, body):
+        if body.get("input_file_id") not in self.files:
+            return 400, {"error": {"message": "Unknown input_file_id", "type": "invalid_request_error"}}, {}
+        batch = {
+            "id": self._new_id("batch"), "object": "batch", "endpoint": body.get("endpoint"),
+            "input_file_id": body["input_file_id"], "completion_window": body.get("completion_window", "24h"),
+            "status": "in_progress", "created_at": int(time.time()), "output_file_id": None, "error_file_id": None,
+            "request_counts": {"total": 0, "completed": 0, "failed": 0}, "metadata": body.get("metadata") or {},
+        }
+        with self._lock:
+            self.batches[batch["id"]] = (batch, time.monotonic())
+        self._count("batches")
+        return 200, batch, {}
+
+    def retrieve_batch(self, batch_id):
+        with self._lock:
+            entry = self.batches.get(batch_id)
+        if entry is None:
+            return not_found(f"No batch {batch_id}")
+        batch, created = entry
+        with self._batch_lock:
+            if batch["status"] == "in_progress" and time.monotonic() - created >= self.settings.batch_latency:
+                self._complete(batch)
+            return 200, dict(batch), {}
+
+    def _complete(self, batch):
+        with self._lock:
+            lines = self.files[batch["input_file_id"]][1].decode("utf-8").splitlines()
+        outputs, errors = [], []
+        for line in filter(str.strip, lines):
+            request = json.loads(line)
+            result = {"id": self._new_id("batch_req"), "custom_id": request.get("custom_id"), "error": None}
+            if self._roll(self.settings.batch_error_rate):
+                result["response"] = {"status_code": 429, "request_id": self._new_id("req"), "body": rate_limit_error()}
+                errors.append(result)
+            else:
+                body = request.get("body", {})
+                result["response"] = {"status_code": 200, "request_id": self._new_id("req"),
+                                      "body": response_body(body, self.replies.reply(body))}
+                outputs.append(result)
+        self._count("batch_requests", len(outputs) + len(errors))
+        for key, results in (("output_file_id", outputs), ("error_file_id", errors)):
+            if results:
+                data = "".join(json.dumps(result) + "\n" for result in results).encode("utf-8")
+                _, file, _ = self.create_file({"file": (f"{batch['id']}_{key}.jsonl", data),
+                                               "purpose": (None, b"batch_output")})
+                batch[key] = file["id"]
+        batch["request_counts"] = {"total": len(outputs) + len(errors), "completed": len(outputs),
+                                   "failed": len(errors)}
+        batch["status"] = "completed"
+
+    def _handler_class(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status, payload, headers):
+                data = payload if isinstance(payload, bytes) else json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                content_type = "application/octet-stream" if isinstance(payload, bytes) else "application/json"
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _body(self):
+                return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+            def do_POST(self):
+                path = self.path.split("?")[0].rstrip("/")
+                data = self._body()
+                if path == "/v1/responses":
+                    self._send(*mock.create_response(json.loads(data)))
+                elif path == "/v1/files":
+                    self._send(*mock.create_file(parse_multipart(self.headers["Content-Type"], data)))
+                elif path == "/v1/batches":
+                    self._send(*mock.create_batch(json.loads(data)))
+                else:
+                    self._send(*not_found(f"No route {path}"))
+
+            def do_GET(self):
+                parts = self.path.split("?")[0].strip("/").split("/")
+                if parts[:2] == ["v1", "batches"] and len(parts) == 3:
+                    self._send(*mock.retrieve_batch(parts[2]))
+                elif parts[:2] == ["v1", "files"] and len(parts) == 4 and parts[3] == "content":
+                    self._send(*mock.file_content(parts[2]))
+                else:
+                    self._send(*not_found(f"No route {self.path}"))
+
+        return Handler
+
+
+def main(argv=None):
+    defaults = MockSettings()
+    parser = argparse.ArgumentParser(description="Serve a local stand-in of the OpenAI Responses and Batch APIs.")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=defaults.latency, help="Mean seconds per response")
+    parser.add_argument("--jitter", type=float, default=defaults.jitter, help="Latency varies by this share")
+    parser.add_argument("--rate_limit", type=float, default=defaults.rate_limit,
+                        help="Share of responses refused with a 429")
+    parser.add_argument("--retry_after", type=float, default=defaults.retry_after)
+    parser.add_argument("--batch_latency", type=float, default=defaults.batch_latency,
+                        help="Seconds until a batch is completed")
+    parser.add_argument("--batch_error_rate", type=float, default=defaults.batch_error_rate,
+                        help="Share of batch requests that fail")
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    args = parser.parse_args(argv)
+    settings = MockSettings(args.latency, args.jitter, args.rate_limit, args.retry_after, args.batch_latency,
+                            args.batch_error_rate, args.seed)
+    mock = MockOpenAI(settings, args.host, args.port)
+    print(f"🧪 Mock OpenAI API on {mock.base_url} (set OPENAI_BASE_URL to this)")
+    try:
+        mock.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        mock.server.server_close()
+        print(f"📊 {mock.counts}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+"""
+Offline end-to-end benchmark of the pipeline. Runs the real pipeline (python -m scripts
+pipeline) and the description collection against local stand-ins, so it needs no network
+and no API credits:
+
+- a synthetic Stack-style parquet corpus built from the fixture scripts (see corpus.py),
+- a local OpenAI-compatible server with canned code and descriptions, configurable latency
+  and 429 rate (see mock_openai.py), reached through OPENAI_BASE_URL,
+- a scratch workspace and LLM cache, so every run starts cold and nothing in the project
+  directory is touched.
+
+Renders use the local manim, matplotlib and ffmpeg installs, and the library filter uses
+the language model bundled with fast_langdetect (LANGDETECT_LOW_MEMORY=1) instead of
+downloading the full one.
+
+For every phase the report has the wall time, CPU time and peak memory of the process tree,
+and for every pipeline stage its item counts, throughput, latency percentiles and the CPU
+time of its threads, plus the latency of the underlying operations (LLM requests, probes,
+renders, fixes, ...). With a stored baseline, metrics that got worse by more than the
+tolerance are flagged and the command exits with status 1.
+
+Usage
+-----
+    python -m scripts benchmark --examples 500 --save_baseline
+    python -m scripts benchmark --examples 500 --latency 1.0 --rate_limit 0.1
+    python -m scripts benchmark --libraries matplotlib --baseline bench/matplotlib.json --tolerance 0.3
+"""
+import argparse
+import json
+import os
+import platform
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict
+from pathlib import Path
+
+from scripts.benchmark.corpus import ANIMATION_RATE, DUPLICATE_RATE, EXAMPLES, LIBRARIES, SEED, write_corpus
+from scripts.benchmark.mock_openai import MockOpenAI, MockSettings
+from scripts.config import PROJECT_ROOT
+from scripts.util.metrics import merge_snapshots
+
+BASELINE_PATH = Path(__file__).resolve().parent / "baseline.json"
+TOLERANCE = 0.2  # relative change that counts as a regression
+MIN_SECONDS = 0.05  # latencies and times below this are too noisy to compare
+TIMEOUT = 3600  # seconds per phase
+RENDER_WORKERS = 4
+STAGE_PREFIX = "pipeline."
+WAIT_INTERVAL = 0.1  # seconds between checks whether a phase has finished
+
+
+def run_phase(name, command, env, log_dir, timeout=TIMEOUT):
+    """
+    Runs one phase as a subprocess with its output in <log_dir>/<name>.log.
+
+    Returns:
+        Wall time, CPU time and peak RSS of the process and everything it waited for, and its exit code.
+    """
+    log_path = Path(log_dir) / f"{name}.log"
+    print(f"\n🏁 {name}: {' '.join(map(str, command))}")
+    start = time.perf_counter()
+    deadline = time.monotonic() + timeout
+    with open(log_path, "w", encoding="utf-8") as log:
+        process = subprocess.Popen(command, cwd=PROJECT_ROOT, env=env, stdout=log, stderr=subprocess.STDOUT,
+                                   start_new_session=True)
+        # wait4 gives the resource usage of this child and what it waited for, unlike
+        # getrusage(RUSAGE_CHILDREN), which also counts the earlier phases
+        while True:
+            pid, status, usage = os.wait4(process.pid, os.WNOHANG)
+            if pid:
+                break
+            if time.monotonic() > deadline:
+                print(f"⏱ {name} did not finish in {timeout}s")
+                os.killpg(process.pid, signal.SIGKILL)
+                deadline = float("inf")
+            time.sleep(WAIT_INTERVAL)
+    wall = time.perf_counter() - start
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if process.returncode != 0:
+        print(f"❌ {name} exited with {process.returncode}, see {log_path}")
+    return {
+        "exit_code": process.returncode,
+        "wall": round(wall, 3),
+        "cpu_user": round(usage.ru_utime, 3),
+        "cpu_system": round(usage.ru_stime, 3),
+        "max_rss_mb": round(usage.ru_maxrss / 1024, 1),  # ru_maxrss is in KiB on Linux
+        "log": str(log_path),
+    }
+
+
+def stage_report(summary, wall):
+    """
+    Per pipeline stage: items in, out and failed, items per second of wall time, latency
+    percentiles per item and CPU seconds of the stage's threads.
+    """
+    counters, histograms = summary["counters"], summary["histograms"]
+    stages = {}
+    for name, value in counters.items():
+        if name.startswith(STAGE_PREFIX) and name.count(".") == 2:
+            stage, field = name[len(STAGE_PREFIX):].split(".")
+            stages.setdefault(stage, {})[field] = value
+    for stage, counts in stages.items():
+        hist = histograms.get(f"{STAGE_PREFIX}{stage}", {})
+        counts["throughput"] = round(counts.get("in", 0) / wall, 3) if wall else None
+        counts["mean"] = round(hist["sum"] / hist["count"], 4) if hist.get("count") else None
+        for q in ("p50", "p95", "p99"):
+            counts[q] = hist.get(q)
+        counts["cpu"] = round(counts.get("cpu", 0.0), 3)
+    return stages
+
+
+def operation_report(summary):
+    """
+    Latency percentiles of the timed operations inside the stages (llm, probe, render, job, fix, ...).
+    """
+    return {
+        name: {"count": hist["count"], "mean": round(hist["sum"] / hist["count"], 4) if hist["count"] else None,
+               "p50": hist["p50"], "p95": hist["p95"], "p99": hist["p99"]}
+        for name, hist in sorted(summary["histograms"].items()) if not name.startswith(STAGE_PREFIX)
+    }
+
+
+def find_run_dir(workspace, library):
+    runs = sorted((Path(workspace) / "runs").glob(f"pipeline_{library}_*"))
+    return runs[-1] if runs else None
+
+
+def run_benchmark(args, work_dir):
+    corpus = write_corpus(work_dir / "corpus.parquet", args.examples, args.animation_rate, args.duplicate_rate,
+                          args.libraries, args.seed)
+    print(f"📚 {args.examples} synthetic Stack rows in {corpus}")
+    settings = MockSettings(latency=args.latency, jitter=args.jitter, rate_limit=args.rate_limit,
+                            retry_after=args.retry_after, batch_latency=args.batch_latency,
+                            batch_error_rate=args.batch_error_rate, seed=args.seed)
+
+    results = {
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "host": {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count()},
+        "settings": {"examples": args.examples, "animation_rate": args.animation_rate,
+                     "duplicate_rate": args.duplicate_rate, "libraries": args.libraries,
+                     "render_workers": args.render_workers, "no_llm": args.no_llm, "mock": asdict(settings)},
+        "phases": {},
+    }
+    with MockOpenAI(settings) as mock:
+        print(f"🧪 Mock OpenAI API on {mock.base_url}")
+        env = {
+            **os.environ,
+            "OPENAI_BASE_URL": mock.base_url,
+            "OPEN_AI_API_KEY": "mock",
+            "OPENAI_API_KEY": "mock",
+            "LLM_CACHE_PATH": str(work_dir / "llm_cache.sqlite3"),
+            "LANGDETECT_LOW_MEMORY": "1",  # the bundled model, the full one is downloaded on first use
+            "HF_HUB_OFFLINE": "1",
+            "HF_DATASETS_OFFLINE": "1",
+        }
+        env.pop("PIPELINE_RUN_DIR", None)
+        for library in args.libraries:
+            workspace = work_dir / library
+            output_dir = workspace / "output" / "description_extraction"
+            command = [sys.executable, "-m", "scripts", "pipeline", library, "--source_parquet", str(corpus),
+                       "--workspace", str(workspace), "--render_workers", str(args.render_workers),
+                       "--status_interval", "10"]
+            if args.no_llm:
+                command.append("--no_llm")
+            phase = run_phase(library, command, env, work_dir, args.timeout)
+            run_dir = find_run_dir(workspace, library)
+            summary = merge_snapshots(run_dir) if run_dir else {"counters": {}, "histograms": {}}
+            phase["stages"] = stage_report(summary, phase["wall"])
+            phase["operations"] = operation_report(summary)
+            results["phases"][library] = phase
+
+            command = [sys.executable, "-m", "scripts", "describe", "--collect", "--output_dir", str(output_dir),
+                       "--poll_interval", "1"]
+            results["phases"][f"{library}_collect"] = run_phase(f"{library}_collect", command, env, work_dir,
+                                                                args.timeout)
+        results["mock"] = dict(mock.counts)
+    return results
+
+
+def format_value(value, digits=3):
+    if value is None:
+        return "-"
+    return f"{value:.{digits}f}" if isinstance(value, float) else str(value)
+
+
+def print_report(results):
+    for name, phase in results["phases"].items():
+        print(f"\n📊 {name}: {phase['wall']:.1f}s wall, {phase['cpu_user'] + phase['cpu_system']:.1f}s CPU, "
+              f"peak RSS {phase['max_rss_mb']:.0f} MB, exit code {phase['exit_code']}")
+        if phase.get("stages"):
+            print(f"  {'stage':<10} {'in':>6} {'out':>6} {'failed':>6} {'items/s':>8} {'mean':>8} "
+                  f"{'p50':>7} {'p95':>7} {'p99':>7} {'cpu s':>8}")
+            for stage, row in phase["stages"].items():
+                print(f"  {stage:<10} {row.get('in', 0):>6} {row.get('out', 0):>6} {row.get('failed', 0):>6} "
+                      f"{format_value(row['throughput']):>8} {format_value(row['mean']):>8} "
+                      f"{format_value(row['p50']):>7} {format_value(row['p95']):>7} {format_value(row['p99']):>7} "
+                      f"{format_value(row['cpu']):>8}")
+        if phase.get("operations"):
+            print(f"  {'operation':<18} {'count':>6} {'mean':>8} {'p50':>7} {'p95':>7} {'p99':>7}")
+            for operation, row in phase["operations"].items():
+                print(f"  {operation:<18} {row['count']:>6} {format_value(row['mean']):>8} "
+                      f"{format_value(row['p50']):>7} {format_value(row['p95']):>7} {format_value(row['p99']):>7}")
+    print(f"\n🧪 Mock API: {results['mock']}")
+
+
+def comparable_metrics(results):
+    """
+    Flattens the results to {metric: (value, higher is better)} for the baseline comparison.
+    """
+    flat = {}
+    for name, phase in results["phases"].items():
+        flat[f"{name}.wall"] = (phase["wall"], False)
+        flat[f"{name}.cpu"] = (phase["cpu_user"] + phase["cpu_system"], False)
+        flat[f"{name}.max_rss_mb"] = (phase["max_rss_mb"], False)
+        for stage, row in phase.get("stages", {}).items():
+            flat[f"{name}.{stage}.throughput"] = (row["throughput"], True)
+            for q in ("p50", "p95"):
+                flat[f"{name}.{stage}.{q}"] = (row[q], False)
+        for operation, row in phase.get("operations", {}).items():
+            for q in ("p50", "p95"):
+                flat[f"{name}.{operation}.{q}"] = (row[q], False)
+    return flat
+
+
+def find_regressions(results, baseline, tolerance=TOLERANCE):
+    """
+    Metrics that are worse than in the baseline by more than `tolerance` (relative).
+
+    Returns:
+        (metric, baseline value, current value, relative change) tuples.
+    """
+    current = comparable_metrics(results)
+    regressions = []
+    for metric, (old, _) in comparable_metrics(baseline).items():
+        if metric not in current:
+            continue
+        new, higher_is_better = current[metric]
+        if not old or new is None:
+            continue
+        if not metric.endswith(("throughput", "max_rss_mb")) and max(old, new) < MIN_SECONDS:
+            continue
+        change = (new - old) / old
+        if (-change if higher_is_better else change) > tolerance:
+            regressions.append((metric, old, new, change))
+    return regressions
+
+
+def main(argv=None):
+    defaults = MockSettings()
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline offline against a mock OpenAI API.")
+    parser.add_argument("--libraries", nargs="+", choices=LIBRARIES, default=list(LIBRARIES))
+    parser.add_argument("--examples", type=int, default=EXAMPLES, help="Rows of the synthetic corpus")
+    parser.add_argument("--animation_rate", type=float, default=ANIMATION_RATE,
+                        help="Share of rows that are fixture animation scripts")
+    parser.add_argument("--duplicate_rate", type=float, default=DUPLICATE_RATE,
+                        help="Share of rows that repeat an earlier animation row")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--latency", type=float, default=defaults.latency, help="Mean seconds per mock LLM response")
+    parser.add_argument("--jitter", type=float, default=defaults.jitter)
+    parser.add_argument("--rate_limit", type=float, default=defaults.rate_limit,
+                        help="Share of mock LLM requests refused with a 429")
+    parser.add_argument("--retry_after", type=float, default=defaults.retry_after)
+    parser.add_argument("--batch_latency", type=float, default=defaults.batch_latency,
+                        help="Seconds until a mock batch completes")
+    parser.add_argument("--batch_error_rate", type=float, default=defaults.batch_error_rate)
+    parser.add_argument("--render_workers", type=int, default=RENDER_WORKERS)
+    parser.add_argument("--no_llm", action="store_true", help="Run the pipeline without LLM scene extraction and fixes")
+    parser.add_argument("--timeout", type=int, default=TIMEOUT, help="Seconds allowed per phase")
+    parser.add_argument("--work_dir", type=Path, default=None,
+                        help="Scratch directory (default: a new temporary directory)")
+    parser.add_argument("--output", type=Path, default=None, help="Also write the results as JSON here")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH, help="Results to compare against")
+    parser.add_argument("--save_baseline", action="store_true", help="Store this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE,
+                        help="Relative change of a metric that counts as a regression")
+    args = parser.parse_args(argv)
+
+    work_dir = args.work_dir or Path(tempfile.mkdtemp(prefix="pipeline_benchmark_"))
+    work_dir.mkdir(parents=True, exist_ok=True)
+    results = run_benchmark(args, work_dir.resolve())
+    print_report(results)
+    print(f"\n📁 Logs and outputs in {work_dir}")
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"💾 Baseline saved to {args.baseline}")
+        return
+    if not args.baseline.exists():
+        print(f"ℹ️ No baseline at {args.baseline}; run with --save_baseline to store one")
+        return
+
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+    if baseline.get("settings") != results["settings"]:
+        print("⚠️ The baseline was recorded with different settings; the comparison may not be meaningful")
+    regressions = find_regressions(results, baseline, args.tolerance)
+    if not regressions:
+        print(f"✅ No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+        return
+    print(f"❌ {len(regressions)} regressions against {args.baseline} (tolerance {args.tolerance:.0%}):")
+    for metric, old, new, change in regressions:
+        print(f"  {metric}: {old} -> {new} ({change:+.0%})")
+    sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,75 @@
-from openai import OpenAI
+import argparse
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 
-from scripts.config import OPEN_AI_API_KEY
+from scripts.config import LLM_MAX_CONCURRENCY, PROJECT_ROOT
+from scripts.error_clusters import iter_error_files, load_cluster_scripts, script_path
+from scripts.util.batch_jobs import file_ids, output_stems, run_batch
+from scripts.util.llm_cache import cache_key, get_llm_cache
+from scripts.util.llm_client import get_llm_client
+from scripts.util.openai_request import extract_code, record_usage, record_usage_dict, strip_code_fences
+from scripts.util.metrics import metrics
+from scripts.util.prompt_reduction import record_reduction, reduction_report, strip_code, trim_traceback
 
-client = OpenAI(
-    api_key=OPEN_AI_API_KEY
-)
+# Bump a version to invalidate cached generations after changing the template's meaning.
+FIX_PROMPT_VERSION = 1
+FIX_PROMPT = """Please generate python source code that modifies parts of the following code to create the intended diagram/visuals.
+    Ensure the code is compilable and includes only the required preamble statements.
+    If any external files are referenced, please modify the code to avoid referencing external files and include the content directly.
+    The output should consist solely of the code itself, without any supplementary text.
+    Make sure the code uses manim, instead of manimlib or manimgl.
+    Refer to the error message to see what went wrong during the initial compilation:
+
+{err_msg}\n\nCode:\n{code}"""
+
+EXTRACT_SCENE_PROMPT_VERSION = 1
+EXTRACT_SCENE_PROMPT = """Please extract the {scene_name} scene from the following manim code.
+    If there is only one scene, respond with 'No change needed'.
+    Ensure the extracted code is compilable and includes only the required preamble statements and helper methods.
+    The output should consist solely of the code itself, without any supplementary text.
+    \nCode:\n{code}"""
 
+TEMPERATURE = 0.5
+MODEL = "gpt-4.1"
 
-def fix_code(file_path: str, err_msg: str, model: str = "gpt-4.1"):
+
+def cached_generation(key, prompt, model):
+    """
+    Returns the cached code for key, or asks the model and caches its answer.
+    """
+    cached = get_llm_cache().get(key)
+    if cached is not None:
+        return cached
+    response = get_llm_client().create(
+        model=model,
+        input=[
+            {"role": "user", "content": prompt}
+        ],
+        temperature=TEMPERATURE,
+    )
+    record_usage(response.usage)
+    generated_code = extract_code(response)
+    get_llm_cache().put(key, generated_code)
+    return generated_code
+
+
+def fix_key(code, err_msg, model=MODEL):
+    return cache_key(model, FIX_PROMPT, FIX_PROMPT_VERSION, TEMPERATURE, code, err_msg)
+
+
+def reduce_fix_inputs(code, err_msg):
+    """
+    Strips comments, docstrings and dead code from the script and trims the error log
+    to the relevant frames before they are sent to the fixer.
+    """
+    reduced_code = strip_code(code)
+    trimmed = trim_traceback(err_msg)
+    record_reduction("fix", code + err_msg, reduced_code + trimmed)
+    return reduced_code, trimmed
+
+
+def fix_code(file_path: str, err_msg: str, model: str = MODEL):
     """
     Fixes the code in the given file based on the error message using OpenAI's API.
     Then writes the fixed code back to the file.
@@ -22,43 +84,125 @@ def fix_code(file_path: str, err_msg: str, model: str = "gpt-4.1"):
     with open(file_path, 'r', encoding='utf-8') as f:
         code = f.read()
 
-    prompt = f"""Please generate python source code that modifies parts of the following code to create the intended diagram/visuals. 
-    Ensure the code is compilable and includes only the required preamble statements. 
-    If any external files are referenced, please modify the code to avoid referencing external files and include the content directly. 
-    The output should consist solely of the code itself, without any supplementary text. 
-    Make sure the code uses manim, instead of manimlib or manimgl.
-    Refer to the error message to see what went wrong during the initial compilation:
-
-{err_msg}\n\nCode:\n{code}"""
+    code, err_msg = reduce_fix_inputs(code, err_msg)
+    prompt = FIX_PROMPT.format(err_msg=err_msg, code=code)
+    key = fix_key(code, err_msg, model)
+    fixed_code = cached_generation(key, prompt, model)
 
-    response = client.responses.create(
-        model=model,
-        input=[
-            {"role": "user", "content": prompt}
-        ],
-        temperature=0.5,
-    )
-
-    fixed_code = response.output_text.replace('```python', '').replace('```', '').strip()
     with open(file_path, 'w', encoding='utf-8') as f:
         f.write(fixed_code)
     print(f"Fixed code written to {file_path}")
 
-def generate_extracted_scene(code:str, scene_name:str, model: str = "gpt-4.1") -> str:
+def generate_extracted_scene(code:str, scene_name:str, model: str = MODEL) -> str:
     """
     Generates a scene from the provided code using OpenAI's API.
     """
-    prompt = f"""Please extract the {scene_name} scene from the following manim code. 
-    If there is only one scene, respond with 'No change needed'.
-    Ensure the extracted code is compilable and includes only the required preamble statements and helper methods. 
-    The output should consist solely of the code itself, without any supplementary text.
-    \nCode:\n{code}"""
-    response = client.responses.create(
-        model=model,
-        input=[
-            {"role": "user", "content": prompt}
-        ],
-        temperature=0.5,
-    )
-    extracted_code = response.output_text.replace('```python', '').replace('```', '').strip()
-    return extracted_code
\ No newline at end of file
+    prompt = EXTRACT_SCENE_PROMPT.format(scene_name=scene_name, code=code)
+    key = cache_key(model, EXTRACT_SCENE_PROMPT, EXTRACT_SCENE_PROMPT_VERSION, TEMPERATURE, code, scene_name)
+    return cached_generation(key, prompt, model)
+
+
+# ========= Bulk fixing =========
+def collect_failures(err_dir, scripts=None):
+    """
+    Maps each failing script to its error message, read from the logs in err_dir.
+    If scripts is given (e.g. from error clusters), only those scripts are returned.
+    """
+    wanted = {str(Path(p).resolve()) for p in scripts} if scripts is not None else None
+    failures = {}
+    for err_file in iter_error_files(err_dir):
+        text = err_file.read_text(encoding="utf-8", errors="replace")
+        path = script_path(text)
+        if not path or not Path(path).is_file():
+            continue
+        path = str(Path(path).resolve())
+        if wanted is not None and path not in wanted:
+            continue
+        failures.setdefault(path, text)
+    return failures
+
+
+def fix_batch(failures, output_dir, model=MODEL):
+    """
+    Fixes all failing scripts through one OpenAI batch and writes each result to
+    <output_dir>/<file>.py (<file>_<hash>.py where failing scripts share a name).
+    Cached fixes are written without being submitted.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    by_id = file_ids(failures)
+    stems = output_stems(by_id)
+    # inputs and cache keys are computed up front: a resumed batch never runs the request generator
+    inputs = {custom_id: reduce_fix_inputs(Path(path).read_text(encoding="utf-8"), failures[path])
+              for custom_id, path in by_id.items()}
+    keys = {custom_id: fix_key(code, err_msg, model) for custom_id, (code, err_msg) in inputs.items()}
+
+    def requests():
+        for custom_id, (code, err_msg) in inputs.items():
+            cached = get_llm_cache().get(keys[custom_id])
+            if cached is not None:
+                (output_dir / f"{stems[custom_id]}.py").write_text(cached, encoding="utf-8")
+                continue
+            yield custom_id, {
+                "model": model,
+                "input": [{"role": "user", "content": FIX_PROMPT.format(err_msg=err_msg, code=code)}],
+                "temperature": TEMPERATURE,
+            }
+
+    written = failed = 0
+    results = run_batch(requests(), work_dir=output_dir / "_batch", name="fix",
+                        metadata={"description": "Code fixing"})
+    for custom_id, text, usage in results:
+        if usage:
+            record_usage_dict(usage)
+        if text is None or custom_id not in by_id:
+            print(f"⚠️ No fix for {custom_id}")
+            failed += 1
+            continue
+        fixed_code = strip_code_fences(text)
+        (output_dir / f"{stems[custom_id]}.py").write_text(fixed_code, encoding="utf-8")
+        get_llm_cache().put(keys[custom_id], fixed_code)
+        written += 1
+    print(f"✅ Batch finished: {written} fixes written, {failed} failed")
+
+
+def fix_sync(failures, output_dir, model=MODEL):
+    """
+    Copies each failing script to output_dir and fixes the copy with synchronous requests.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    def fix_one(path):
+        target = output_dir / Path(path).name
+        shutil.copyfile(path, target)
+        fix_code(str(target), failures[path], model)
+
+    with ThreadPoolExecutor(max_workers=LLM_MAX_CONCURRENCY) as executor:
+        list(executor.map(fix_one, failures))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fix failing scripts with the LLM, in bulk.")
+    parser.add_argument("--mode", type=str, default="manim_scenes",
+                        help="Script folder under sampled/ and err/ (e.g. manim_scenes, matplotlib_fixed)")
+    parser.add_argument("--clusters", type=str, default=None, help="clusters.json from error_clusters.py")
+    parser.add_argument("--cluster_ids", type=int, nargs="*", default=None, help="Only fix these clusters")
+    parser.add_argument("--batch", action="store_true", help="Use the OpenAI Batch API")
+    args = parser.parse_args()
+
+    scripts = load_cluster_scripts(args.clusters, args.cluster_ids) if args.clusters else None
+    failures = collect_failures(PROJECT_ROOT / "err" / args.mode, scripts)
+    output_dir = PROJECT_ROOT / "sampled" / f"{args.mode}_fixed"
+    print(f"🔧 {len(failures)} failing scripts, writing fixes to {output_dir}")
+
+    if args.batch:
+        fix_batch(failures, output_dir)
+    else:
+        fix_sync(failures, output_dir)
+    print(f"✂️ Prompt reduction:\n{reduction_report(metrics.snapshot()['counters'])}")
+    print(get_llm_cache().report())
+
+
+if __name__ == "__main__":
+    main()
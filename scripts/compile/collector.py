@@ -0,0 +1,125 @@
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+
+MANIFEST_NAME = "manifest.jsonl"
+START_EVENT = "start"
+DONE_EVENT = "done"
+
+
+def output_name(py_file, scene=None, index=0):
+    """
+    Deterministic file name of a rendered video: the script stem, suffixed with the
+    scene name unless the stem already ends with it (scene_extractor output), and with
+    an index for additional videos produced by the same script.
+    """
+    stem = Path(py_file).stem
+    if scene and not stem.endswith(f"_{scene}"):
+        stem = f"{stem}_{scene}"
+    if index:
+        stem = f"{stem}_{index}"
+    return f"{stem}.mp4"
+
+
+def place_output(src, dest):
+    """
+    Moves a finished render to its final location. The file only appears under its final
+    name once it is complete, so readers polling the output directory never see partial files.
+    """
+    dest = Path(dest)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    part = dest.with_name(dest.name + ".part")
+    shutil.move(str(src), str(part))
+    os.replace(part, dest)
+    return dest
+
+
+class RenderCollector:
+    """
+    Registers every finished render in <output_dir>/manifest.jsonl as soon as its job completes,
+    so downstream stages can start on finished videos while the batch is still running. Each
+    collector brackets its records with start and done events carrying its run id, so followers
+    know which runs are still writing.
+    """
+
+    def __init__(self, output_dir, manifest_name=MANIFEST_NAME):
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.manifest_path = self.output_dir / manifest_name
+        self.run_id = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        self._append({"event": START_EVENT, "run": self.run_id, "time": time.time()})
+
+    def _append(self, record):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock, open(self.manifest_path, "a", encoding="utf-8") as f:
+            f.write(line)
+            f.flush()
+
+    def register(self, video_path, source_path, library, scene=None):
+        record = {
+            "video": str(Path(video_path).resolve()),
+            "source": str(Path(source_path).resolve()),
+            "library": library,
+            "scene": scene,
+            "time": time.time(),
+        }
+        self._append(record)
+        print(f"📥 Collected {video_path}")
+        return record
+
+    def close(self):
+        """
+        Marks the manifest as complete so followers stop waiting for new renders.
+        """
+        self._append({"event": DONE_EVENT, "run": self.run_id, "time": time.time()})
+
+
+def iter_manifest(manifest_path, follow=False, poll_interval=5.0):
+    """
+    Yields the render records in a manifest. With follow=True, keeps tailing the file until
+    every run that started in it has written its done event, so following the manifest of a
+    finished render run ends once its records are read. A done event also closes the runs that
+    started before its own (a renderer that was killed never writes one); done events without
+    a run id (older manifests) close every run.
+    """
+    manifest_path = Path(manifest_path)
+    while follow and not manifest_path.exists():
+        time.sleep(poll_interval)
+    if not manifest_path.exists():
+        return
+
+    open_runs = []  # in start order
+    finished = False  # the last event read closed every run
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        buffer = ""
+        while True:
+            line = f.readline()
+            if not line:
+                if not follow or finished and not buffer:
+                    return
+                time.sleep(poll_interval)
+                continue
+            buffer += line
+            if not buffer.endswith("\n"):
+                continue  # partially written line, wait for the rest
+            record = json.loads(buffer)
+            buffer = ""
+            event = record.get("event")
+            if event == START_EVENT:
+                open_runs.append(record.get("run"))
+            elif event == DONE_EVENT:
+                run = record.get("run")
+                if run is None:
+                    open_runs.clear()
+                elif run in open_runs:
+                    del open_runs[:open_runs.index(run) + 1]
+            if event:
+                finished = event == DONE_EVENT and not open_runs
+                continue
+            finished = False
+            yield record
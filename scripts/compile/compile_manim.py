@@ -1,38 +1,96 @@
+import os
+import shutil
 import subprocess
+import tempfile
 from pathlib import Path
 
+from scripts.compile.collector import place_output
+from scripts.util.metrics import metrics
+from scripts.util.process import run_captured
 
-def run_manim_script(filepath, scene_name, timeout=120, err_dir=Path("err"), retry=True):
+# Probe modes: "last_frame" skips every animation and renders only the final frame,
+# an integer N renders just the first N animations.
+PROBE_LAST_FRAME = "last_frame"
+
+
+def manim_flags(probe=None):
+    """
+    Returns the manim CLI flags for a full low-quality render or a cheap probe render.
+    """
+    if probe is None:
+        return ["-ql"]
+    if probe == PROBE_LAST_FRAME:
+        return ["-ql", "-s"]
+    return ["-ql", "-n", f"0,{int(probe)}"]
+
+
+def find_rendered_video(media_dir, scene_name):
+    """
+    Returns the finished movie for scene_name under a manim media directory, whatever the quality folder.
+    """
+    for path in Path(media_dir).rglob(f"{scene_name}.mp4"):
+        if "partial_movie_files" not in path.parts:
+            return path
+    return None
+
+
+def run_manim_script(filepath, scene_name, timeout=120, retry=True, probe=None,
+                     output_path=None, media_dir=None, limits=None):
+    """
+    Renders one scene. Every run gets its own media directory (a temporary one unless media_dir
+    is given) that also serves as its TMPDIR; when output_path is given, the finished movie is
+    moved straight there. limits (sandbox.ResourceLimits) caps the render's memory and CPU time.
+    The error is only returned; the caller (RenderEngine) writes the error log.
+
+    Returns:
+        The error message if the render failed, otherwise None.
+    """
     file_stem = Path(filepath).stem
-    err_path = Path(err_dir) / file_stem
+    owns_media_dir = media_dir is None
+    if owns_media_dir:
+        media_dir = Path(tempfile.mkdtemp(prefix=f"manim_{file_stem}_"))
+    command = ["manim", *manim_flags(probe), "--media_dir", str(media_dir), filepath, scene_name]
+
+    stage = "probe" if probe is not None else "render"
+    env = {**os.environ, "TMPDIR": str(media_dir)}
 
-    print(f"\n🎬 Running: manim -ql {filepath} {scene_name}")
+    print(f"\n🎬 Running: {' '.join(command)}")
     try:
-        result = subprocess.run(
-            [
-                "manim",
-                "-ql",  # low quality
-                filepath,
-                scene_name
-            ],
-            capture_output=True,
-            text=True,
-            encoding="utf-8",
-            timeout=timeout
-        )
-        print("✅ STDOUT:")
-        print(result.stdout)
-        print("⚠️ STDERR:")
-        print(result.stderr)
+        with metrics.timer(stage, library="manim", file=file_stem, scene=scene_name):
+            result = run_captured(limits.wrap(command) if limits else command, timeout=timeout, env=env)
 
         if result.returncode != 0:
-            err_msg = result.stderr if result.stderr is not None else "(No stderr output)"
-            err_path.write_text(f'Running: manim -ql {filepath} {scene_name}\n {err_msg}', encoding="utf-8")
+            metrics.incr(f"{stage}.failed")
+            err_msg = result.stderr or f"(No stderr output, exit code {result.returncode})"
+            print(f"⚠️ STDERR:\n{err_msg}")
             return err_msg
+        metrics.incr(f"{stage}.ok")
+
+        if output_path is not None:
+            video = find_rendered_video(media_dir, scene_name)
+            if video is None:
+                return f"manim exited successfully but no video for {scene_name} was found in {media_dir}"
+            place_output(video, output_path)
 
     except subprocess.TimeoutExpired as ex:
+        metrics.incr(f"{stage}.timeout")
         print(f"⏱ Timeout: {filepath} > {scene_name} took too long.")
         return str(ex)
     except Exception as e:
+        metrics.incr(f"{stage}.failed")
         print(f"❌ Error running Manim on {filepath}: {e}")
-        return result.stderr
+        return str(e)
+    finally:
+        if owns_media_dir:
+            shutil.rmtree(media_dir, ignore_errors=True)
+
+
+def probe_manim_script(filepath, scene_name, probe=PROBE_LAST_FRAME, timeout=30, media_dir=None, limits=None):
+    """
+    Renders only the last frame (or the first few animations) of a scene so broken
+    scripts fail in seconds instead of after a full render.
+
+    Returns:
+        The error message if the probe failed, otherwise None.
+    """
+    return run_manim_script(filepath, scene_name, timeout=timeout, probe=probe, media_dir=media_dir, limits=limits)
@@ -1,19 +1,112 @@
+import ast
 import os
 import re
 import subprocess
 import sys
+from pathlib import Path
 
-def patch_script_for_mp4(py_path, temp_path, output_mp4):
-    code = py_path.read_text(encoding="utf-8")
+from scripts.util.metrics import metrics
+from scripts.util.process import run_captured
+
+PROBE_FRAMES = 5
+
+# Inserted into probe scripts: Animation.save is replaced by _probe_save, which draws at most
+# PROBE_FRAMES frames into a writer that discards them, whatever the animation is bound to.
+PROBE_PRELUDE = """
+from matplotlib.animation import AbstractMovieWriter as _AbstractMovieWriter
+from matplotlib.animation import Animation as _Animation
+
+
+class _ProbeDone(Exception):
+    pass
+
+
+class _NullWriter(_AbstractMovieWriter):
+    def setup(self, fig, outfile, dpi=None):
+        super().setup(fig, outfile, dpi)
+        self._frames = 0
+
+    def grab_frame(self, **savefig_kwargs):
+        self.fig.canvas.draw()
+        self._frames += 1
+        if self._frames >= {max_frames}:
+            raise _ProbeDone()
 
-    # Insert backend setup at the very top
-    code = 'import matplotlib\nmatplotlib.use("Agg")\n' + code
+    def finish(self):
+        pass
+
+
+_original_save = _Animation.save
+_probed = []
+
+
+def _probe_save(self, *args, **kwargs):
+    try:
+        _original_save(self, "probe.mp4", writer=_NullWriter(fps=30))
+    except _ProbeDone:
+        pass
+    _probed.append(self)
+    print("✅ Probe passed")
+
+
+_Animation.save = _probe_save
+"""
 
-    anim_assign = re.search(r'(\w+)\s*=\s*animation\.FuncAnimation', code)
-    anim_var = anim_assign.group(1) if anim_assign else "ani"
+# Detects scripts that save their animation themselves (`ani.save(`, `self.anim.save(`, ...)
+SAVE_CALL_RE = re.compile(r'\b([A-Za-z_]\w*)\.save\s*\(')
+BACKEND_PRELUDE = 'import matplotlib\nmatplotlib.use("Agg")\n'
+
+
+def insert_prelude(code, prelude):
+    """
+    Inserts prelude after the module docstring and any `from __future__` imports, which must
+    stay at the top. Code that does not parse gets the prelude at the very top.
+    """
+    try:
+        body = ast.parse(code).body
+    except SyntaxError:
+        return prelude + code
+    end = 0
+    for index, node in enumerate(body):
+        is_docstring = (index == 0 and isinstance(node, ast.Expr) and isinstance(node.value, ast.Constant)
+                        and isinstance(node.value.value, str))
+        if not (is_docstring or isinstance(node, ast.ImportFrom) and node.module == "__future__"):
+            break
+        end = node.end_lineno
+    lines = code.splitlines(keepends=True)
+    head = "".join(lines[:end])
+    if head and not head.endswith("\n"):
+        head += "\n"
+    return head + prelude + "".join(lines[end:])
+
+
+def find_animation_var(code):
+    anim_assign = re.search(r'(\w+)\s*=\s*(?:animation\.)?(?:FuncAnimation|ArtistAnimation)\s*\(', code)
+    return anim_assign.group(1) if anim_assign else "ani"
+
+
+def patch_script_for_mp4(py_path, temp_path, output_mp4, probe_frames=None):
+    """
+    Writes a headless copy of the script to temp_path that saves its animation to output_mp4.
+    With probe_frames set, the copy instead draws at most that many frames to a null writer
+    and exits non-zero on failure, so it can be used as a quick validity check.
+    """
+    code = py_path.read_text(encoding="utf-8")
+    anim_var = find_animation_var(code)
 
     code = re.sub(r'plt\.show\s*\(\s*\)', '', code)
 
+    if probe_frames is not None:
+        prelude = PROBE_PRELUDE.replace("{max_frames}", str(int(probe_frames)))
+        code = insert_prelude(code, BACKEND_PRELUDE + prelude + "\n")
+        # scripts that never save their animation are probed through the guessed variable
+        code = code.rstrip() + f"\nif not _probed:\n    _probe_save({anim_var})\n"
+        temp_path.write_text(code, encoding="utf-8")
+        return
+
+    # Backend setup before anything else runs
+    code = insert_prelude(code, BACKEND_PRELUDE)
+
     save_code = f"""
 try:
     {anim_var}.save(r"{output_mp4}", writer='ffmpeg', fps=30)
@@ -26,25 +119,53 @@ except Exception as e:
     temp_path.write_text(code, encoding="utf-8")
 
 
-def run_matplot_script(py_path, timeout=120):
+def run_matplot_script(py_path, timeout=120, cwd=None, stage="render", limits=None):
+    """
+    Runs the script in a subprocess, optionally inside cwd so relative output paths and
+    temporary files land there. limits (sandbox.ResourceLimits) caps its memory and CPU time.
+
+    Returns:
+        The error message if the script failed or timed out, otherwise None.
+    """
     try:
 
         env = os.environ.copy()
         env["PYTHONIOENCODING"] = "utf-8"
-        result = subprocess.run(
-            [sys.executable, str(py_path)],
-            capture_output=True,
-            text=True,
-            timeout=timeout,
-            encoding="utf-8",
-            errors="replace",
-            env=env
-        )
-        print("✅ STDOUT:")
-        print(result.stdout)
-        print("⚠️ STDERR:")
-        print(result.stderr)
-    except subprocess.TimeoutExpired:
+        env["MPLBACKEND"] = "Agg"
+        if cwd is not None:
+            env["TMPDIR"] = str(cwd)
+        command = [sys.executable, str(Path(py_path).resolve())]
+        with metrics.timer(stage, library="matplotlib", file=Path(py_path).stem):
+            result = run_captured(
+                limits.wrap(command) if limits else command,
+                timeout=timeout,
+                cwd=cwd,
+                env=env
+            )
+        if result.returncode != 0:
+            metrics.incr(f"{stage}.failed")
+            print(f"⚠️ STDERR:\n{result.stderr}")
+            return result.stderr or f"(No stderr output, exit code {result.returncode})"
+        metrics.incr(f"{stage}.ok")
+    except subprocess.TimeoutExpired as ex:
+        metrics.incr(f"{stage}.timeout")
         print(f"⏱ Timeout: {py_path} took too long.")
+        return str(ex)
     except Exception as e:
+        metrics.incr(f"{stage}.failed")
         print(f"❌ Error running {py_path}: {e}")
+        return str(e)
+
+
+def probe_matplot_script(py_path, temp_path, max_frames=PROBE_FRAMES, timeout=30, limits=None):
+    """
+    Draws only the first few frames of the animation to a null writer.
+
+    Returns:
+        The error message if the probe failed, otherwise None.
+    """
+    patch_script_for_mp4(py_path, temp_path, output_mp4=None, probe_frames=max_frames)
+    try:
+        return run_matplot_script(temp_path, timeout=timeout, cwd=temp_path.parent, stage="probe", limits=limits)
+    finally:
+        temp_path.unlink(missing_ok=True)
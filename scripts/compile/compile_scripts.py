@@ -1,122 +1,103 @@
-import re
-import subprocess
+import argparse
+import os
 import sys
 import time
 from pathlib import Path
 
-from scripts.compile.code_fixer import fix_code
-from scripts.compile.rename import rename_manim_files
-
 PROJECT_ROOT = Path(__file__).resolve().parents[2]
 if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
 
-from scripts.compile.compile_matplotlib import run_matplot_script, patch_script_for_mp4
-from scripts.compile.compile_manim import run_manim_script
-from scripts.config import PY_KEYWORDS
-
-library_type = sys.argv[1] if len(sys.argv) > 1 else None
-if not library_type or library_type not in PY_KEYWORDS.keys():
-    raise ValueError(f"Invalid datatype. Choose from {PY_KEYWORDS.keys()}.")
+from scripts.compile.render_engine import BACKENDS, RenderEngine, RenderPolicy
+from scripts.compile.rule_fixer import rule_report
+from scripts.compile.sandbox import SCRATCH_ENV, ResourceLimits
+from scripts.error_clusters import load_cluster_scripts
+from scripts.util.llm_cache import disable_llm_cache, get_llm_cache
+from scripts.util.metrics import metrics
+from scripts.util.prompt_reduction import reduction_report
 
-SCRIPT_DIR = Path(__file__).parent.resolve()
-PROJECT_ROOT = SCRIPT_DIR.parent.parent
+RUNS_DIR = PROJECT_ROOT / "runs"
 
-SCRIPTS_DIR = PROJECT_ROOT / "sampled" / "manim_scenes"
-OUTPUT_DIR = PROJECT_ROOT / "rendered" / "manim_scenes"
-MANIM_MEDIA_DIR = PROJECT_ROOT / "media" / "videos"
-ERR_DIR = PROJECT_ROOT / "err" / "manim_scenes"
-Path(ERR_DIR).mkdir(parents=True, exist_ok=True)
+# Default input folder per library; outputs go to rendered/<folder> and errors to err/<folder>.
+SCRIPT_FOLDERS = {
+    "manim": "manim_scenes",
+    "matplotlib": "matplotlib_fixed",
+    "vpython": "vpython_fixed",
+}
 
 TIMEOUT = 120  # seconds
-
-
-def extract_imports(code):
-    imports = re.findall(r'^\s*(?:from\s+([a-zA-Z_][\w\.]*)|import\s+([a-zA-Z_][\w\.]*))', code, re.MULTILINE)
-    modules = {imp.split('.')[0] for pair in imports for imp in pair if imp}
-
-    # Remove known Manim-related import issue
-    modules.discard("manimlib")
-    modules.discard("manimgl")
-    modules.discard("manim_rubikscube")
-    return modules
-
-def install_dependencies(modules):
-    for mod in modules:
-        if mod in sys.stdlib_module_names:
-            continue
-        try:
-            print(f"📦 Installing: {mod}")
-            subprocess.check_call([sys.executable, "-m", "pip", "install", mod])
-        except Exception as e:
-            print(f"⚠️ Failed to install {mod}: {e}")
-
-def main():
+PROBE_TIMEOUT = 30  # seconds
+WORKERS = max(1, (os.cpu_count() or 2) // 2)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Render sampled scripts with the shared render engine.")
+    parser.add_argument("library", choices=sorted(BACKENDS), help="Library the scripts use")
+    parser.add_argument("--input_dir", type=Path, default=None, help="Directory of scripts to render")
+    parser.add_argument("--output_dir", type=Path, default=None, help="Directory for rendered videos")
+    parser.add_argument("--err_dir", type=Path, default=None, help="Directory for error logs")
+    parser.add_argument("--pattern", type=str, default="example_*.py", help="Glob for scripts in input_dir")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="Number of parallel render jobs")
+    parser.add_argument("--timeout", type=int, default=TIMEOUT, help="Seconds allowed per full render")
+    parser.add_argument("--retries", type=int, default=0, help="Extra attempts for timed out renders")
+    parser.add_argument("--no_probe", action="store_true", help="Skip the probe render")
+    parser.add_argument("--no_fix", action="store_true", help="Do not send failing scripts to the LLM fixer")
+    parser.add_argument("--no_rules", action="store_true", help="Skip the local rule-based fix tier")
+    parser.add_argument("--no_cache", action="store_true", help="Do not read or write the LLM response cache")
+    parser.add_argument("--clusters", type=Path, default=None,
+                        help="clusters.json from error_clusters.py; render/fix only the scripts it lists")
+    parser.add_argument("--cluster_ids", type=int, nargs="*", default=None,
+                        help="Restrict --clusters to these cluster ids")
+    parser.add_argument("--memory_mb", type=int, default=ResourceLimits.memory_mb,
+                        help="Address-space limit per render job in MB (0 = unlimited)")
+    parser.add_argument("--cpu_seconds", type=int, default=ResourceLimits.cpu_seconds,
+                        help="CPU time limit per render job (0 = unlimited)")
+    parser.add_argument("--scratch_dir", type=Path, default=None,
+                        help="Root for per-job scratch directories (default: /dev/shm if available)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
     start_time = time.time()
-    Path(OUTPUT_DIR).mkdir(parents=True, exist_ok=True)
-    Path(ERR_DIR).mkdir(parents=True, exist_ok=True)
-
-    py_files = list(Path(SCRIPTS_DIR).glob("example_*.py"))
-
-    for py_file in py_files:
-        try:
-            retry = True
-            fix_attempted = False
-            while retry:
-                retry = False
-
-                code = py_file.read_text(encoding="utf-8")
-
-                # Skip large files
-                if len(code.splitlines()) > 500:
-                    print(f"❌ Skipping {py_file} due to excessive lines.")
-                    break
-
-                try:
-                    modules = extract_imports(code)
-                    install_dependencies(modules)
-
-                    scene_classes = re.findall(r'class\s+([A-Za-z_][\w]*)\s*\(\s*Scene\s*\)', code)
-                    if not scene_classes:
-                        print(f"❌ No Manim scene classes found in {py_file}. Skipping.")
-                        break
-
-                    for scene in scene_classes:
-                        err = run_manim_script(str(py_file), scene, timeout=TIMEOUT, err_dir=ERR_DIR)
-                        if err:
-                            print(f"❌ Error in {py_file} for scene {scene}: {err}")
-                            err_path = ERR_DIR / f"{py_file.stem}_{scene}.txt"
-                            err_path.write_text(f"Error in {py_file} for scene {scene}:\n{err}", encoding="utf-8")
-
-                            if not fix_attempted:
-                                fix_code(py_file, err)
-                                fix_attempted = True
-                                retry = True
-                                break  # retry from top of while-loop
-                            else:
-                                print(f"🛑 Already attempted fix for {py_file}. Skipping.")
-                                break  # skip further retries
-
-                        else:
-                            print(f"✅ Successfully processed {py_file} for scene {scene}.")
-
-                except Exception as scene_exception:
-                    print(f"❌ Unexpected error in {py_file}: {scene_exception}")
-                    if not fix_attempted:
-                        fix_code(py_file, str(scene_exception))
-                        fix_attempted = True
-                        retry = True
-                    else:
-                        print(f"🛑 Already attempted fix for {py_file}. Skipping.")
-                        break
-
-        except Exception as e:
-            print(f"❌ Fatal error processing {py_file}: {e}")
-
+    metrics.configure(RUNS_DIR / f"compile_{args.library}_{time.strftime('%Y%m%d_%H%M%S')}")
+
+    if args.no_cache:
+        disable_llm_cache()
+    if args.scratch_dir:
+        os.environ[SCRATCH_ENV] = str(args.scratch_dir)
+
+    folder = SCRIPT_FOLDERS[args.library]
+    scripts_dir = args.input_dir or PROJECT_ROOT / "sampled" / folder
+    output_dir = args.output_dir or PROJECT_ROOT / "rendered" / folder
+    err_dir = args.err_dir or PROJECT_ROOT / "err" / folder
+
+    policy = RenderPolicy(
+        timeout=args.timeout,
+        probe=not args.no_probe,
+        probe_timeout=PROBE_TIMEOUT,
+        retries=args.retries,
+        fix_attempts=0 if args.no_fix else 1,
+        limits=ResourceLimits(memory_mb=args.memory_mb, cpu_seconds=args.cpu_seconds),
+        rule_fixes=not args.no_rules,
+    )
+    engine = RenderEngine(BACKENDS[args.library](), output_dir, err_dir, policy=policy, workers=args.workers)
+
+    if args.clusters:
+        py_files = [Path(path) for path in load_cluster_scripts(args.clusters, args.cluster_ids)]
+    else:
+        py_files = sorted(Path(scripts_dir).glob(args.pattern))
+    results = engine.run(py_files)
+
+    metrics.write_snapshot()
+    print(f"🔧 Rule fixes:\n{rule_report(metrics.snapshot()['counters'])}")
+    print(f"✂️ Prompt reduction:\n{reduction_report(metrics.snapshot()['counters'])}")
+    print(get_llm_cache().report())
+    failed = sum(1 for result in results if result.error)
     end_time = time.time()
-    print(f"⏰ Total time taken: {end_time - start_time:.2f} seconds, files processed: {len(py_files)}")
+    print(f"⏰ Total time taken: {end_time - start_time:.2f} seconds, files processed: {len(py_files)}, "
+          f"jobs: {len(results)}, failed: {failed}")
 
 
 if __name__ == "__main__":
     main()
-    rename_manim_files(input_dir=MANIM_MEDIA_DIR,output_dir=OUTPUT_DIR)
\ No newline at end of file
@@ -0,0 +1,56 @@
+import importlib.util
+import re
+import subprocess
+import sys
+import threading
+
+IMPORT_RE = re.compile(r'^\s*(?:from\s+([a-zA-Z_][\w\.]*)|import\s+([a-zA-Z_][\w\.]*))', re.MULTILINE)
+
+# Import roots that are never installed: manim forks we rewrite away and local modules.
+SKIPPED_MODULES = {"manimlib", "manimgl", "manim_rubikscube", "__future__"}
+
+PIP_NAME_MAP = {
+    "skimage": "scikit-image",
+    "sklearn": "scikit-learn",
+    "cv2": "opencv-python",
+    "PIL": "pillow",
+    "yaml": "PyYAML",
+    "crypto": "pycryptodome",
+}
+
+_install_lock = threading.Lock()
+_checked = set()
+
+
+def extract_imports(code):
+    """
+    Returns the set of top-level modules imported by the code.
+    """
+    imports = IMPORT_RE.findall(code)
+    modules = {imp.split('.')[0] for pair in imports for imp in pair if imp}
+    return modules - SKIPPED_MODULES
+
+
+def install_dependencies(modules):
+    """
+    pip-installs every non-stdlib module that cannot be imported yet. Each module is checked once
+    per process, and installs are serialized because concurrent pip runs corrupt site-packages.
+    """
+    for mod in sorted(modules):
+        if mod in sys.stdlib_module_names:
+            continue
+        with _install_lock:
+            if mod in _checked:
+                continue
+            _checked.add(mod)
+            try:
+                if importlib.util.find_spec(mod) is not None:
+                    continue
+            except (ImportError, ValueError):
+                pass
+            pip_pkg = PIP_NAME_MAP.get(mod, mod)
+            try:
+                print(f"📦 Installing: {pip_pkg} (import as {mod})")
+                subprocess.check_call([sys.executable, "-m", "pip", "install", pip_pkg])
+            except Exception as e:
+                print(f"⚠️ Failed to install {pip_pkg}: {e}")
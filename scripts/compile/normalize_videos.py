@@ -0,0 +1,276 @@
+"""
+Normalizes rendered videos to one resolution, frame rate and codec with a pool of local
+ffmpeg processes. Renders come out with mixed specs (manim -ql is 480p15, matplotlib
+saves at 30 fps at the figure's size), which makes frame extraction and training I/O uneven.
+
+Every output gets a <name>.meta.json sidecar with its duration, frame count and size, and
+the source's size, mtime and the spec it was encoded with. Videos whose sidecar still
+matches are skipped, so re-running only encodes new or re-rendered videos. If the input
+directory has a render manifest, the normalized videos are registered in a manifest in
+the output directory, so the description and packing stages can read them the same way.
+
+Usage
+-----
+    python scripts/compile/normalize_videos.py --input_dir rendered --output_dir rendered_normalized
+    python scripts/compile/normalize_videos.py --input_dir rendered/manim_scenes --height 720 --fps 30
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from scripts.compile.collector import MANIFEST_NAME, RenderCollector, iter_manifest
+from scripts.util.process import run_captured
+
+SIDECAR_SUFFIX = ".meta.json"
+FFMPEG_TIMEOUT = 600  # seconds
+PROBE_TIMEOUT = 30  # seconds
+PARTIAL_DIR = "partial_movie_files"
+FFMPEG_THREADS = 2  # threads per ffmpeg process; the pool runs cpu_count // FFMPEG_THREADS of them
+
+
+@dataclass(frozen=True)
+class VideoSpec:
+    """
+    Target of the normalization.
+
+    Attributes:
+        width, height: Frame size. Videos are scaled to fit, keeping their aspect ratio.
+        fps: Output frame rate. Frames are dropped or duplicated to reach it.
+        codec: ffmpeg video encoder (libx264, libx265, libvpx-vp9, libsvtav1, ...).
+        crf: Constant rate factor of the encoder; higher is smaller.
+        preset: Encoder speed preset (ignored by encoders without one).
+        pix_fmt: Output pixel format; yuv420p plays everywhere.
+        pad: Pad to exactly width x height instead of only fitting inside it.
+    """
+    width: int = 854
+    height: int = 480
+    fps: int = 15
+    codec: str = "libx264"
+    crf: int = 23
+    preset: str = "veryfast"
+    pix_fmt: str = "yuv420p"
+    pad: bool = True
+
+
+def video_filter(spec):
+    fit = (f"scale={spec.width}:{spec.height}:force_original_aspect_ratio=decrease"
+           f":force_divisible_by=2:flags=area")
+    pad = f",pad={spec.width}:{spec.height}:(ow-iw)/2:(oh-ih)/2:color=black" if spec.pad else ""
+    return f"{fit}{pad},fps={spec.fps}"
+
+
+def ffmpeg_command(src, dest, spec, threads=FFMPEG_THREADS):
+    command = [
+        "ffmpeg", "-nostdin", "-hide_banner", "-loglevel", "error", "-y",
+        "-i", str(src),
+        "-vf", video_filter(spec),
+        "-c:v", spec.codec, "-crf", str(spec.crf), "-pix_fmt", spec.pix_fmt,
+        "-threads", str(threads), "-an", "-movflags", "+faststart",
+    ]
+    if spec.preset and spec.codec in ("libx264", "libx265"):
+        command += ["-preset", spec.preset]
+    return command + ["-f", "mp4", str(dest)]
+
+
+def probe_video(path):
+    """
+    Duration, frame count and size of a video, from ffprobe. The frame count comes from
+    counting packets, which does not decode the video.
+
+    Raises:
+        ValueError: If ffprobe fails or the file has no video stream.
+    """
+    command = [
+        "ffprobe", "-v", "error", "-select_streams", "v:0", "-count_packets",
+        "-show_entries", "stream=width,height,r_frame_rate,nb_read_packets:format=duration",
+        "-of", "json", str(path),
+    ]
+    result = run_captured(command, timeout=PROBE_TIMEOUT)
+    if result.returncode != 0:
+        raise ValueError(f"ffprobe failed on {path}: {result.stderr.strip()}")
+    info = json.loads(result.stdout)
+    if not info.get("streams"):
+        raise ValueError(f"{path} has no video stream")
+    stream = info["streams"][0]
+    num, _, den = stream.get("r_frame_rate", "0/1").partition("/")
+    den = float(den or 1)
+    return {
+        "duration": float(info.get("format", {}).get("duration", 0) or 0),
+        "frames": int(stream.get("nb_read_packets", 0) or 0),
+        "width": stream.get("width"),
+        "height": stream.get("height"),
+        "fps": float(num) / den if den else 0.0,
+    }
+
+
+def sidecar_path(video_path):
+    video_path = Path(video_path)
+    return video_path.with_name(video_path.stem + SIDECAR_SUFFIX)
+
+
+def source_stamp(src):
+    stat = os.stat(src)
+    return {"path": str(Path(src).resolve()), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def is_up_to_date(src, dest, spec):
+    """
+    True if dest exists and its sidecar records the current source file and the same spec.
+    """
+    sidecar = sidecar_path(dest)
+    if not (Path(dest).exists() and sidecar.exists()):
+        return False
+    try:
+        meta = json.loads(sidecar.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return False
+    stamp = source_stamp(src)
+    source = meta.get("source", {})
+    return (source.get("size") == stamp["size"] and source.get("mtime_ns") == stamp["mtime_ns"]
+            and meta.get("spec") == asdict(spec))
+
+
+def normalize_video(src, dest, spec, threads=FFMPEG_THREADS, timeout=FFMPEG_TIMEOUT):
+    """
+    Encodes one video to the spec and writes its sidecar. The video only appears under its
+    final name once it is complete, and the sidecar is written after it.
+
+    Returns:
+        The sidecar metadata.
+
+    Raises:
+        ValueError: If ffmpeg or ffprobe fails, or on any OS error (a missing ffmpeg, a full
+            disk). No .part file is left behind.
+    """
+    dest = Path(dest)
+    part = dest.with_name(dest.name + ".part")
+    sidecar = sidecar_path(dest)
+    tmp = sidecar.with_name(sidecar.name + ".part")
+    try:
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        stamp = source_stamp(src)
+        result = run_captured(ffmpeg_command(src, part, spec, threads), timeout=timeout)
+        if result.returncode != 0:
+            raise ValueError(f"ffmpeg failed on {src}: {result.stderr.strip()}")
+        os.replace(part, dest)
+
+        meta = {**probe_video(dest), "source": stamp, "spec": asdict(spec), "time": time.time()}
+        tmp.write_text(json.dumps(meta, indent=2), encoding="utf-8")
+        os.replace(tmp, sidecar)
+        return meta
+    except subprocess.TimeoutExpired as e:
+        raise ValueError(f"{e.cmd[0]} timed out after {e.timeout}s on {src}") from e
+    except OSError as e:
+        raise ValueError(f"Normalizing {src} failed: {e}") from e
+    finally:
+        part.unlink(missing_ok=True)
+        tmp.unlink(missing_ok=True)
+
+
+def find_videos(input_dir, output_dir):
+    """
+    (source, destination) pairs for every mp4 under input_dir, mirroring its layout in output_dir.
+    """
+    input_dir, output_dir = Path(input_dir), Path(output_dir)
+    for src in sorted(input_dir.rglob("*.mp4")):
+        if PARTIAL_DIR in src.parts or output_dir.resolve() in src.resolve().parents:
+            continue  # manim's per-animation pieces, or output_dir inside input_dir
+        yield src, output_dir / src.relative_to(input_dir)
+
+
+def load_render_records(input_dir):
+    """
+    Maps resolved video paths to their render manifest records, for every manifest under input_dir.
+    """
+    records = {}
+    for manifest in Path(input_dir).rglob(MANIFEST_NAME):
+        for record in iter_manifest(manifest):
+            records[str(Path(record["video"]).resolve())] = record
+    return records
+
+
+def normalize_all(input_dir, output_dir, spec=VideoSpec(), workers=None, threads=FFMPEG_THREADS,
+                  timeout=FFMPEG_TIMEOUT, force=False):
+    """
+    Normalizes every video under input_dir that is not up to date, with `workers` ffmpeg
+    processes at a time. Newly normalized videos of a render manifest are registered in the
+    manifest of their output directory.
+
+    Returns:
+        (normalized, skipped, failed) counts.
+    """
+    if shutil.which("ffmpeg") is None or shutil.which("ffprobe") is None:
+        raise ValueError("ffmpeg and ffprobe must be on PATH")
+    workers = workers or max(1, (os.cpu_count() or 2) // threads)
+    pairs = list(find_videos(input_dir, output_dir))
+    pending = [(src, dest) for src, dest in pairs if force or not is_up_to_date(src, dest, spec)]
+    skipped = len(pairs) - len(pending)
+    print(f"🎞️ {len(pending)} videos to normalize, {skipped} up to date")
+
+    records = load_render_records(input_dir)
+    collectors = {}
+    normalized = failed = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(normalize_video, src, dest, spec, threads, timeout): (src, dest)
+                   for src, dest in pending}
+        for future in as_completed(futures):
+            src, dest = futures[future]
+            try:
+                meta = future.result()
+            except (ValueError, OSError) as e:
+                print(f"❌ {e}")
+                failed += 1
+                continue
+            normalized += 1
+            print(f"✅ {dest} ({meta['frames']} frames, {meta['duration']:.1f}s)")
+            record = records.get(str(src.resolve()))
+            if record:
+                if dest.parent not in collectors:
+                    collectors[dest.parent] = RenderCollector(dest.parent)
+                collectors[dest.parent].register(dest, record["source"], record["library"], record.get("scene"))
+    for collector in collectors.values():
+        collector.close()
+    return normalized, skipped, failed
+
+
+def main(argv=None):
+    defaults = VideoSpec()
+    parser = argparse.ArgumentParser(description="Normalize rendered videos to one resolution, frame rate and codec.")
+    parser.add_argument("--input_dir", type=Path, default=PROJECT_ROOT / "rendered")
+    parser.add_argument("--output_dir", type=Path, default=PROJECT_ROOT / "rendered_normalized")
+    parser.add_argument("--width", type=int, default=defaults.width)
+    parser.add_argument("--height", type=int, default=defaults.height)
+    parser.add_argument("--fps", type=int, default=defaults.fps)
+    parser.add_argument("--codec", type=str, default=defaults.codec, help="ffmpeg video encoder")
+    parser.add_argument("--crf", type=int, default=defaults.crf)
+    parser.add_argument("--preset", type=str, default=defaults.preset)
+    parser.add_argument("--no_pad", action="store_true", help="Only fit inside width x height, do not pad")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Parallel ffmpeg processes (default: cpu_count // --threads)")
+    parser.add_argument("--threads", type=int, default=FFMPEG_THREADS, help="Threads per ffmpeg process")
+    parser.add_argument("--timeout", type=int, default=FFMPEG_TIMEOUT, help="Seconds allowed per video")
+    parser.add_argument("--force", action="store_true", help="Re-encode videos that are up to date")
+    args = parser.parse_args(argv)
+
+    spec = VideoSpec(width=args.width, height=args.height, fps=args.fps, codec=args.codec, crf=args.crf,
+                     preset=args.preset, pad=not args.no_pad)
+    start_time = time.time()
+    normalized, skipped, failed = normalize_all(args.input_dir, args.output_dir, spec, args.workers,
+                                                args.threads, args.timeout, args.force)
+    print(f"⏰ Normalized {normalized} videos in {time.time() - start_time:.2f} seconds, "
+          f"{skipped} up to date, {failed} failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,10 @@ import re
 
 
 def rename_manim_files(input_dir='./media/videos', output_dir ='./rendered'):
+    """
+    Moves renders out of a legacy shared manim media directory. New renders are placed directly
+    in their final location by run_manim_script; this is only needed for older media trees.
+    """
     # Directories
     os.makedirs(output_dir, exist_ok=True)
 
@@ -15,24 +19,22 @@ def rename_manim_files(input_dir='./media/videos', output_dir ='./rendered'):
 
         example_name = entry
         example_index = match.group(1)
-        source_dir = os.path.join(input_dir, example_name, '480p15')
+        example_dir = os.path.join(input_dir, example_name)
 
-        if not os.path.exists(source_dir):
-            print(f"Skipping missing directory: {source_dir}")
+        # One folder per quality setting, e.g. 480p15 for -ql or 1080p60 for -qh
+        quality_dirs = [d for d in os.listdir(example_dir) if os.path.isdir(os.path.join(example_dir, d))]
+        if not quality_dirs:
+            print(f"Skipping directory without renders: {example_dir}")
             continue
 
-        mp4_files = [f for f in os.listdir(source_dir) if f.lower().endswith('.mp4')]
+        for quality_dir in quality_dirs:
+            source_dir = os.path.join(example_dir, quality_dir)
+            mp4_files = [f for f in os.listdir(source_dir) if f.lower().endswith('.mp4')]
 
-        for j, filename in enumerate(mp4_files):
-            old_path = os.path.join(source_dir, filename)
-            new_filename = f'example_{example_index}_{filename}'
-            new_path = os.path.join(source_dir, new_filename)
+            for filename in mp4_files:
+                old_path = os.path.join(source_dir, filename)
+                new_filename = f'example_{example_index}_{filename}'
+                final_path = os.path.join(output_dir, new_filename)
 
-            # Rename
-            os.rename(old_path, new_path)
-            print(f"Renamed: {old_path} -> {new_path}")
-
-            # Move
-            final_path = os.path.join(output_dir, new_filename)
-            shutil.move(new_path, final_path)
-            print(f"Moved: {new_path} -> {final_path}")
+                shutil.move(old_path, final_path)
+                print(f"Moved: {old_path} -> {final_path}")
@@ -0,0 +1,296 @@
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from scripts.compile.code_fixer import fix_code
+from scripts.compile.collector import RenderCollector, output_name, place_output
+from scripts.compile.compile_manim import run_manim_script, probe_manim_script
+from scripts.compile.compile_matplotlib import (
+    SAVE_CALL_RE, patch_script_for_mp4, probe_matplot_script, run_matplot_script
+)
+from scripts.compile.dependencies import extract_imports, install_dependencies
+from scripts.compile.rule_fixer import apply_rule_fix, find_rule_fix, record_rule_outcome
+from scripts.compile.sandbox import ResourceLimits, scratch_dir
+from scripts.util.metrics import metrics
+
+SCENE_CLASS_RE = re.compile(
+    r'class\s+([A-Za-z_][\w]*)\s*\(\s*'
+    r'(?:Scene|ThreeDScene|MovingCameraScene|ZoomedScene|VectorScene|LinearTransformationScene)\s*\)'
+)
+
+
+@dataclass
+class RenderJob:
+    script: Path
+    library: str
+    scene: str = None
+
+    @property
+    def name(self):
+        return f"{self.script.stem}:{self.scene}" if self.scene else self.script.stem
+
+
+@dataclass
+class RenderPolicy:
+    """
+    Timeout and retry policy shared by all backends.
+
+    Attributes:
+        timeout: Seconds allowed for a full render.
+        probe: Run a cheap probe render first and only do the full render if it passes.
+        probe_timeout: Seconds allowed for a probe render.
+        retries: Extra attempts for renders that timed out.
+        fix_attempts: How often a failing script is sent to the fixer before giving up.
+        install_dependencies: pip-install missing imports before rendering.
+        limits: rlimits applied to every probe and render process.
+        rule_fixes: Try the local rewrite rules (rule_fixer.py) before the LLM fixer.
+        max_rule_fixes: Most rule rewrites applied to one script.
+    """
+    timeout: int = 120
+    probe: bool = True
+    probe_timeout: int = 30
+    retries: int = 0
+    fix_attempts: int = 1
+    install_dependencies: bool = True
+    limits: ResourceLimits = field(default_factory=ResourceLimits)
+    rule_fixes: bool = True
+    max_rule_fixes: int = 3
+
+
+@dataclass
+class RenderResult:
+    job: RenderJob
+    outputs: list = field(default_factory=list)
+    error: str = None
+
+
+class Backend:
+    """
+    Knows how to find the renderable jobs in a script and how to probe and render one job.
+    A backend writes its outputs into the job directory; the engine moves them to the output layout.
+    """
+    library = None
+    max_lines = None  # scripts longer than this are skipped
+
+    def discover_jobs(self, script, code):
+        return [RenderJob(script, self.library)]
+
+    def probe(self, job, job_dir, policy, err_dir):
+        return None
+
+    def render(self, job, job_dir, policy, err_dir):
+        """
+        Returns:
+            (list of produced video paths, error message or None)
+        """
+        raise NotImplementedError
+
+
+class ManimBackend(Backend):
+    library = "manim"
+    max_lines = 500
+
+    def discover_jobs(self, script, code):
+        return [RenderJob(script, self.library, scene) for scene in SCENE_CLASS_RE.findall(code)]
+
+    def probe(self, job, job_dir, policy, err_dir):
+        return probe_manim_script(str(job.script), job.scene, timeout=policy.probe_timeout, media_dir=job_dir,
+                                  limits=policy.limits)
+
+    def render(self, job, job_dir, policy, err_dir):
+        output_path = Path(job_dir) / output_name(job.script, job.scene)
+        err = run_manim_script(str(job.script), job.scene, timeout=policy.timeout, output_path=output_path,
+                               media_dir=Path(job_dir) / "media", limits=policy.limits)
+        return ([] if err else [output_path]), err
+
+
+class ScriptBackend(Backend):
+    """
+    Runs the script itself inside the job directory and collects every MP4 it writes there.
+    """
+
+    def render(self, job, job_dir, policy, err_dir):
+        err = run_matplot_script(job.script, policy.timeout, cwd=job_dir, limits=policy.limits)
+        if err:
+            return [], err
+        videos = sorted(Path(job_dir).rglob("*.mp4"))
+        if not videos:
+            return [], f"{job.script.name} finished without writing an MP4."
+        return videos, None
+
+
+class MatplotlibBackend(ScriptBackend):
+    """
+    Augmented scripts save their own animation; scripts without a save call are patched to
+    save headlessly into the job directory.
+    """
+    library = "matplotlib"
+
+    def probe(self, job, job_dir, policy, err_dir):
+        return probe_matplot_script(job.script, Path(job_dir) / f"{job.script.stem}_probe.py",
+                                    timeout=policy.probe_timeout, limits=policy.limits)
+
+    def render(self, job, job_dir, policy, err_dir):
+        code = job.script.read_text(encoding="utf-8")
+        if SAVE_CALL_RE.search(code):
+            return super().render(job, job_dir, policy, err_dir)
+
+        patched = Path(job_dir) / job.script.name
+        patch_script_for_mp4(job.script, patched, output_mp4=Path(job_dir) / f"{job.script.stem}.mp4")
+        return super().render(RenderJob(patched, job.library, job.scene), job_dir, policy, err_dir)
+
+
+class VPythonBackend(ScriptBackend):
+    """
+    VPython has no movie writer of its own; augmented scripts are prompted to export their MP4,
+    so the script is run as-is and whatever it writes is collected.
+    """
+    library = "vpython"
+
+
+BACKENDS = {
+    "manim": ManimBackend,
+    "matplotlib": MatplotlibBackend,
+    "vpython": VPythonBackend,
+}
+
+
+class RenderEngine:
+    """
+    Renders scripts with one backend on a shared worker pool. Every job runs in its own
+    RAM-backed scratch directory (see sandbox.scratch_root) under per-job rlimits; only the
+    finished videos are moved out, to output_dir under deterministic names, and registered
+    with the collector. Errors go to err_dir/<job>.txt. Scratch is removed after each attempt.
+    """
+
+    def __init__(self, backend, output_dir, err_dir, policy=None, workers=4, fixer=fix_code):
+        self.backend = backend
+        self.output_dir = Path(output_dir)
+        self.err_dir = Path(err_dir)
+        self.policy = policy or RenderPolicy()
+        self.workers = workers
+        self.fixer = fixer
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.err_dir.mkdir(parents=True, exist_ok=True)
+        self.collector = RenderCollector(self.output_dir)
+
+    def _write_error(self, job, err):
+        suffix = f"_{job.scene}" if job.scene else ""
+        err_path = self.err_dir / f"{job.script.stem}{suffix}.txt"
+        err_path.write_text(f"Error in {job.script} for {job.name}:\n{err}", encoding="utf-8")
+
+    def run_job(self, job):
+        """
+        Probes and renders one job, retrying timeouts according to the policy.
+        """
+        result = RenderResult(job)
+        for attempt in range(self.policy.retries + 1):
+            with scratch_dir(prefix=f"render_{job.script.stem}_") as job_dir:
+                with metrics.timer("job", library=job.library, job=job.name, attempt=attempt):
+                    err = self.backend.probe(job, job_dir, self.policy, self.err_dir) if self.policy.probe else None
+                    if not err:
+                        videos, err = self.backend.render(job, job_dir, self.policy, self.err_dir)
+                        for index, video in enumerate(videos):
+                            output_path = self.output_dir / output_name(job.script, job.scene, index)
+                            place_output(video, output_path)
+                            self.collector.register(output_path, job.script, job.library, job.scene)
+                            result.outputs.append(output_path)
+            result.error = err
+            if not err or "timed out" not in err:
+                break
+        return result
+
+    def fix(self, script, failed, tried_rules):
+        """
+        Fixes a failing script: first with a local rewrite rule, then with the LLM fixer.
+
+        Returns:
+            "rule:<name>" or "llm" for the tier that was used, or None if nothing was left to try.
+        """
+        if self.policy.rule_fixes and len(tried_rules) < self.policy.max_rule_fixes:
+            rule_name = apply_rule_fix(script, failed.error, exclude=tried_rules)
+            if rule_name:
+                tried_rules.add(rule_name)
+                return f"rule:{rule_name}"
+        if self.fixer is None:
+            return None
+        with metrics.timer("fix", file=script.stem):
+            self.fixer(script, failed.error)
+        return "llm"
+
+    def render_file(self, script):
+        """
+        Renders every job of one script. When a job fails, the script goes through the fix
+        tiers (local rules, then the LLM fixer) and the jobs that have not succeeded yet are
+        rendered again. Rule fixes do not count against policy.fix_attempts.
+        """
+        script = Path(script)
+        results = {}
+        tried_rules = set()
+        llm_fixes = 0
+        pending = None  # (fix tier, name of the job that failed before the fix)
+        while True:
+            code = script.read_text(encoding="utf-8")
+            if self.backend.max_lines and len(code.splitlines()) > self.backend.max_lines:
+                print(f"❌ Skipping {script} due to excessive lines.")
+                break
+            if self.policy.install_dependencies:
+                install_dependencies(extract_imports(code))
+
+            jobs = [job for job in self.backend.discover_jobs(script, code)
+                    if job.name not in results or results[job.name].error]
+            if not jobs and not results:
+                print(f"❌ No {self.backend.library} jobs found in {script}. Skipping.")
+                break
+
+            failed = None
+            for job in jobs:
+                result = results[job.name] = self.run_job(job)
+                if result.error:
+                    print(f"❌ Error in {job.name}: {result.error}")
+                    self._write_error(job, result.error)
+                    failed = result
+                    break
+                print(f"✅ Successfully rendered {job.name}.")
+
+            if pending and pending[0].startswith("rule:"):
+                fixed_job = results.get(pending[1])
+                record_rule_outcome(pending[0][len("rule:"):], fixed_job is not None and not fixed_job.error)
+            pending = None
+
+            if failed is None:
+                break
+            if llm_fixes >= self.policy.fix_attempts and not (
+                    self.policy.rule_fixes and find_rule_fix(code, failed.error, exclude=tried_rules)):
+                print(f"🛑 Already attempted fix for {script}. Skipping.")
+                break
+            tier = self.fix(script, failed, tried_rules)
+            if tier is None:
+                break
+            if tier == "llm":
+                llm_fixes += 1
+            pending = (tier, failed.job.name)
+        return list(results.values())
+
+    def run(self, scripts):
+        """
+        Renders all scripts on the worker pool and returns their results.
+        """
+        results = []
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                futures = {executor.submit(self.render_file, script): script for script in scripts}
+                for future in as_completed(futures):
+                    try:
+                        file_results = future.result()
+                    except Exception as e:
+                        print(f"❌ Fatal error processing {futures[future]}: {e}")
+                        continue
+                    results.extend(file_results)
+                    for result in file_results:
+                        metrics.incr("jobs.failed" if result.error else "jobs.ok")
+        finally:
+            # followers of the manifest stop waiting even if the run is interrupted
+            self.collector.close()
+        return results
@@ -0,0 +1,284 @@
+import ast
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+
+from scripts.util.metrics import metrics
+
+# Old manimlib / manim 0.x names and their manim community equivalents. Animations whose
+# behaviour changed (e.g. ShowCreationThenDestruction) are left to the LLM fixer.
+RENAMED_MANIM_API = {
+    "ShowCreation": "Create",
+    "TextMobject": "Text",
+    "TexMobject": "MathTex",
+    "TexText": "Tex",
+    "OldTex": "Tex",
+    "OldTexText": "Tex",
+}
+
+# Old directional fades -> (replacement, default direction, shift is the negated direction).
+# FadeInFrom(mob, DOWN) starts below and moves up, i.e. FadeIn(mob, shift=-DOWN);
+# FadeOutAndShift(mob, DOWN) moves down, i.e. FadeOut(mob, shift=DOWN).
+SHIFTED_FADES = {
+    "FadeInFrom": ("FadeIn", "DOWN", True),
+    "FadeInFromDown": ("FadeIn", "DOWN", True),
+    "FadeOutAndShift": ("FadeOut", "DOWN", False),
+    "FadeOutAndShiftDown": ("FadeOut", "DOWN", False),
+}
+
+MANIM_FORKS = {"manimlib", "manimgl", "big_ol_pile_of_manim_imports"}
+
+# Placeholders for external assets that are not shipped with the sampled scripts.
+ASSET_PLACEHOLDERS = {
+    "ImageMobject": "Rectangle(width=4, height=3)",
+    "SVGMobject": "Square()",
+}
+
+NAME_ERROR_RE = re.compile(r"NameError: name '(\w+)' is not defined")
+_FORKS = "|".join(sorted(MANIM_FORKS))
+# A missing fork module, an import/attribute error naming one, or a traceback frame inside one
+# (manimlib itself may be installed).
+FORK_IMPORT_ERROR_RE = re.compile(
+    rf"No module named '(?:{_FORKS})\b"
+    rf"|(?:ImportError|AttributeError)\b[^\n]*'(?:{_FORKS})\b"
+    rf"|[/\\](?:{_FORKS})[/\\]"
+)
+DISPLAY_ERROR_RE = re.compile(
+    r"(TclError|no display name|cannot connect to X server|Could not connect to display|"
+    r"could not connect to display|Qt platform plugin)"
+)
+MISSING_ASSET_RE = re.compile(r"(FileNotFoundError|could not find|No such file or directory|not found at)", re.I)
+NO_OUTPUT_RE = re.compile(r"finished without writing an MP4")
+
+
+def replace_segments(code, replacements):
+    """
+    Applies ((lineno, col, end_lineno, end_col), text) replacements using ast positions.
+    ast columns are UTF-8 byte offsets, so the splicing is done on encoded lines.
+    """
+    lines = code.encode("utf-8").splitlines(keepends=True)
+    for (lineno, col, end_lineno, end_col), text in sorted(replacements, key=lambda r: r[0], reverse=True):
+        start = lines[lineno - 1][:col]
+        end = lines[end_lineno - 1][end_col:]
+        lines[lineno - 1:end_lineno] = [start + text.encode("utf-8") + end]
+    return b"".join(lines).decode("utf-8")
+
+
+def node_span(node):
+    return node.lineno, node.col_offset, node.end_lineno, node.end_col_offset
+
+
+def insertion_line(tree):
+    """
+    First line after the module docstring and __future__ imports, where new imports can go.
+    """
+    line = 0
+    for node in tree.body:
+        is_docstring = isinstance(node, ast.Expr) and isinstance(getattr(node, "value", None), ast.Constant) \
+            and isinstance(node.value.value, str) and line == 0
+        is_future = isinstance(node, ast.ImportFrom) and node.module == "__future__"
+        if not (is_docstring or is_future):
+            break
+        line = node.end_lineno
+    return line
+
+
+def insert_lines(code, line, text):
+    lines = code.splitlines(keepends=True)
+    lines[line:line] = [text if text.endswith("\n") else text + "\n"]
+    return "".join(lines)
+
+
+# ========= Rules =========
+def fix_manim_fork_imports(code, tree, err_msg):
+    """
+    Replaces manimlib / manimgl imports with `from manim import *`.
+    """
+    replacements = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            roots = {alias.name.split(".")[0] for alias in node.names}
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            roots = {node.module.split(".")[0]}
+        else:
+            continue
+        if roots & MANIM_FORKS:
+            text = "from manim import *" if not replacements else ""
+            replacements.append((node_span(node), text))
+    return replace_segments(code, replacements) if replacements else None
+
+
+def shifted_fade(code, call):
+    """
+    Source of the manim CE call replacing an old directional fade call: the direction, given
+    positionally or as direction=, becomes shift=. None if the call cannot be rewritten safely.
+    """
+    name, default_direction, negate = SHIFTED_FADES[call.func.id]
+    if not call.args or any(isinstance(arg, ast.Starred) for arg in call.args) or len(call.args) > 2:
+        return None
+    kwargs = [kw for kw in call.keywords if kw.arg != "direction"]
+    if any(kw.arg is None or kw.arg == "shift" for kw in kwargs):
+        return None
+    directions = [ast.get_source_segment(code, kw.value) for kw in call.keywords if kw.arg == "direction"]
+    if len(call.args) == 2:
+        directions.append(ast.get_source_segment(code, call.args[1]))
+    if len(directions) > 1:
+        return None
+    direction = directions[0] if directions else default_direction
+    shift = (f"-{direction}" if direction.isidentifier() else f"-({direction})") if negate else direction
+    arguments = [ast.get_source_segment(code, call.args[0]), f"shift={shift}"]
+    arguments += [f"{kw.arg}={ast.get_source_segment(code, kw.value)}" for kw in kwargs]
+    return f"{name}({', '.join(arguments)})"
+
+
+def fix_renamed_api(code, tree, err_msg):
+    """
+    Renames old manim classes (ShowCreation, TextMobject, ...) to their current names and
+    rewrites the old directional fades (FadeInFrom, FadeOutAndShift, ...) to FadeIn / FadeOut
+    with shift=.
+    """
+    match = NAME_ERROR_RE.search(err_msg)
+    if match and match.group(1) not in RENAMED_MANIM_API and match.group(1) not in SHIFTED_FADES:
+        return None
+    renames = [
+        (node_span(node), RENAMED_MANIM_API[node.id])
+        for node in ast.walk(tree)
+        if isinstance(node, ast.Name) and node.id in RENAMED_MANIM_API
+    ]
+    fixed = replace_segments(code, renames) if renames else code
+    tree = ast.parse(fixed) if renames else tree
+
+    fade_calls = [node for node in ast.walk(tree)
+                  if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in SHIFTED_FADES]
+    fade_names = sum(isinstance(node, ast.Name) and node.id in SHIFTED_FADES for node in ast.walk(tree))
+    if fade_names > len(fade_calls):
+        return None  # a fade class used other than by calling it; leave the script to the LLM fixer
+    if any(inner in fade_calls for call in fade_calls for inner in ast.walk(call) if inner is not call):
+        return None  # nested fades
+    fades = []
+    for call in fade_calls:
+        text = shifted_fade(fixed, call)
+        if text is None:
+            return None
+        fades.append((node_span(call), text))
+    if fades:
+        fixed = replace_segments(fixed, fades)
+    return fixed if renames or fades else None
+
+
+def fix_headless_backend(code, tree, err_msg):
+    """
+    Forces the non-interactive Agg backend for scripts that try to open a window.
+    """
+    if re.search(r'matplotlib\.use\(\s*["\']Agg["\']', code):
+        return None
+    return insert_lines(code, insertion_line(tree), 'import matplotlib\nmatplotlib.use("Agg")')
+
+
+def fix_missing_output(code, tree, err_msg):
+    """
+    Makes a matplotlib animation write its MP4 into the working directory: save calls with a
+    directory in the path are reduced to the file name, and a save call is added if there is none.
+    """
+    anim_vars = []
+    replacements = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Assign) and isinstance(node.value, ast.Call):
+            func = node.value.func
+            name = func.attr if isinstance(func, ast.Attribute) else getattr(func, "id", None)
+            if name in ("FuncAnimation", "ArtistAnimation"):
+                anim_vars += [t.id for t in node.targets if isinstance(t, ast.Name)]
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr == "save" \
+                and node.args and isinstance(node.args[0], ast.Constant) and isinstance(node.args[0].value, str):
+            path = node.args[0].value
+            if path.endswith(".mp4") and Path(path).name != path:
+                replacements.append((node_span(node.args[0]), repr(Path(path).name)))
+    if replacements:
+        return replace_segments(code, replacements)
+    if not anim_vars or re.search(rf"\b{anim_vars[0]}\.save\s*\(", code):
+        return None
+    return code.rstrip() + f'\n{anim_vars[0]}.save("animation.mp4", writer="ffmpeg", fps=30)\n'
+
+
+def fix_external_assets(code, tree, err_msg):
+    """
+    Replaces ImageMobject / SVGMobject calls that load files with simple placeholder shapes.
+    """
+    replacements = [
+        (node_span(node), ASSET_PLACEHOLDERS[node.func.id])
+        for node in ast.walk(tree)
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in ASSET_PLACEHOLDERS
+    ]
+    return replace_segments(code, replacements) if replacements else None
+
+
+@dataclass
+class Rule:
+    name: str
+    signature: re.Pattern
+    apply: Callable
+
+
+# Checked in order; the first rule whose signature matches the error and that changes the code wins.
+RULES = [
+    Rule("manim_fork_imports", FORK_IMPORT_ERROR_RE, fix_manim_fork_imports),
+    Rule("renamed_manim_api", NAME_ERROR_RE, fix_renamed_api),
+    Rule("headless_backend", DISPLAY_ERROR_RE, fix_headless_backend),
+    Rule("missing_output", NO_OUTPUT_RE, fix_missing_output),
+    Rule("external_assets", MISSING_ASSET_RE, fix_external_assets),
+]
+
+
+def find_rule_fix(code, err_msg, exclude=()):
+    """
+    Returns (rule name, fixed code) for the first matching rule, or None if no rule applies.
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return None
+    for rule in RULES:
+        if rule.name in exclude or not rule.signature.search(err_msg):
+            continue
+        fixed = rule.apply(code, tree, err_msg)
+        if fixed is not None and fixed != code:
+            return rule.name, fixed
+    return None
+
+
+def apply_rule_fix(file_path, err_msg, exclude=()):
+    """
+    Rewrites the file with the first matching rule and returns the rule name, or None if
+    no rule matched and the error has to go to the LLM fixer.
+    """
+    file_path = Path(file_path)
+    code = file_path.read_text(encoding="utf-8")
+    with metrics.timer("rule_fix", file=file_path.stem):
+        found = find_rule_fix(code, err_msg, exclude)
+    if found is None:
+        metrics.incr("rule.no_match")
+        return None
+    rule_name, fixed = found
+    file_path.write_text(fixed, encoding="utf-8")
+    metrics.incr(f"rule.{rule_name}.fired")
+    print(f"🔧 Applied rule '{rule_name}' to {file_path}")
+    return rule_name
+
+
+def record_rule_outcome(rule_name, succeeded):
+    metrics.incr(f"rule.{rule_name}.{'succeeded' if succeeded else 'failed'}")
+
+
+def rule_report(counters):
+    """
+    Formats fired / succeeded counts per rule from a metrics counters dict.
+    """
+    lines = []
+    for rule in RULES:
+        fired = counters.get(f"rule.{rule.name}.fired", 0)
+        succeeded = counters.get(f"rule.{rule.name}.succeeded", 0)
+        if fired:
+            lines.append(f"{rule.name}: fired {fired}, succeeded {succeeded} ({succeeded / fired:.0%})")
+    lines.append(f"no rule matched: {counters.get('rule.no_match', 0)}")
+    return "\n".join(lines)
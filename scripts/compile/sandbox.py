@@ -0,0 +1,77 @@
+import os
+import shutil
+import sys
+import tempfile
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+
+SCRATCH_ENV = "RENDER_SCRATCH_DIR"
+SHM_DIR = Path("/dev/shm")
+
+# Applies the limits in the child and then execs the real command, so no preexec_fn is needed
+# (preexec_fn is unsafe when the parent runs several render threads).
+LAUNCHER = """
+import os, resource, sys
+memory, cpu, fsize = (int(v) for v in sys.argv[1:4])
+for limit, value in ((resource.RLIMIT_AS, memory), (resource.RLIMIT_CPU, cpu), (resource.RLIMIT_FSIZE, fsize)):
+    if value > 0:
+        resource.setrlimit(limit, (value, value))
+os.execvp(sys.argv[4], sys.argv[4:])
+"""
+
+
+def scratch_root():
+    """
+    RAM-backed /dev/shm when available, otherwise the regular temp directory.
+    Can be overridden with the RENDER_SCRATCH_DIR environment variable.
+    """
+    if os.environ.get(SCRATCH_ENV):
+        return Path(os.environ[SCRATCH_ENV])
+    if SHM_DIR.is_dir() and os.access(SHM_DIR, os.W_OK):
+        return SHM_DIR
+    return Path(tempfile.gettempdir())
+
+
+@contextmanager
+def scratch_dir(prefix="render_"):
+    """
+    Creates a private scratch directory for one job and removes it afterwards, whatever happened.
+    """
+    root = scratch_root()
+    root.mkdir(parents=True, exist_ok=True)
+    path = Path(tempfile.mkdtemp(prefix=prefix, dir=root))
+    try:
+        yield path
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+@dataclass
+class ResourceLimits:
+    """
+    Per-job rlimits. A value of 0 leaves that limit unset.
+
+    Attributes:
+        memory_mb: Address-space limit of the render process and its children (e.g. ffmpeg).
+        cpu_seconds: CPU time limit; the kernel kills the job when it is exceeded.
+        file_size_mb: Largest file the job may write.
+    """
+    memory_mb: int = 4096
+    cpu_seconds: int = 600
+    file_size_mb: int = 2048
+
+    def wrap(self, command):
+        """
+        Returns the command prefixed with a launcher that applies the limits before exec.
+        Limits are not available on Windows, where the command is returned unchanged.
+        """
+        if os.name != "posix":
+            return list(command)
+        return [
+            sys.executable, "-c", LAUNCHER,
+            str(self.memory_mb * 1024 * 1024),
+            str(self.cpu_seconds),
+            str(self.file_size_mb * 1024 * 1024),
+            *[str(part) for part in command],
+        ]
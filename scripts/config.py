@@ -1,11 +1,16 @@
 import os
+from pathlib import Path
 
 from dotenv import load_dotenv
-from setuptools.package_index import EXTENSIONS
 
 load_dotenv()
 
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
 ACCEPTED_LANGUAGES = ["EN", "JA"]
+# The full fastText model of fast_langdetect is downloaded on first use; set
+# LANGDETECT_LOW_MEMORY=1 to use the smaller model bundled with the package instead.
+LANGDETECT_LOW_MEMORY = os.getenv("LANGDETECT_LOW_MEMORY", "0") == "1"
 
 # filter keywords
 PY_KEYWORDS = {
@@ -39,3 +44,15 @@ EXTENSIONS = {
 }
 
 OPEN_AI_API_KEY = os.getenv("OPEN_AI_API_KEY")
+
+# Shared LLM client limits (see util/llm_client.py)
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 8))
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", 500))
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", 200_000))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 6))
+
+
+# On-disk LLM response cache (see util/llm_cache.py); set LLM_CACHE=0 to opt out
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE", "1") != "0"
+LLM_CACHE_PATH = Path(os.getenv("LLM_CACHE_PATH", PROJECT_ROOT / ".cache" / "llm_cache.sqlite3"))
+LLM_CACHE_MAX_MB = int(os.getenv("LLM_CACHE_MAX_MB", 2048))
@@ -1,76 +1,136 @@
-import os
-from pathlib import Path
+"""
+Offline estimate of the tokens and cost of an LLM fix run over the error logs in err/.
+
+Every error log (plus the script it belongs to) is tokenized locally, counts are cached
+per file hash, and the totals are priced for each model. Output tokens are assumed to be
+about the size of the script, since the fixer answers with the whole corrected file.
 
-import anthropic
-from dotenv import load_dotenv
-load_dotenv()
+Usage
+-----
+    python -m scripts.count_errors --err_dir err --sampled_dir sampled/manim
+    python -m scripts.count_errors --sample 2000 --models gpt-4.1 claude-sonnet-4 --batch
+"""
+import argparse
+import csv
+import random
+from pathlib import Path
 
-api_key = os.getenv("ANTHROPIC_API_KEY")
+from scripts.compile.code_fixer import FIX_PROMPT
+from scripts.error_clusters import iter_error_files, script_path
+from scripts.util.tokens import MODEL_PRICES, TokenCountCache, token_cost, tokenizer_name
 
 ERR_DIR = "err"
 SAMPLED_DIR = "sampled/manim"
 
-Fix_prompt = """Please generate python source code that modifies parts of the following code to create
-the intended diagram/visuals. Ensure the code is compilable and includes only the required
-preamble statements. If any external files are referenced, please modify the code to
-avoid referencing external files and include the content directly. The output should
-consist solely of the code itself, without any supplementary text."""
-
-# Number of errors in err
-count_err = len([name for name in os.listdir(ERR_DIR) if os.path.isfile(os.path.join(ERR_DIR, name))])
-
-err_info = {}
-all_scripts = ""
-
-err_files = Path(ERR_DIR).glob("*")
-for err_file in err_files:
-    if not err_file.is_file():
-        continue
-
-    file_name = err_file.name
-
-    with open(err_file, "r", encoding="utf-8") as f:
-        content = f.read()
-        err_info[file_name] = {
-            "char_length": len(content),
-            "line_count": content.count('\n'),
-        }
-        all_scripts += content + "\n\n"
-
-    script_path = Path(SAMPLED_DIR) / f"{file_name}.py"
-    if script_path.is_file():
-        with open(script_path, "r", encoding="utf-8") as f:
-            script_content = f.read()
-            err_info[file_name]["script_char_length"] = len(script_content)
-            err_info[file_name]["script_line_count"] = script_content.count('\n')
-            all_scripts += script_content + "\n\n"
-
-
-all_scripts_with_prompt = all_scripts + (count_err * Fix_prompt + "\n\n")
-
-client = anthropic.Anthropic(api_key=api_key)
-
-response = client.messages.count_tokens(
-    model="claude-opus-4-20250514",
-    messages=[{
-        "role": "user",
-        "content": all_scripts_with_prompt
-    }],
-)
-total_input_tokens_with_prompt = response.input_tokens
-response = client.messages.count_tokens(
-    model="claude-opus-4-20250514",
-    messages=[{
-        "role": "user",
-        "content": all_scripts
-    }],
-)
-total_input_tokens = response.input_tokens
-
-print(f"Total errors found: {count_err}")
-print(f"Total input tokens with prompt: {total_input_tokens_with_prompt}")
-print(f"Total input tokens without prompt: {total_input_tokens}")
-print(f"Estimated input token cost: ${total_input_tokens_with_prompt / 1_000_000 * 3} USD")
-print(
-    f"Assuming output tokens are equal to input tokens, "
-    f"estimated output token cost: ${(total_input_tokens_with_prompt / 1_000_000 * 3) + (total_input_tokens/1_000_000 * 15)} USD")
+
+def sample_error_files(err_dir, sample):
+    """
+    Reservoir-samples `sample` error logs in one pass over err_dir.
+
+    Returns:
+        (sampled paths, total number of error logs)
+    """
+    rng = random.Random(0)
+    reservoir = []
+    total = 0
+    for err_file in iter_error_files(err_dir):
+        total += 1
+        if len(reservoir) < sample:
+            reservoir.append(err_file)
+        else:
+            index = rng.randrange(total)
+            if index < sample:
+                reservoir[index] = err_file
+    return reservoir, total
+
+
+def find_script(err_file, err_text, sampled_dir):
+    path = script_path(err_text)
+    if path and Path(path).is_file():
+        return Path(path)
+    candidate = Path(sampled_dir) / f"{err_file.name}.py"
+    return candidate if candidate.is_file() else None
+
+
+def count_file(err_file, sampled_dir, cache, prompt_tokens):
+    """
+    Token counts of one fix request: prompt template, error log and script.
+    """
+    err_text = err_file.read_text(encoding="utf-8", errors="replace")
+    script = find_script(err_file, err_text, sampled_dir)
+    script_tokens = cache.count(script.read_text(encoding="utf-8", errors="replace")) if script else 0
+    err_tokens = cache.count(err_text)
+    return {
+        "error": str(err_file),
+        "script": str(script) if script else None,
+        "error_tokens": err_tokens,
+        "script_tokens": script_tokens,
+        "input_tokens": prompt_tokens + err_tokens + script_tokens,
+        "output_tokens": script_tokens,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Estimate tokens and cost of fixing the error corpus.")
+    parser.add_argument("--err_dir", type=str, default=ERR_DIR, help="Directory of error logs")
+    parser.add_argument("--sampled_dir", type=str, default=SAMPLED_DIR,
+                        help="Fallback script directory for logs without a script header")
+    parser.add_argument("--models", type=str, nargs="*", default=list(MODEL_PRICES), choices=list(MODEL_PRICES))
+    parser.add_argument("--sample", type=int, default=None,
+                        help="Only tokenize this many randomly chosen logs and extrapolate")
+    parser.add_argument("--batch", action="store_true", help="Price with the Batch API discount")
+    parser.add_argument("--per_file", type=str, default=None, help="Write per-file counts and costs to this CSV")
+    args = parser.parse_args()
+
+    cache = TokenCountCache()
+    prompt_tokens = cache.count(FIX_PROMPT)
+
+    if args.sample:
+        err_files, total_files = sample_error_files(args.err_dir, args.sample)
+    else:
+        err_files, total_files = iter_error_files(args.err_dir), None
+
+    writer = None
+    if args.per_file:
+        csv_file = open(args.per_file, "w", encoding="utf-8", newline="")
+        fields = ["error", "script", "error_tokens", "script_tokens", "input_tokens", "output_tokens"]
+        writer = csv.DictWriter(csv_file, fieldnames=fields + [f"cost_{model}" for model in args.models])
+        writer.writeheader()
+
+    counted = input_tokens = output_tokens = missing_scripts = 0
+    for err_file in err_files:
+        row = count_file(err_file, args.sampled_dir, cache, prompt_tokens)
+        counted += 1
+        input_tokens += row["input_tokens"]
+        output_tokens += row["output_tokens"]
+        missing_scripts += row["script"] is None
+        if writer:
+            for model in args.models:
+                row[f"cost_{model}"] = round(
+                    token_cost(model, row["input_tokens"], row["output_tokens"], args.batch), 6)
+            writer.writerow(row)
+    if writer:
+        csv_file.close()
+    cache.save()
+
+    scale = total_files / counted if total_files and counted else 1
+    total_files = total_files or counted
+    input_tokens = int(input_tokens * scale)
+    output_tokens = int(output_tokens * scale)
+
+    print(f"Total errors found: {total_files}" + (f" ({counted} sampled)" if args.sample else ""))
+    print(f"Tokenizer: {tokenizer_name()}")
+    print(f"Scripts not found: {missing_scripts}")
+    print(f"Total input tokens with prompt: {input_tokens}")
+    print(f"Total input tokens without prompt: {input_tokens - prompt_tokens * total_files}")
+    print(f"Estimated output tokens: {output_tokens}")
+    for model in args.models:
+        cost = token_cost(model, input_tokens, output_tokens, args.batch)
+        per_file = cost / total_files if total_files else 0
+        print(f"  {model:<18} ${cost:>10.2f} total  ${per_file:.4f} per file")
+    if args.per_file:
+        print(f"✅ Per-file counts saved to {args.per_file}")
+
+
+if __name__ == "__main__":
+    main()
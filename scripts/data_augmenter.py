@@ -1,11 +1,17 @@
 import os
 import argparse
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import asyncio
 
-from scripts.util.openai_request import generate
+from scripts.util.batch_jobs import file_ids, output_stems, run_batch
+from scripts.util.llm_cache import disable_llm_cache, get_llm_cache
+from scripts.util.metrics import metrics
+from scripts.util.openai_request import (
+    agenerate, build_request, generate, generation_key, record_usage_dict, strip_code_fences
+)
+from scripts.util.prompt_reduction import record_reduction, reduction_report, strip_code
 
 CUTOFF = 1000
-MAX_WORKERS = 8
+MODEL = 'gpt-4.1'
 
 PROMPTS = {
     "matplotlib": """Please generate python source code that modifies parts of the following code to create the intended diagram/visuals. 
@@ -31,27 +37,56 @@ Filename:
 def parse_args():
     parser = argparse.ArgumentParser(description="Process Python scripts with either matplotlib or vpython prompts.")
     parser.add_argument("--mode", choices=["matplotlib", "vpython"], required=True, help="Type of visualization to support")
+    parser.add_argument("--no_cache", action="store_true", help="Do not read or write the LLM response cache")
+    parser.add_argument("--batch", action="store_true",
+                        help="Submit all files as one OpenAI batch instead of synchronous requests")
     return parser.parse_args()
 
-def process_file(file_path, prompt, output_dir):
+def read_reduced(file_path):
+    """
+    Reads a script without comments, docstrings and dead code; CUTOFF applies to the result.
+    """
+    with open(file_path, 'r', encoding='utf-8') as file:
+        content = file.read()
+    reduced = strip_code(content)
+    record_reduction("augment", content, reduced)
+    return reduced
+
+
+async def process_file(file_path, prompt, output_dir):
     try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            content = file.read()
-            num_lines = len(content.splitlines())
-            if num_lines > CUTOFF:
-                return f"Skipping {file_path} due to excessive lines ({num_lines} lines)."
-
-            filename = os.path.splitext(os.path.basename(file_path))[0]
-            revised_code = generate(prompt, content, filename=filename, model='gpt-4.1')
-
-            if revised_code:
-                output_path = os.path.join(output_dir, f"{filename}.py")
-                with open(output_path, 'w', encoding='utf-8') as out_file:
-                    out_file.write(revised_code)
-                return f"Revised code written to {output_path}"
+        content = read_reduced(file_path)
+        num_lines = len(content.splitlines())
+        if num_lines > CUTOFF:
+            return f"Skipping {file_path} due to excessive lines ({num_lines} lines)."
+
+        filename = os.path.splitext(os.path.basename(file_path))[0]
+        revised_code = await agenerate(prompt, content, filename=filename, model=MODEL)
+
+        if revised_code:
+            output_path = write_output(revised_code, filename, output_dir)
+            return f"Revised code written to {output_path}"
     except Exception as e:
         return f"Error processing {file_path}: {e}"
 
+
+def augment_file(file_path, prompt, output_dir):
+    """
+    Blocking variant of process_file for callers on worker threads (see pipeline.py).
+
+    Returns:
+        The path of the revised script, or None if the file was skipped.
+    """
+    content = read_reduced(file_path)
+    num_lines = len(content.splitlines())
+    if num_lines > CUTOFF:
+        print(f"Skipping {file_path} due to excessive lines ({num_lines} lines).")
+        return None
+    filename = os.path.splitext(os.path.basename(file_path))[0]
+    revised_code = generate(prompt, content, filename=filename, model=MODEL)
+    return write_output(revised_code, filename, output_dir) if revised_code else None
+
+
 def get_all_python_files(input_dir):
     python_files = []
     for root, _, files in os.walk(input_dir):
@@ -60,8 +95,87 @@ def get_all_python_files(input_dir):
                 python_files.append(os.path.join(root, f))
     return python_files
 
+async def process_files(files, prompt, output_dir):
+    """
+    Sends every file at once; the shared LLM client limits concurrency and request rate.
+    """
+    tasks = [asyncio.create_task(process_file(file, prompt, output_dir)) for file in files]
+    for task in asyncio.as_completed(tasks):
+        result = await task
+        if result:
+            print(result)
+
+
+def batch_inputs(files, prompt):
+    """
+    Maps the custom_id of every file to (file name, reduced content, cache key), without the
+    files that are too long. Computed before the batch is submitted or resumed, so the results
+    of a resumed batch can still be cached.
+    """
+    inputs = {}
+    for custom_id, file_path in file_ids(files).items():
+        content = read_reduced(file_path)
+        num_lines = len(content.splitlines())
+        if num_lines > CUTOFF:
+            print(f"Skipping {file_path} due to excessive lines ({num_lines} lines).")
+            continue
+        filename = os.path.splitext(os.path.basename(file_path))[0]
+        inputs[custom_id] = (filename, content, generation_key(prompt, content, filename, MODEL))
+    return inputs
+
+
+def batch_requests(inputs, prompt, output_dir, stems):
+    """
+    Yields (custom_id, request body) for every input that is not answered from the cache;
+    cached generations are written out right away.
+    """
+    for custom_id, (filename, content, key) in inputs.items():
+        cached = get_llm_cache().get(key)
+        if cached is not None:
+            write_output(cached, stems[custom_id], output_dir)
+            continue
+        yield custom_id, build_request(prompt, content, filename, MODEL)
+
+
+def write_output(revised_code, filename, output_dir):
+    output_path = os.path.join(output_dir, f"{filename}.py")
+    with open(output_path, 'w', encoding='utf-8') as out_file:
+        out_file.write(revised_code)
+    return output_path
+
+
+def process_batch(files, prompt, output_dir, mode):
+    """
+    Augments all files through the Batch API and writes each result to <output_dir>/<file>.py
+    (<file>_<hash>.py where input files share a name).
+    """
+    inputs = batch_inputs(files, prompt)
+    stems = output_stems(file_ids(files))
+    results = run_batch(
+        batch_requests(inputs, prompt, output_dir, stems),
+        work_dir=os.path.join(output_dir, "_batch"),
+        name=f"augment_{mode}",
+        metadata={"description": f"Data augmentation ({mode})"},
+    )
+    written = failed = 0
+    for custom_id, text, usage in results:
+        if usage:
+            record_usage_dict(usage)
+        if text is None or custom_id not in inputs:
+            print(f"⚠️ No result for {custom_id}")
+            failed += 1
+            continue
+        revised_code = strip_code_fences(text)
+        write_output(revised_code, stems[custom_id], output_dir)
+        get_llm_cache().put(inputs[custom_id][2], revised_code)
+        written += 1
+    print(f"✅ Batch finished: {written} files written, {failed} failed")
+
+
 def main():
     args = parse_args()
+    if args.no_cache:
+        disable_llm_cache()
 
     input_dir = f"../sampled/{args.mode}"
     output_dir = f"../sampled/{args.mode}_fixed"
@@ -72,12 +186,12 @@ def main():
 
     files = get_all_python_files(input_dir)
 
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        futures = {executor.submit(process_file, file, prompt, output_dir): file for file in files}
-        for future in as_completed(futures):
-            result = future.result()
-            if result:
-                print(result)
+    if args.batch:
+        process_batch(files, prompt, output_dir, args.mode)
+    else:
+        asyncio.run(process_files(files, prompt, output_dir))
+    print(f"✂️ Prompt reduction:\n{reduction_report(metrics.snapshot()['counters'])}")
+    print(get_llm_cache().report())
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,274 @@
+"""
+Packs the finished samples (source code, render, keyframes, description) into sharded
+parquet files, so training jobs can memory-map one corpus instead of joining loose files.
+
+Rows are joined on the sample id (the video's file stem, which is also the description
+batch's custom_id). Shards are append-only: a run only adds rows whose id and sample key
+are not packed yet, in new shards after the existing ones. The shards load directly with
+`pyarrow.dataset` or `datasets.load_dataset("parquet", data_files=".../*.parquet")`.
+
+Usage
+-----
+    python -m scripts.dataset_packer --manifest rendered/manim_scenes/manifest.jsonl \
+        --descriptions output/description_extraction --output_dir dataset/manim
+    python -m scripts.dataset_packer --video_dir rendered/matplotlib --code_dir sampled/matplotlib_fixed \
+        --library matplotlib --descriptions output/description_extraction --output_dir dataset/matplotlib
+"""
+import argparse
+import glob
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from scripts.compile.collector import iter_manifest
+from scripts.description_extractor import (
+    DESCRIPTIONS_STORE, ImageEncoding, encode_frame, iter_ordered
+)
+from scripts.util.batch_jobs import iter_jsonl
+from scripts.util.keyframes import sample_keyframes
+from scripts.video_dedup import is_duplicate, load_duplicates
+
+ROW_GROUP_SIZE = 512
+ROWS_PER_SHARD = 50_000
+SHARD_PATTERN = "part-{:05d}.parquet"
+
+SCHEMA = pa.schema([
+    ("id", pa.string()),
+    ("library", pa.string()),
+    ("scene", pa.string()),
+    ("source_code", pa.string()),
+    ("video_path", pa.string()),
+    ("video", pa.binary()),
+    ("keyframes", pa.list_(pa.binary())),
+    ("description", pa.string()),
+    ("input_tokens", pa.int64()),
+    ("output_tokens", pa.int64()),
+    ("sample_key", pa.string()),
+])
+
+
+def load_descriptions(descriptions_dir):
+    """
+    Maps sample id to its description record, from the descriptions store and the
+    {batch_id}_descriptions.json files of older runs. Later records win.
+    """
+    descriptions = {}
+    for path in sorted(glob.glob(os.path.join(descriptions_dir, "*_descriptions.json"))):
+        with open(path, "r", encoding="utf-8") as f:
+            for custom_id, description in json.load(f).items():
+                descriptions[custom_id] = {"description": description}
+    store = os.path.join(descriptions_dir, DESCRIPTIONS_STORE)
+    if os.path.exists(store):
+        for entry in iter_jsonl(store):
+            descriptions[entry["custom_id"]] = entry
+    return descriptions
+
+
+def iter_samples(manifest=None, video_dir=None, code_dir=None, library=None):
+    """
+    Yields (id, library, scene, video path, source path) from a render manifest,
+    or from a directory of videos with matching source files.
+    """
+    if manifest:
+        for record in iter_manifest(manifest):
+            yield Path(record["video"]).stem, record["library"], record.get("scene"), record["video"], record["source"]
+        return
+    for video_file in sorted(os.listdir(video_dir)):
+        if video_file.endswith(".mp4"):
+            stem = os.path.splitext(video_file)[0]
+            yield stem, library, None, os.path.join(video_dir, video_file), os.path.join(code_dir, f"{stem}.py")
+
+
+def packed_ids(output_dir):
+    """
+    (id, sample key) pairs already in the shards, read from those two columns only.
+    """
+    packed = set()
+    for shard in sorted(glob.glob(os.path.join(output_dir, "part-*.parquet"))):
+        table = pq.read_table(shard, columns=["id", "sample_key"], memory_map=True)
+        packed.update(zip(table.column("id").to_pylist(), table.column("sample_key").to_pylist()))
+    return packed
+
+
+def saved_keyframes(screenshots_dir, sample_id):
+    """
+    Paths of the screenshots the description stage saved for one sample, in frame order:
+    <id>_first, <id>_frame<N> by N, <id>_last. Files of other samples whose id merely starts
+    with this one (example_3 and example_3_1) and unrelated names are ignored.
+    """
+    pattern = re.compile(rf"{re.escape(sample_id)}_(?:(first)|frame(\d+)|(last))\.\w+")
+    ordered = []
+    for path in glob.glob(os.path.join(glob.escape(screenshots_dir), f"{glob.escape(sample_id)}_*")):
+        match = pattern.fullmatch(os.path.basename(path))
+        if match:
+            first, index, last = match.groups()
+            ordered.append(((0, 0) if first else (2, 0) if last else (1, int(index)), path))
+    return [path for _, path in sorted(ordered)]
+
+
+def load_keyframes(video_path, sample_id, screenshots_dir, encoding):
+    """
+    Encoded keyframes of a sample: the screenshots the description stage saved, if any,
+    otherwise extracted from the video in one pass.
+    """
+    saved = saved_keyframes(screenshots_dir, sample_id) if screenshots_dir else []
+    if saved:
+        return [Path(p).read_bytes() for p in saved]
+    frames = sample_keyframes(video_path, count=encoding.keyframes, mode=encoding.keyframe_mode,
+                              max_dim=encoding.max_dim)
+    return [encode_frame(frame, encoding)[0] for _, frame in frames or []]
+
+
+def build_row(sample, description, screenshots_dir, encoding, embed_video, with_keyframes):
+    sample_id, library, scene, video_path, source_path = sample
+    with open(source_path, "r", encoding="utf-8") as f:
+        source_code = f.read()
+    usage = description.get("usage") or {}
+    return {
+        "id": sample_id,
+        "library": library,
+        "scene": scene,
+        "source_code": source_code,
+        "video_path": str(video_path),
+        "video": Path(video_path).read_bytes() if embed_video else None,
+        "keyframes": load_keyframes(video_path, sample_id, screenshots_dir, encoding) if with_keyframes else [],
+        "description": description["description"],
+        "input_tokens": usage.get("input_tokens"),
+        "output_tokens": usage.get("output_tokens"),
+        "sample_key": description.get("key"),
+    }
+
+
+class ShardedParquetWriter:
+    """
+    Writes rows as record batches of row_group_size rows into new shards after the
+    existing ones, starting a new shard every rows_per_shard rows.
+    """
+
+    def __init__(self, output_dir, row_group_size=ROW_GROUP_SIZE, rows_per_shard=ROWS_PER_SHARD):
+        self.output_dir = output_dir
+        self.row_group_size = row_group_size
+        self.rows_per_shard = rows_per_shard
+        os.makedirs(output_dir, exist_ok=True)
+        existing = glob.glob(os.path.join(output_dir, "part-*.parquet"))
+        self.next_shard = max((int(Path(p).stem.split("-")[1]) for p in existing), default=-1) + 1
+        self.shards = []
+        self.rows = 0
+        self._writer = None
+        self._path = None
+        self._shard_rows = 0
+        self._buffer = []
+
+    def write(self, row):
+        self._buffer.append(row)
+        if len(self._buffer) >= self.row_group_size:
+            self._flush()
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        if self._writer is None:
+            path = os.path.join(self.output_dir, SHARD_PATTERN.format(self.next_shard))
+            # written under a temporary name, so readers never see a half-written shard
+            self._writer = pq.ParquetWriter(path + ".part", SCHEMA, compression="zstd")
+            self._path = path
+            self.next_shard += 1
+        batch = pa.RecordBatch.from_pylist(self._buffer, schema=SCHEMA)
+        self._writer.write_batch(batch, row_group_size=self.row_group_size)
+        self._shard_rows += len(self._buffer)
+        self.rows += len(self._buffer)
+        self._buffer = []
+        if self._shard_rows >= self.rows_per_shard:
+            self._close_shard()
+
+    def _close_shard(self):
+        self._writer.close()
+        os.replace(self._path + ".part", self._path)
+        self.shards.append(self._path)
+        self._writer = None
+        self._shard_rows = 0
+
+    def close(self):
+        self._flush()
+        if self._writer is not None:
+            self._close_shard()
+        return self.shards
+
+
+def pack(samples, descriptions, output_dir, screenshots_dir=None, encoding=ImageEncoding(), embed_video=False,
+         with_keyframes=True, row_group_size=ROW_GROUP_SIZE, rows_per_shard=ROWS_PER_SHARD, workers=None,
+         duplicates=None):
+    """
+    Appends every described sample that is not packed yet and is not a duplicate video (see
+    video_dedup.py). Rows are built in a process pool (reading sources, videos and keyframes)
+    and written in sample order by this process.
+    """
+    packed = packed_ids(output_dir)
+    pending = []
+    for sample in samples:
+        description = descriptions.get(sample[0])
+        if description is None or not os.path.exists(sample[4]) or is_duplicate(sample[3], duplicates):
+            continue
+        if (sample[0], description.get("key")) in packed:
+            continue
+        pending.append((sample, description))
+    print(f"📦 {len(pending)} new samples to pack ({len(packed)} already packed)")
+
+    writer = ShardedParquetWriter(output_dir, row_group_size, rows_per_shard)
+    workers = workers or os.cpu_count()
+    jobs = ((sample, description, screenshots_dir, encoding, embed_video, with_keyframes)
+            for sample, description in pending)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for row in iter_ordered(executor, build_row, jobs, window=workers * 4):
+            writer.write(row)
+    shards = writer.close()
+    print(f"✅ Packed {writer.rows} rows into {len(shards)} new shards in {output_dir}")
+    return shards
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pack described samples into parquet shards.")
+    parser.add_argument("--manifest", type=str, default=None, help="Render manifest.jsonl to pack")
+    parser.add_argument("--video_dir", type=str, default=None, help="Videos to pack (without a manifest)")
+    parser.add_argument("--code_dir", type=str, default=None, help="Sources of the videos in --video_dir")
+    parser.add_argument("--library", type=str, default=None, help="Library of the videos in --video_dir")
+    parser.add_argument("--descriptions", type=str, default="../output/description_extraction",
+                        help="Output directory of description_extractor.py")
+    parser.add_argument("--output_dir", type=str, default="../dataset")
+    parser.add_argument("--embed_video", action="store_true", help="Store the MP4 bytes, not only the path")
+    parser.add_argument("--no_keyframes", action="store_true")
+    parser.add_argument("--keyframes", type=int, default=0,
+                        help="Extra keyframes between first and last when extracting from the video")
+    parser.add_argument("--row_group_size", type=int, default=ROW_GROUP_SIZE)
+    parser.add_argument("--rows_per_shard", type=int, default=ROWS_PER_SHARD)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--duplicates", type=str, default=None,
+                        help="duplicates.json from video_dedup.py; duplicate videos are not packed")
+    args = parser.parse_args()
+    if not args.manifest and not (args.video_dir and args.code_dir):
+        parser.error("Give --manifest or --video_dir and --code_dir")
+
+    samples = iter_samples(args.manifest, args.video_dir, args.code_dir, args.library)
+    screenshots_dir = os.path.join(args.descriptions, "screenshots")
+    pack(
+        samples,
+        load_descriptions(args.descriptions),
+        args.output_dir,
+        screenshots_dir=screenshots_dir if os.path.isdir(screenshots_dir) else None,
+        encoding=ImageEncoding(keyframes=args.keyframes),
+        embed_video=args.embed_video,
+        with_keyframes=not args.no_keyframes,
+        row_group_size=args.row_group_size,
+        rows_per_shard=args.rows_per_shard,
+        workers=args.workers,
+        duplicates=load_duplicates(args.duplicates),
+    )
+
+
+if __name__ == "__main__":
+    main()
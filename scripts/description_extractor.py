@@ -2,21 +2,40 @@ import argparse
 import base64
 import json
 import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
 
-import cv2
-from dotenv import load_dotenv
-from openai import OpenAI
 from tqdm import tqdm
 
-load_dotenv()
+from scripts.compile.collector import iter_manifest
+from scripts.util.batch_jobs import (
+    MAX_BATCH_BYTES, MAX_BATCH_REQUESTS, POLL_INTERVAL, UPLOAD_WORKERS, BatchManifest, ShardUploader,
+    RESUBMIT_STATUSES, ShardWriter, batch_errors, entry_usage, is_retryable, iter_batch_entries, iter_jsonl,
+    poll_batches, response_text, submit_shard
+)
+from scripts.util.description_index import DESCRIBED, DescriptionIndex
+from scripts.util.metrics import metrics
+from scripts.util.prompt_reduction import record_reduction, reduce_code
+from scripts.util.tokens import token_cost
+
+MODEL = "gpt-4.1"
+BATCH_MANIFEST = "batches.jsonl"
+DESCRIPTIONS_STORE = "descriptions.jsonl"
+MAX_RESUBMITS = 2
+DESCRIPTION_INDEX = "description_index.sqlite3"
+# Bump to describe every sample again after changing the prompt's meaning
+PROMPT_VERSION = 1
 
 PROMPT = """You are given the following materials:
 
 * The Python source code of an animation
 * A screenshot of the initial frame
-* A screenshot of the final frame
+{middle_frames}* A screenshot of the final frame
 
-Using these three inputs, write a medium-length description of what happens in the animation from beginning to end. Imagine you're describing it to someone who is watching it.
+Using these {input_count} inputs, write a medium-length description of what happens in the animation from beginning to end. Imagine you're describing it to someone who is watching it.
 
 **Guidelines:**
 
@@ -29,215 +48,440 @@ Source code:
 {source_code}
 ###
 """
+MIDDLE_FRAMES_NOTE = "* {count} screenshots from the middle of the animation, in order\n"
 
 
-def get_valid_frame(cap, start_frame, direction, max_attempts=5, fps=30, variance_threshold=10):
+@dataclass(frozen=True)
+class ImageEncoding:
     """
-    Attempts to get a valid (non-monotonous) frame by moving in a direction (forward/backward).
+    How frames are embedded in the requests: format (png, jpeg or webp), quality for the
+    lossy formats (0-100), the maximum width/height in pixels (0 keeps the full size), and
+    how many extra frames between the first and last one are sampled ("even" or "scene").
     """
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    format: str = "jpeg"
+    quality: int = 85
+    max_dim: int = 1024
+    keyframes: int = 0
+    keyframe_mode: str = "even"
 
-    for i in range(max_attempts):
-        frame_idx = start_frame + direction * i * int(fps)
-        frame_idx = int(min(max(frame_idx, 0), total_frames - 1))
 
-        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
-        success, frame = cap.read()
-        if not success:
-            continue
+# extension, MIME type and the cv2 quality flag of each format; cv2 and the frame sampling are
+# imported where frames are handled, so the pipeline can import this module without them
+IMAGE_FORMATS = {
+    "png": (".png", "image/png", None),
+    "jpeg": (".jpg", "image/jpeg", "IMWRITE_JPEG_QUALITY"),
+    "webp": (".webp", "image/webp", "IMWRITE_WEBP_QUALITY"),
+}
+
+
+def encode_frame(frame, encoding):
+    """
+    Downscales a frame to encoding.max_dim and encodes it in memory.
+
+    Returns:
+        (encoded bytes, file extension, MIME type)
+    """
+    import cv2
+
+    height, width = frame.shape[:2]
+    if encoding.max_dim and max(height, width) > encoding.max_dim:
+        scale = encoding.max_dim / max(height, width)
+        frame = cv2.resize(frame, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_AREA)
+    extension, mime_type, quality_flag = IMAGE_FORMATS[encoding.format]
+    params = [getattr(cv2, quality_flag), encoding.quality] if quality_flag is not None else []
+    success, buffer = cv2.imencode(extension, frame, params)
+    if not success:
+        raise ValueError(f"Could not encode frame as {encoding.format}")
+    return buffer.tobytes(), extension, mime_type
 
-        if frame.var() > variance_threshold:
-            return frame
 
-    return None
+def image_url(data, mime_type):
+    return f"data:{mime_type};base64,{base64.b64encode(data).decode('utf-8')}"
 
 
-def encode_image(image_path):
+def build_request(video_path, code_path, output_image_dir=None, scene=None, encoding=ImageEncoding()):
     """
-    Encodes an image to a base64 string.
+    Builds the batch request for one rendered video, or returns None if it cannot be described.
+    If the scene is known, other scene classes in the source are left out of the prompt.
+    Besides the first and last non-blank frames, encoding.keyframes frames from the middle of the
+    video are included (see util/keyframes.py). Frames are encoded in memory; they are only written to
+    output_image_dir if it is given.
     """
-    with open(image_path, "rb") as img_file:
-        return base64.b64encode(img_file.read()).decode('utf-8')
+    from scripts.util.keyframes import sample_keyframes
 
+    base_name = os.path.splitext(os.path.basename(video_path))[0]
+    if not os.path.exists(code_path):
+        return None
 
-def process_videos(video_dir, code_dir, output_dir):
+    with open(code_path, "r", encoding="utf-8") as f:
+        source_code = f.read()
+
+    with metrics.timer("frame_extraction", video=base_name):
+        try:
+            frames = sample_keyframes(video_path, count=encoding.keyframes, mode=encoding.keyframe_mode,
+                                      max_dim=encoding.max_dim)
+        except Exception as e:
+            print(f"⚠️ Could not decode {video_path}: {e}")
+            return None
+
+    if not frames or len(frames) < 2:
+        return None
+
+    images = []
+    labels = ["first"] + [f"frame{index}" for index, _ in frames[1:-1]] + ["last"]
+    for label, (_, frame) in zip(labels, frames):
+        data, extension, mime_type = encode_frame(frame, encoding)
+        if output_image_dir:
+            with open(os.path.join(output_image_dir, f"{base_name}_{label}{extension}"), "wb") as img_file:
+                img_file.write(data)
+        images.append({"type": "input_image", "image_url": image_url(data, mime_type)})
+
+    reduced_code = reduce_code(source_code, scene)
+    record_reduction("describe", source_code, reduced_code)
+    middle = len(frames) - 2
+    prompt_text = PROMPT.format(
+        source_code=reduced_code,
+        middle_frames=MIDDLE_FRAMES_NOTE.format(count=middle) if middle else "",
+        input_count=len(frames) + 1 if middle else "three",
+    )
+    return {
+        "custom_id": base_name,
+        "method": "POST",
+        "url": "/v1/responses",
+        "body": {
+            "model": MODEL,
+            "input": [
+                {"role": "user", "content": [
+                    {"type": "input_text", "text": prompt_text},
+                    *images,
+                ]}]
+        },
+    }
+
+
+def iter_ordered(executor, fn, arg_tuples, window):
+    """
+    Runs fn over arg_tuples in the executor with at most `window` tasks in flight and
+    yields the results in input order.
+    """
+    pending = deque()
+    for args in arg_tuples:
+        pending.append(executor.submit(fn, *args))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def screenshot_dir(output_dir, save_screenshots):
+    if not save_screenshots:
+        return None
     output_image_dir = os.path.join(output_dir, "screenshots")
-    input_jsonl = os.path.join(output_dir, "batch_input.jsonl")
     os.makedirs(output_image_dir, exist_ok=True)
-    video_files = [f for f in os.listdir(video_dir) if f.endswith(".mp4")]
+    return output_image_dir
 
-    with open(input_jsonl, "w", encoding="utf-8") as out_file:
 
-        for video_file in tqdm(video_files, desc="Processing videos"):
-            video_path = os.path.join(video_dir, video_file)
-            base_name = os.path.splitext(video_file)[0]
-            code_path = os.path.join(code_dir, base_name + ".py")
+def prompt_version(encoding):
+    """
+    Everything besides the video and code that changes a description request's prompt.
+    """
+    return f"v{PROMPT_VERSION}-{MODEL}-k{encoding.keyframes}"
 
-            if not os.path.exists(code_path):
-                continue
 
-            with open(code_path, "r", encoding="utf-8") as f:
-                source_code = f.read()
+def new_samples(video_dir, code_dir, index, encoding, duplicates=None):
+    """
+    Yields (video path, code path, sample key) for the videos whose current video, source
+    code and prompt version have no description yet and are not waiting in a batch.
+    Videos listed in duplicates (see video_dedup.py) are left out.
+    """
+    from scripts.video_dedup import is_duplicate
+
+    video_files = sorted(f for f in os.listdir(video_dir) if f.endswith(".mp4"))
+    skipped = duplicate = 0
+    for video_file in video_files:
+        video_path = os.path.join(video_dir, video_file)
+        if is_duplicate(video_path, duplicates):
+            duplicate += 1
+            continue
+        code_path = os.path.join(code_dir, os.path.splitext(video_file)[0] + ".py")
+        if not os.path.exists(code_path):
+            continue
+        key = index.sample_key(video_path, code_path, prompt_version(encoding))
+        if not index.needs_description(key, os.path.splitext(video_file)[0]):
+            skipped += 1
+            continue
+        yield video_path, code_path, key
+    print(f"⏭️ {skipped} of {len(video_files)} videos are already described or pending, {duplicate} are duplicates")
 
-            cap = cv2.VideoCapture(video_path)
-            if not cap.isOpened():
-                continue
 
-            fps = cap.get(cv2.CAP_PROP_FPS)
-            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+def process_videos(video_dir, code_dir, output_dir, writer, index, workers=None, encoding=ImageEncoding(),
+                   save_screenshots=False, duplicates=None):
+    """
+    Extracts frames for all new samples (see new_samples) in a process pool. The main process
+    is the only user of the shard writer and appends the requests in sorted video order.
+    """
+    output_image_dir = screenshot_dir(output_dir, save_screenshots)
+    samples = list(new_samples(video_dir, code_dir, index, encoding, duplicates))
+    workers = workers or os.cpu_count()
 
-            frame_first = get_valid_frame(cap, start_frame=0, direction=+1, fps=fps)
-            frame_last = get_valid_frame(cap, start_frame=total_frames - 1, direction=-1, fps=fps)
+    jobs = ((video_path, code_path, output_image_dir, None, encoding) for video_path, code_path, _ in samples)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        requests = iter_ordered(executor, build_request, jobs, window=workers * 4)
+        for (_, _, key), request in tqdm(zip(samples, requests), total=len(samples), desc="Processing videos"):
+            if request is not None:
+                writer.write(request)
+                index.mark_pending(key, request["custom_id"])
 
-            if frame_first is None or frame_last is None:
-                cap.release()
-                continue
 
-            first_img_path = os.path.join(output_image_dir, f"{base_name}_first.png")
-            last_img_path = os.path.join(output_image_dir, f"{base_name}_last.png")
-
-            cv2.imwrite(first_img_path, frame_first)
-            cv2.imwrite(last_img_path, frame_last)
-
-            first_img_base64 = encode_image(first_img_path)
-            last_img_base64 = encode_image(last_img_path)
-            prompt_text = PROMPT.format(source_code=source_code)
-            request = {
-                "custom_id": base_name,
-                "method": "POST",
-                "url": "/v1/responses",
-                "body": {
-                    "model": "gpt-4.1",
-                    "input": [
-                        {"role": "user", "content": [
-                            {"type": "input_text", "text": prompt_text},
-                            {"type": "input_image", "image_url": f"data:image/png;base64,{first_img_base64}"},
-                            {"type": "input_image", "image_url": f"data:image/png;base64,{last_img_base64}"}
-                        ]}]
-                },
-            }
-
-            cap.release()
-            # Save to JSONL
-            json.dump(request, out_file)
-            out_file.write("\n")
+def follow_renders(manifest_path, output_dir, writer, index, encoding=ImageEncoding(), save_screenshots=False,
+                   duplicates=None):
+    """
+    Builds requests for renders as the compile stage registers them in its manifest,
+    instead of waiting for the whole render batch to finish. Full shards are uploaded
+    while the renders continue. Samples that are already described or known duplicates
+    are skipped.
+    """
+    from scripts.video_dedup import is_duplicate
+
+    output_image_dir = screenshot_dir(output_dir, save_screenshots)
+    for record in tqdm(iter_manifest(manifest_path, follow=True), desc="Processing renders"):
+        if not os.path.exists(record["source"]) or is_duplicate(record["video"], duplicates):
+            continue
+        key = index.sample_key(record["video"], record["source"], prompt_version(encoding))
+        if not index.needs_description(key, Path(record["video"]).stem):
+            continue
+        request = build_request(record["video"], record["source"], output_image_dir,
+                                scene=record.get("scene"), encoding=encoding)
+        if request is not None:
+            writer.write(request)
+            index.mark_pending(key, request["custom_id"])
 
 
 #################################
-# OpenAI functions
-client = OpenAI(
-    api_key=os.getenv("OPENAI_API_KEY"),
-)
+# Batch results
+def append_descriptions(store_path, entries):
+    """
+    Appends description records to the append-only descriptions store (one JSON object per line).
+    A batch that is ingested again after an interruption appends its records again; readers
+    keep the last record per custom_id.
+    """
+    with open(store_path, "a", encoding="utf-8") as store:
+        for entry in entries:
+            store.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
+def iter_request_lines(jsonl_path, custom_ids):
+    for entry in iter_jsonl(jsonl_path):
+        if entry["custom_id"] in custom_ids:
+            yield entry
 
 
-def upload_jsonl_file(jsonl_file_path, output_dir, source="rendered/manim_scenes"):
+def ingest_batch(batch, output_dir, manifest, index, token_counts):
     """
-    Uploads the JSONL file to OpenAI batch processing
+    Streams a finished batch's output into the descriptions store and resubmits the requests
+    that may succeed on a second try (rate limits, server errors, or everything missing from an
+    expired or cancelled batch), up to MAX_RESUBMITS times. A batch that failed validation and
+    invalid requests are not resubmitted; their samples are released for the next build run.
     """
+    results_dir = os.path.join(output_dir, "batch_results")
+    os.makedirs(results_dir, exist_ok=True)
+    entry = manifest.batches()[batch.id]
+
+    if batch.status == "failed":
+        errors = batch_errors(batch)
+        print(f"❌ Batch {batch.id} failed validation: {'; '.join(errors) or 'no details'}")
+        manifest.record(batch.id, errors=errors)
+
+    succeeded = set()
+    answered = set()  # requests with a result line, successful or not
+    retryable = set()
+
+    def descriptions():
+        for result in iter_batch_entries(batch, results_dir):
+            custom_id, text, usage = result.get("custom_id"), response_text(result), entry_usage(result)
+            answered.add(custom_id)
+            if text is None:
+                if is_retryable(result):
+                    retryable.add(custom_id)
+                continue
+            succeeded.add(custom_id)
+            for name in token_counts:
+                token_counts[name] += (usage or {}).get(name, 0)
+            key = index.resolve_described(custom_id)
+            yield {"custom_id": custom_id, "description": text, "batch_id": batch.id, "key": key, "usage": usage}
 
-    batch_input_file = client.files.create(
-        file=open(jsonl_file_path, "rb"),
-        purpose="batch"
-    )
+    append_descriptions(os.path.join(output_dir, DESCRIPTIONS_STORE), descriptions())
+    print(f"✅ {len(succeeded)} descriptions from batch {batch.id} saved")
 
-    if not batch_input_file:
-        raise ValueError("Failed to upload JSONL file.")
-    print("📦File uploaded successfully:", batch_input_file.to_dict())
-    batch_input_file_id = batch_input_file.id
-    batch = client.batches.create(
-        input_file_id=batch_input_file_id,
-        endpoint="/v1/responses",
-        completion_window="24h",
-        metadata={
-            "description": "Description extraction batch",
-            "source": source
-        }
-    )
-    print("📦Batch created successfully:", batch.to_dict())
-    batch_info_file = os.path.join(output_dir, "batch_info.txt")
-    with open(batch_info_file, 'w') as f:
-        f.write(str(batch.to_dict()))
+    input_path = entry.get("input")
+    if not input_path or not os.path.exists(input_path):
+        return
+    failed = {line["custom_id"] for line in iter_jsonl(input_path)} - succeeded
+    if batch.status in RESUBMIT_STATUSES:
+        retryable |= failed - answered
+    attempt = entry.get("attempt", 0) + 1
+    give_up = failed - retryable if attempt <= MAX_RESUBMITS else failed
+    if give_up:
+        reason = f"failed {MAX_RESUBMITS} resubmits" if attempt > MAX_RESUBMITS else "cannot be retried"
+        print(f"⚠️ {len(give_up)} requests of batch {batch.id} {reason}, giving up")
+        for custom_id in give_up:
+            # the next build run includes these samples again
+            index.resolve_failed(custom_id)
+    failed -= give_up
+    if not failed:
+        return
+    retry_path = os.path.join(os.path.dirname(input_path), f"{Path(input_path).stem}_retry{attempt}.jsonl")
+    with ShardWriter(os.path.dirname(retry_path), Path(retry_path).stem) as writer:
+        for line in iter_request_lines(input_path, failed):
+            writer.write(line)
+    for shard_path, requests in writer.shards:
+        batch_id = submit_shard(shard_path, requests, manifest, entry.get("metadata"))
+        manifest.record(batch_id, attempt=attempt, retry_of=batch.id)
+    print(f"🔁 Resubmitted {len(failed)} failed requests of batch {batch.id}")
 
 
-def fetch_batch_by_id(batch_id, output_dir="../output/description_extraction"):
+def submit_missing_shards(output_dir, manifest):
     """
-    Fetches a batch by its ID
+    Submits input shards that have no batch yet, e.g. after a failed upload.
     """
-    batch = client.batches.retrieve(batch_id)
-    if not batch:
-        raise ValueError(f"Batch with ID {batch_id} not found.")
-    status = batch.status
-    if status != "completed":
-        print(f"💤 Batch {batch_id} is not completed yet. Current status: {status}")
-        return
-    elif batch.error_file_id:
-        print(f"⚠️ Batch {batch_id} failed. Fetching error details...")
-        err_response = client.files.content(batch.error_file_id)
-        err_response.write_to_file(os.path.join(output_dir, "batch_errors.jsonl"))
+    inputs_dir = os.path.join(output_dir, "batch_inputs")
+    if not os.path.isdir(inputs_dir):
         return
+    submitted = {os.path.abspath(entry["input"]) for entry in manifest.batches().values() if entry.get("input")}
+    for name in sorted(os.listdir(inputs_dir)):
+        shard_path = os.path.join(inputs_dir, name)
+        if name.endswith(".jsonl") and "_retry" not in name and os.path.abspath(shard_path) not in submitted:
+            requests = sum(1 for _ in iter_jsonl(shard_path))
+            submit_shard(shard_path, requests, manifest, {"description": "Description extraction batch"})
 
-    print("✅ Batch completed. Fetching content")
-    response = client.files.content(batch.output_file_id)
-    response.write_to_file(os.path.join(output_dir, f'{batch_id}.jsonl'))
-    print("✅Batch content saved to", f'{batch_id}.jsonl')
 
-    token_counts = {
-        "input_tokens": 0,
-        "output_tokens": 0,
-        "total_tokens": 0
-    }
-    descriptions = {}
-    for line_num, line in enumerate(response.text.splitlines(), 1):
-        try:
-            entry = json.loads(line)
-
-            # Extract custom ID and description
-            custom_id = entry.get('custom_id', f"unknown_{line_num}")
-            description = entry['response']['body']['output'][0]['content'][0]['text']
-            descriptions[custom_id] = description
-
-            # Count tokens
-            usage = entry['response']['body']['usage']
-            token_counts["input_tokens"] += usage.get("input_tokens", 0)
-            token_counts["output_tokens"] += usage.get("output_tokens", 0)
-            token_counts["total_tokens"] += usage.get("total_tokens", 0)
-        except json.JSONDecodeError:
-            print(f"⚠️ Error decoding JSON on line {line_num}: {line}")
-            continue
-        except Exception as e:
-            print(f"⚠️ Error processing line {line_num}: {e}")
+def import_legacy_descriptions(output_dir, video_dir, code_dir, index):
+    """
+    Adds the descriptions of earlier runs ({batch_id}_descriptions.json files) to the index and
+    the descriptions store, for samples whose video and code still exist. Those descriptions
+    were made from the first and last frame, i.e. with no extra keyframes.
+    """
+    version = prompt_version(ImageEncoding(keyframes=0))
+    imported = 0
+    for name in sorted(os.listdir(output_dir)):
+        if not name.endswith("_descriptions.json"):
             continue
-    # Save descriptions to a JSON file
-    descriptions_file = os.path.join(output_dir, f'{batch_id}_descriptions.json')
-    with open(descriptions_file, 'w', encoding='utf-8') as desc_file:
-        json.dump(descriptions, desc_file, ensure_ascii=False, indent=4)
-    print("✅Descriptions saved to", descriptions_file)
+        batch_id = name[:-len("_descriptions.json")]
+        with open(os.path.join(output_dir, name), "r", encoding="utf-8") as f:
+            descriptions = json.load(f)
+        records = []
+        for custom_id, description in descriptions.items():
+            video_path = os.path.join(video_dir, f"{custom_id}.mp4")
+            code_path = os.path.join(code_dir, f"{custom_id}.py")
+            if not (os.path.exists(video_path) and os.path.exists(code_path)):
+                continue
+            key = index.sample_key(video_path, code_path, version)
+            if index.status(key, custom_id) == DESCRIBED:
+                continue
+            index.mark_described(key, custom_id)
+            records.append({"custom_id": custom_id, "description": description, "batch_id": batch_id, "key": key})
+        append_descriptions(os.path.join(output_dir, DESCRIPTIONS_STORE), records)
+        imported += len(records)
+    print(f"📇 Imported {imported} descriptions from earlier runs")
 
-    print("Token counts for batch", token_counts)
-    print(f"Assuming $8/mill output => {token_counts['output_tokens'] / 1_000_000 * 8 }")
-    print(f"Assuming $2/mill input => {token_counts['input_tokens'] / 1_000_000 * 2 }")
-    print(f"Estimated cost: ${token_counts['output_tokens'] / 1_000_000 * 8 + token_counts['input_tokens'] / 1_000_000 * 2:.2f}")
 
+def collect_descriptions(output_dir, poll_interval=POLL_INTERVAL):
+    """
+    Polls every batch in the manifest until all of them are finished and ingested.
+    """
+    manifest = BatchManifest(os.path.join(output_dir, BATCH_MANIFEST))
+    index = DescriptionIndex(os.path.join(output_dir, DESCRIPTION_INDEX))
+    submit_missing_shards(output_dir, manifest)
+    token_counts = {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}
+    poll_batches(manifest, lambda batch: ingest_batch(batch, output_dir, manifest, index, token_counts),
+                 poll_interval=poll_interval)
+    print(f"📇 Description index: {index.counts()}")
 
+    print("Token counts for collected batches", token_counts)
+    cost = token_cost(MODEL, token_counts["input_tokens"], token_counts["output_tokens"], batch=True)
+    print(f"Estimated cost: ${cost:.2f}")
+
+
+def main(argv=None):
+    from scripts.util.keyframes import MODES as KEYFRAME_MODES
+    from scripts.video_dedup import load_duplicates
 
-if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Extract frames from manim videos and save source code.")
     parser.add_argument("--video_dir", type=str, default="../rendered/manim_scenes", help="Directory of videos")
     parser.add_argument("--code_dir", type=str, default="../sampled/manim_scenes", help="Directory of source code")
     parser.add_argument("--output_dir", type=str, default="../output/description_extraction", help="Directory to save output files")
-    parser.add_argument("--retrieve", action="store_true", help="Retrieve a previously created batch by ID")
-    args = parser.parse_args()
+    parser.add_argument("--collect", action="store_true",
+                        help="Poll all batches in the manifest and collect their descriptions")
+    parser.add_argument("--batch_id", type=str, nargs="*", default=None,
+                        help="With --collect: also track these batches (e.g. created before the manifest existed)")
+    parser.add_argument("--poll_interval", type=float, default=POLL_INTERVAL,
+                        help="With --collect: seconds before a batch is polled again (grows while it runs)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Frame extraction processes")
+    parser.add_argument("--image_format", choices=list(IMAGE_FORMATS), default=ImageEncoding.format)
+    parser.add_argument("--image_quality", type=int, default=ImageEncoding.quality,
+                        help="JPEG/WebP quality (0-100)")
+    parser.add_argument("--keyframes", type=int, default=ImageEncoding.keyframes,
+                        help="Extra frames from the middle of each video")
+    parser.add_argument("--keyframe_mode", choices=KEYFRAME_MODES, default=ImageEncoding.keyframe_mode,
+                        help="Evenly spaced frames or the largest scene changes")
+    parser.add_argument("--max_image_dim", type=int, default=ImageEncoding.max_dim,
+                        help="Downscale frames to at most this width/height (0 = full size)")
+    parser.add_argument("--save_screenshots", action="store_true",
+                        help="Also write the encoded frames to <output_dir>/screenshots")
+    parser.add_argument("--follow", type=str, default=None,
+                        help="Render manifest to follow; builds requests as renders finish")
+    parser.add_argument("--max_shard_mb", type=int, default=MAX_BATCH_BYTES // (1024 * 1024),
+                        help="Start a new batch input file before this size")
+    parser.add_argument("--max_shard_requests", type=int, default=MAX_BATCH_REQUESTS,
+                        help="Start a new batch input file after this many requests")
+    parser.add_argument("--upload_workers", type=int, default=UPLOAD_WORKERS, help="Concurrent shard uploads")
+    parser.add_argument("--no_upload", action="store_true", help="Only write the batch input shards")
+    parser.add_argument("--import_legacy", action="store_true",
+                        help="Index the {batch_id}_descriptions.json files of earlier runs first")
+    parser.add_argument("--duplicates", type=str, default=None,
+                        help="duplicates.json from video_dedup.py; duplicate videos are not described")
+    args = parser.parse_args(argv)
     os.makedirs(args.output_dir, exist_ok=True)
-    args.output_jsonl = os.path.join(args.output_dir, "batch_input.jsonl")
-    if args.retrieve:
-        batch_id = input("Enter the batch ID to retrieve: ")
-        fetch_batch_by_id(batch_id, args.output_dir)
-        exit(0)
+    if args.collect:
+        manifest = BatchManifest(os.path.join(args.output_dir, BATCH_MANIFEST))
+        known = manifest.batches()
+        for batch_id in args.batch_id or []:
+            if batch_id not in known:
+                manifest.record(batch_id, status="submitted")
+        collect_descriptions(args.output_dir, args.poll_interval)
+        return
 
+    encoding = ImageEncoding(args.image_format, args.image_quality, args.max_image_dim,
+                             args.keyframes, args.keyframe_mode)
+    manifest = BatchManifest(os.path.join(args.output_dir, BATCH_MANIFEST))
+    index = DescriptionIndex(os.path.join(args.output_dir, DESCRIPTION_INDEX))
+    if args.import_legacy:
+        import_legacy_descriptions(args.output_dir, args.video_dir, args.code_dir, index)
+    duplicates = load_duplicates(args.duplicates)
+    metadata = {"description": "Description extraction batch", "source": args.video_dir}
+    with ShardUploader(manifest, metadata, workers=args.upload_workers) as uploader, ShardWriter(
+        os.path.join(args.output_dir, "batch_inputs"), f"batch_input_{time.strftime('%Y%m%d_%H%M%S')}",
+        max_bytes=args.max_shard_mb * 1024 * 1024,
+        max_requests=args.max_shard_requests,
+        on_shard=None if args.no_upload else uploader,
+    ) as writer:
+        if args.follow:
+            follow_renders(args.follow, args.output_dir, writer, index, encoding=encoding,
+                           save_screenshots=args.save_screenshots, duplicates=duplicates)
+        else:
+            process_videos(
+                video_dir=args.video_dir,
+                code_dir=args.code_dir,
+                output_dir=args.output_dir,
+                writer=writer,
+                index=index,
+                workers=args.workers,
+                encoding=encoding,
+                save_screenshots=args.save_screenshots,
+                duplicates=duplicates,
+            )
+    print(f"📦 Batch ids are tracked in {manifest.path}")
 
-    process_videos(
-        video_dir=args.video_dir,
-        code_dir=args.code_dir,
-        output_dir=args.output_dir
-    )
-    upload_jsonl_file(args.output_jsonl, source=args.video_dir)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+Groups the error logs in err/ by normalized traceback signature
+(exception type, failing symbol, manim API) so the most common failures
+can be fixed in bulk.
+
+Usage
+-----
+    python error_clusters.py --err_dir ../err --top 20
+    python error_clusters.py --err_dir ../err --output ../err/clusters.json
+"""
+import argparse
+import json
+import os
+import re
+from collections import namedtuple
+from pathlib import Path
+
+Signature = namedtuple("Signature", ["exc_type", "symbol", "api"])
+
+EXCEPTION_RE = re.compile(
+    r"^\s*(?:[│|]\s*)?([A-Za-z_][\w.]*(?:Error|Exception|Exit|Interrupt|Expired|Warning))\s*(?::\s*(.*))?$",
+    re.MULTILINE,
+)
+# Plain tracebacks and rich (manim) tracebacks
+FRAME_RES = [
+    re.compile(r'File "([^"]+)", line \d+, in (\S+)'),
+    re.compile(r"([\w./\\:-]+\.py):\d+ in (\S+)"),
+]
+SYMBOL_RES = [
+    re.compile(r"name '([\w.]+)' is not defined"),
+    re.compile(r"No module named '([\w.]+)'"),
+    re.compile(r"cannot import name '([\w.]+)'"),
+    re.compile(r"has no attribute '([\w.]+)'"),
+    re.compile(r"unexpected keyword argument '([\w.]+)'"),
+    re.compile(r"missing \d+ required positional arguments?: '([\w.]+)'"),
+    re.compile(r"'(\w+)' object is not (?:callable|subscriptable|iterable)"),
+]
+FILE_RE = re.compile(r"[\w./\\-]+\.(png|jpe?g|svg|gif|csv|txt|json|wav|mp3|ttf|otf)\b", re.I)
+SCRIPT_RES = [
+    re.compile(r"^Error in (\S+\.py) for"),
+    re.compile(r"^Running: manim .* (\S+\.py) \w+"),
+]
+
+
+def iter_error_files(err_dir):
+    """
+    Yields error log paths under err_dir (recursively) without listing the whole tree first.
+    """
+    stack = [Path(err_dir)]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(Path(entry.path))
+                elif entry.is_file() and not entry.name.endswith(".json"):
+                    yield Path(entry.path)
+
+
+def normalize_message(message):
+    """
+    Strips the instance-specific parts (paths, numbers, quoted values) from an error message.
+    """
+    message = re.sub(r"0x[0-9a-fA-F]+", "<addr>", message)
+    message = re.sub(r"(?:[A-Za-z]:)?[\w.-]*[/\\][\w./\\-]+", "<path>", message)
+    message = re.sub(r"'[^']*'|\"[^\"]*\"", "<str>", message)
+    message = re.sub(r"\d+(?:\.\d+)?", "<n>", message)
+    return message.strip()[:120]
+
+
+def manim_api(text):
+    """
+    Returns the innermost manim frame of the traceback as 'module.function', e.g. 'tex_mobject.__init__'.
+    """
+    api = None
+    for frame_re in FRAME_RES:
+        for path, func in frame_re.findall(text):
+            parts = re.split(r"[/\\]", path)
+            if "manim" in parts[:-1]:
+                api = f"{Path(parts[-1]).stem}.{func}"
+    return api
+
+
+def error_signature(text):
+    """
+    Normalizes an error log into (exception type, failing symbol, manim API name).
+    """
+    if "timed out after" in text:
+        return Signature("TimeoutExpired", None, None)
+    if "finished without writing an MP4" in text:
+        return Signature("NoOutput", None, None)
+
+    matches = EXCEPTION_RE.findall(text)
+    exc_type, message = matches[-1] if matches else ("Unknown", "")
+    exc_type = exc_type.split(".")[-1]
+
+    symbol = None
+    for symbol_re in SYMBOL_RES:
+        match = symbol_re.search(message or text)
+        if match:
+            symbol = match.group(1)
+            break
+    if symbol is None:
+        match = FILE_RE.search(message or "")
+        if match:
+            symbol = f"*.{match.group(1).lower()}"
+    if symbol is None and message:
+        symbol = normalize_message(message)
+    return Signature(exc_type, symbol, manim_api(text))
+
+
+def script_path(text):
+    """
+    The script an error log belongs to, taken from the header the compile stage writes.
+    """
+    first_line = text.split("\n", 1)[0]
+    for script_re in SCRIPT_RES:
+        match = script_re.search(first_line)
+        if match:
+            return match.group(1)
+    return None
+
+
+def cluster_errors(err_dir):
+    """
+    Streams the error logs and groups them by signature.
+
+    Returns:
+        List of clusters sorted by size, each a dict with id, signature, count and files.
+    """
+    clusters = {}
+    for err_file in iter_error_files(err_dir):
+        text = err_file.read_text(encoding="utf-8", errors="replace")
+        signature = error_signature(text)
+        cluster = clusters.setdefault(signature, {"signature": signature._asdict(), "count": 0, "files": []})
+        cluster["count"] += 1
+        cluster["files"].append({"error": str(err_file), "script": script_path(text)})
+
+    ordered = sorted(clusters.values(), key=lambda c: c["count"], reverse=True)
+    for cluster_id, cluster in enumerate(ordered):
+        cluster["id"] = cluster_id
+    return ordered
+
+
+def load_cluster_scripts(clusters_path, cluster_ids=None):
+    """
+    Returns the script paths of the given clusters (all clusters if cluster_ids is None),
+    so fixing stages can work through a whole cluster at once.
+    """
+    with open(clusters_path, "r", encoding="utf-8") as f:
+        clusters = json.load(f)
+    scripts = []
+    for cluster in clusters:
+        if cluster_ids is not None and cluster["id"] not in cluster_ids:
+            continue
+        scripts += [entry["script"] for entry in cluster["files"] if entry["script"]]
+    return list(dict.fromkeys(scripts))
+
+
+def print_report(clusters, top=20, examples=3):
+    total = sum(cluster["count"] for cluster in clusters)
+    print(f"Total errors: {total}, clusters: {len(clusters)}")
+    for cluster in clusters[:top]:
+        sig = cluster["signature"]
+        share = cluster["count"] / total if total else 0
+        print(f"\n#{cluster['id']:<4} {cluster['count']:>6} ({share:.1%})  {sig['exc_type']}"
+              f"  symbol={sig['symbol']}  api={sig['api']}")
+        for entry in cluster["files"][:examples]:
+            print(f"        {entry['error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cluster compile errors by traceback signature.")
+    parser.add_argument("--err_dir", type=str, default="../err", help="Directory of error logs")
+    parser.add_argument("--output", type=str, default=None, help="Write all clusters to this JSON file")
+    parser.add_argument("--top", type=int, default=20, help="Number of clusters to print")
+    parser.add_argument("--examples", type=int, default=3, help="Example files printed per cluster")
+    args = parser.parse_args()
+
+    clusters = cluster_errors(args.err_dir)
+    print_report(clusters, top=args.top, examples=args.examples)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(clusters, f, ensure_ascii=False, indent=2)
+        print(f"\n✅ Clusters saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
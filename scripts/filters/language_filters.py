@@ -1,9 +1,7 @@
 import re
 from collections import Counter
 
-from fast_langdetect import detect_language
-
-from scripts.config import ACCEPTED_LANGUAGES
+from scripts.config import ACCEPTED_LANGUAGES, LANGDETECT_LOW_MEMORY
 
 
 def extract_comments_and_strings(code: str) -> list[str]:
@@ -21,15 +19,18 @@ def detect_language_sliding_window(words: list, window_size: int = 10, step: int
     Slide a window over the words list and detect language for each window.
     Return the majority-vote language.
     """
+    # imported on first use, so importing the filters does not load fastText
+    from fast_langdetect import detect_language
+
     if len(words) < window_size:
         snippet = " ".join(words)
-        return detect_language(snippet, low_memory=False).upper()
+        return detect_language(snippet, low_memory=LANGDETECT_LOW_MEMORY).upper()
 
     lang_counts = Counter()
     for k in range(0, len(words) - window_size + 1, step):
         snippet = " ".join(words[k:k + window_size])
         try:
-            lang = detect_language(snippet, low_memory=False).upper()
+            lang = detect_language(snippet, low_memory=LANGDETECT_LOW_MEMORY).upper()
             lang_counts[lang] += 1
         except Exception as e:
             print(f"Error detecting language in sliding window: {e}")
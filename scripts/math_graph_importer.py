@@ -1,22 +1,12 @@
+import argparse
 import math
 import os
-import sys
 import time
 
-from datasets import load_dataset
+from scripts.config import EXTENSIONS, PY_KEYWORDS
+from scripts.filters.library_filters import filter_example
+from scripts.util.stack import stream_stack
 
-from config import PY_KEYWORDS
-from filters.library_filters import filter_example
-from scripts.config import EXTENSIONS
-
-library_type = sys.argv[1] if len(sys.argv) > 1 else None
-if not library_type or library_type not in PY_KEYWORDS.keys():
-    raise ValueError(f"Invalid datatype. Choose from {PY_KEYWORDS.keys()}.")
-
-MAX_RESULTS = int(sys.argv[2]) if len(sys.argv) > 2 else math.inf
-
-language_type = "tex" if library_type == "tikz" else "svg" if library_type == "svg" else "python"
-dataset = load_dataset("bigcode/the-stack-dedup", data_dir=f"data/{language_type}", split="train", streaming=True)
 
 def save_example(code: str, index: int, label: str) -> None:
     ext = EXTENSIONS.get(label, [".py"])[0]
@@ -26,25 +16,6 @@ def save_example(code: str, index: int, label: str) -> None:
         f.write(code)
     print(f"Saved {filename}")
 
-# ========= Main Loop =========
-saved_count = 0
-label_indices = {}
-
-start_time = time.time()
-print(f"Starting to save examples for {library_type}...")
-for i, example in enumerate(dataset):
-    result = filter_example(example)
-    if result:
-        label, code = result
-        if label not in label_indices:
-            label_indices[label] = 0
-        save_example(code, label_indices[label], label)
-        label_indices[label] += 1
-        saved_count += 1
-        if saved_count > MAX_RESULTS:
-            break
-
-end_time = time.time()
 
 # Format time to HH:MM:SS
 def format_time(seconds: int) -> str:
@@ -53,4 +24,37 @@ def format_time(seconds: int) -> str:
     return f"{hours:02}:{minutes:02}:{seconds:02}"
 
 
-print(f"Saved {saved_count} examples in {format_time(int(end_time - start_time))}")
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sample animation scripts of one library from The Stack.")
+    parser.add_argument("library_type", choices=list(PY_KEYWORDS), help="Library to sample")
+    parser.add_argument("max_results", type=int, nargs="?", default=math.inf, help="Stop after this many examples")
+    args = parser.parse_args(argv)
+
+    library_type = args.library_type
+    language_type = "tex" if library_type == "tikz" else "svg" if library_type == "svg" else "python"
+    dataset = stream_stack(f"data/{language_type}")
+
+    # ========= Main Loop =========
+    saved_count = 0
+    label_indices = {}
+
+    start_time = time.time()
+    print(f"Starting to save examples for {library_type}...")
+    for i, example in enumerate(dataset):
+        result = filter_example(example)
+        if result:
+            label, code = result
+            if label not in label_indices:
+                label_indices[label] = 0
+            save_example(code, label_indices[label], label)
+            label_indices[label] += 1
+            saved_count += 1
+            if saved_count > args.max_results:
+                break
+
+    end_time = time.time()
+    print(f"Saved {saved_count} examples in {format_time(int(end_time - start_time))}")
+
+
+if __name__ == "__main__":
+    main()
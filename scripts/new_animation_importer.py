@@ -4,9 +4,10 @@ import json
 import re
 from pathlib import Path
 
-from datasets import load_dataset
 from tqdm.auto import tqdm
 
+from scripts.util.stack import stream_stack
+
 FILTERS = {
     "pyvista": {
         "import": re.compile(r"^\s*(?:from|import)\s+pyvista\b", re.I | re.M),
@@ -51,12 +52,7 @@ def scan_python_files():
             continue
         (ROOT / lib).mkdir(parents=True, exist_ok=True)
 
-    dataset = load_dataset(
-        "bigcode/the-stack-dedup",
-        data_dir="data/python",
-        split="train",
-        streaming=True,
-    )
+    dataset = stream_stack("data/python")
 
     for ex in tqdm(dataset, desc="Scanning The-Stack-dedup (Python)"):
         code = ex.get("content") or ""
@@ -73,12 +69,7 @@ def scan_python_files():
 def scan_json_files():
     (ROOT / "lottie").mkdir(parents=True, exist_ok=True)
 
-    dataset = load_dataset(
-        "bigcode/the-stack-dedup",
-        data_dir="data/json",
-        split="train",
-        streaming=True,
-    )
+    dataset = stream_stack("data/json")
 
     for ex in tqdm(dataset, desc="Scanning The-Stack-dedup (JSON)"):
         text = ex.get("content") or ""
@@ -0,0 +1,333 @@
+"""
+Runs the stages of the data pipeline at the same time instead of one batch script after
+another: Stack scan -> library filter -> dedup -> scene split (manim) or augmentation ->
+render (with the rule and LLM fix tiers) -> frame extraction -> description batch shards.
+
+Every stage has its own worker pool and reads from a bounded queue, so a slow stage makes
+the stages before it wait instead of piling up work in memory, and the render workers and
+the LLM quota are busy while the Stack scan is still running. The first batch shard is
+uploaded as soon as it is full.
+
+Usage
+-----
+    python -m scripts.pipeline manim --max_examples 20000
+    python -m scripts.pipeline matplotlib --input_dir sampled/matplotlib --render_workers 8
+    python -m scripts.pipeline manim --source_parquet corpus.parquet --workspace /tmp/bench
+"""
+import argparse
+import glob
+import hashlib
+import itertools
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from pathlib import Path
+from typing import Callable
+
+from scripts.compile.compile_scripts import PROBE_TIMEOUT, RUNS_DIR, SCRIPT_FOLDERS, TIMEOUT, WORKERS
+from scripts.compile.render_engine import BACKENDS, RenderEngine, RenderPolicy
+from scripts.config import LLM_MAX_CONCURRENCY, PROJECT_ROOT
+from scripts.data_augmenter import PROMPTS, augment_file
+from scripts.description_extractor import (
+    BATCH_MANIFEST, DESCRIPTION_INDEX, ImageEncoding, build_request, prompt_version
+)
+from scripts.filters.library_filters import filter_example
+from scripts.scene_extractor import extract_with_llm, split_file
+from scripts.util.batch_jobs import UPLOAD_WORKERS, BatchManifest, ShardUploader, ShardWriter
+from scripts.util.description_index import DescriptionIndex
+from scripts.util.llm_cache import get_llm_cache
+from scripts.util.metrics import metrics
+from scripts.util.prompt_reduction import reduction_report
+from scripts.util.stack import iter_parquet, stream_stack
+from scripts.video_dedup import is_duplicate, load_duplicates
+
+QUEUE_SIZE = 64
+STATUS_INTERVAL = 30  # seconds
+_DONE = object()  # end-of-stream marker passed down the queues
+
+
+@dataclass
+class Stage:
+    """
+    One step of a pipeline.
+
+    Attributes:
+        name: Label in the status lines and metrics.
+        fn: Called with one input item; returns an iterable of output items (empty to drop the item).
+        workers: Threads running fn at the same time.
+        queue_size: Most items waiting in front of the stage; while it is full the stage before blocks.
+    """
+    name: str
+    fn: Callable
+    workers: int = 1
+    queue_size: int = QUEUE_SIZE
+
+
+class Pipeline:
+    """
+    Connects a source iterable and a chain of stages with bounded queues and runs them all
+    concurrently. A failing item is logged and dropped; it does not stop the pipeline.
+    """
+
+    def __init__(self, source, stages, status_interval=STATUS_INTERVAL):
+        self.source = source
+        self.stages = stages
+        self.status_interval = status_interval
+        self.queues = [queue.Queue(maxsize=stage.queue_size) for stage in stages]
+        self.counts = {stage.name: {"in": 0, "out": 0, "failed": 0, "cpu": 0.0} for stage in stages}
+        self._active = [stage.workers for stage in stages]
+        self._lock = threading.Lock()
+
+    def _count(self, stage, field, value=1):
+        with self._lock:
+            self.counts[stage.name][field] += value
+        metrics.incr(f"pipeline.{stage.name}.{field}", value)
+
+    def _put(self, position, item):
+        if position < len(self.queues):
+            self.queues[position].put(item)
+
+    def _feed(self):
+        try:
+            for item in self.source:
+                self._put(0, item)
+        except Exception as e:
+            print(f"❌ Pipeline source failed: {e}")
+        finally:
+            self._put(0, _DONE)
+
+    def _work(self, position):
+        stage = self.stages[position]
+        inbox = self.queues[position]
+        while True:
+            item = inbox.get()
+            if item is _DONE:
+                inbox.put(_DONE)  # for the other workers of this stage
+                break
+            self._count(stage, "in")
+            produced = 0
+            cpu = time.thread_time()
+            try:
+                with metrics.timer(f"pipeline.{stage.name}"):
+                    for output in stage.fn(item) or ():
+                        self._put(position + 1, output)
+                        produced += 1
+            except Exception as e:
+                print(f"❌ {stage.name} failed on {str(item)[:200]}: {e}")
+                self._count(stage, "failed")
+            self._count(stage, "out", produced)
+            self._count(stage, "cpu", time.thread_time() - cpu)
+
+        with self._lock:
+            self._active[position] -= 1
+            last = self._active[position] == 0
+        if last:
+            self._put(position + 1, _DONE)
+
+    def status(self):
+        with self._lock:
+            return " | ".join(
+                f"{stage.name}: {inbox.qsize()} queued, {self.counts[stage.name]['in']} in, "
+                f"{self.counts[stage.name]['out']} out, {self.counts[stage.name]['failed']} failed"
+                for stage, inbox in zip(self.stages, self.queues)
+            )
+
+    def run(self):
+        """
+        Runs until the source is exhausted and every stage has drained its queue.
+
+        Returns:
+            Per stage: the number of items in, out and failed, and the CPU seconds of its worker
+            threads (without the subprocesses and process pools they wait on).
+        """
+        threads = [threading.Thread(target=self._feed, name="pipeline-source", daemon=True)]
+        for position, stage in enumerate(self.stages):
+            threads += [threading.Thread(target=self._work, args=(position,), name=f"pipeline-{stage.name}-{i}",
+                                         daemon=True) for i in range(stage.workers)]
+        for thread in threads:
+            thread.start()
+
+        next_status = time.time() + self.status_interval
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(timeout=1)
+                if time.time() >= next_status:
+                    print(f"📊 {self.status()}")
+                    next_status += self.status_interval
+        print(f"📊 {self.status()}")
+        return self.counts
+
+
+#################################
+# Stages
+def keep_library(example, library):
+    result = filter_example(example)
+    return [result[1]] if result and result[0] == library else []
+
+
+class ContentDedup:
+    """
+    Writes every script once to output_dir as example_<sha1>.py. Exact copies of a script seen
+    in this run or already in output_dir are dropped; different scripts that render to the
+    same animation are found later by video_dedup.py.
+    """
+
+    def __init__(self, output_dir):
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self._seen = {hashlib.sha1(path.read_bytes()).hexdigest() for path in self.output_dir.glob("*.py")}
+        self._lock = threading.Lock()
+
+    def __call__(self, code):
+        data = code.encode("utf-8")
+        digest = hashlib.sha1(data).hexdigest()
+        with self._lock:
+            if digest in self._seen:
+                metrics.incr("pipeline.dedup.duplicates")
+                return []
+            self._seen.add(digest)
+        path = self.output_dir / f"example_{digest[:16]}.py"
+        path.write_bytes(data)
+        return [path]
+
+
+def split_scenes(script, output_dir, use_llm):
+    written, fallbacks = split_file(script, output_dir)
+    if not fallbacks or not use_llm:
+        return written
+    for file_path, scene in fallbacks:
+        extract_with_llm(file_path, scene, output_dir)
+    # the LLM writes <stem>_<scene>.py like the static split
+    pattern = os.path.join(glob.escape(str(output_dir)), f"{glob.escape(Path(script).stem)}_*.py")
+    return sorted(set(written) | {Path(path) for path in glob.glob(pattern)})
+
+
+def augment(script, prompt, output_dir):
+    path = augment_file(script, prompt, output_dir)
+    return [Path(path)] if path else []
+
+
+def render(script, engine):
+    outputs = []
+    for result in engine.render_file(script):
+        metrics.incr("jobs.failed" if result.error else "jobs.ok")
+        outputs += [(video, script, result.job.scene) for video in result.outputs]
+    return outputs
+
+
+def extract_frames(render_output, executor, index, encoding, output_image_dir, duplicates):
+    video, script, scene = render_output
+    if is_duplicate(video, duplicates):
+        return []
+    key = index.sample_key(video, script, prompt_version(encoding))
+    if not index.needs_description(key, Path(video).stem):
+        return []
+    # decoding and encoding are CPU-bound, so they run in the process pool
+    request = executor.submit(build_request, str(video), str(script), output_image_dir, scene, encoding).result()
+    return [(request, key)] if request is not None else []
+
+
+def write_request(item, writer, index):
+    request, key = item
+    writer.write(request)
+    index.mark_pending(key, request["custom_id"])
+    return [request["custom_id"]]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the import, augment, render and describe stages concurrently.")
+    parser.add_argument("library", choices=sorted(BACKENDS), help="Library to collect")
+    parser.add_argument("--input_dir", type=Path, default=None,
+                        help="Start from these scripts instead of scanning The Stack")
+    parser.add_argument("--source_parquet", type=Path, default=None,
+                        help="Scan a local Stack-style parquet file (a `content` column) instead of The Stack")
+    parser.add_argument("--max_examples", type=int, default=None, help="Stop the Stack scan after this many files")
+    parser.add_argument("--workspace", type=Path, default=PROJECT_ROOT,
+                        help="Root of the sampled/, rendered/, err/, runs/ and output/ directories")
+    parser.add_argument("--output_dir", type=str, default=None,
+                        help="Output directory of the description stage "
+                             "(default: <workspace>/output/description_extraction)")
+    parser.add_argument("--duplicates", type=str, default=None,
+                        help="duplicates.json from video_dedup.py; duplicate videos are not described")
+    parser.add_argument("--no_augment", action="store_true", help="Render matplotlib/vpython scripts as sampled")
+    parser.add_argument("--no_llm", action="store_true", help="No LLM scene extraction or LLM fixes")
+    parser.add_argument("--no_describe", action="store_true", help="Stop after rendering")
+    parser.add_argument("--no_upload", action="store_true", help="Only write the batch input shards")
+    parser.add_argument("--filter_workers", type=int, default=4)
+    parser.add_argument("--llm_workers", type=int, default=LLM_MAX_CONCURRENCY,
+                        help="Threads for augmentation and LLM scene extraction")
+    parser.add_argument("--render_workers", type=int, default=WORKERS)
+    parser.add_argument("--frame_workers", type=int, default=os.cpu_count(), help="Frame extraction processes")
+    parser.add_argument("--queue_size", type=int, default=QUEUE_SIZE, help="Bound of every queue between stages")
+    parser.add_argument("--timeout", type=int, default=TIMEOUT, help="Seconds allowed per full render")
+    parser.add_argument("--status_interval", type=int, default=STATUS_INTERVAL)
+    args = parser.parse_args(argv)
+
+    start_time = time.time()
+    workspace = args.workspace
+    args.output_dir = args.output_dir or str(workspace / "output" / "description_extraction")
+    metrics.configure(workspace / RUNS_DIR.name / f"pipeline_{args.library}_{time.strftime('%Y%m%d_%H%M%S')}")
+    folder = SCRIPT_FOLDERS[args.library]
+    sampled_dir = workspace / "sampled" / args.library
+    scripts_dir = workspace / "sampled" / folder
+    scripts_dir.mkdir(parents=True, exist_ok=True)
+
+    stages = []
+    if args.input_dir:
+        source = sorted(Path(args.input_dir).glob("*.py"))
+    else:
+        stack = iter_parquet(args.source_parquet) if args.source_parquet else stream_stack("data/python")
+        source = itertools.islice(stack, args.max_examples)
+        stages += [
+            Stage("filter", partial(keep_library, library=args.library), args.filter_workers, args.queue_size),
+            Stage("dedup", ContentDedup(sampled_dir), 1, args.queue_size),
+        ]
+    if args.library == "manim":
+        stages.append(Stage("split", partial(split_scenes, output_dir=scripts_dir, use_llm=not args.no_llm),
+                            args.llm_workers, args.queue_size))
+    elif not args.no_augment:
+        stages.append(Stage("augment", partial(augment, prompt=PROMPTS[args.library], output_dir=scripts_dir),
+                            args.llm_workers, args.queue_size))
+
+    policy = RenderPolicy(timeout=args.timeout, probe_timeout=PROBE_TIMEOUT, fix_attempts=0 if args.no_llm else 1)
+    engine = RenderEngine(BACKENDS[args.library](), workspace / "rendered" / folder, workspace / "err" / folder,
+                          policy=policy, workers=args.render_workers)
+    stages.append(Stage("render", partial(render, engine=engine), args.render_workers, args.queue_size))
+
+    if args.no_describe:
+        Pipeline(source, stages, args.status_interval).run()
+    else:
+        os.makedirs(args.output_dir, exist_ok=True)
+        encoding = ImageEncoding()
+        index = DescriptionIndex(os.path.join(args.output_dir, DESCRIPTION_INDEX))
+        manifest = BatchManifest(os.path.join(args.output_dir, BATCH_MANIFEST))
+        metadata = {"description": "Description extraction batch", "source": f"pipeline:{args.library}"}
+        with ProcessPoolExecutor(max_workers=args.frame_workers) as executor, \
+                ShardUploader(manifest, metadata, workers=UPLOAD_WORKERS) as uploader, \
+                ShardWriter(os.path.join(args.output_dir, "batch_inputs"),
+                            f"batch_input_{time.strftime('%Y%m%d_%H%M%S')}",
+                            on_shard=None if args.no_upload else uploader) as writer:
+            stages += [
+                Stage("frames", partial(extract_frames, executor=executor, index=index, encoding=encoding,
+                                        output_image_dir=None,
+                                        duplicates=load_duplicates(args.duplicates)),
+                      args.frame_workers, args.queue_size),
+                # the shard writer is not thread-safe, so a single worker appends the requests
+                Stage("describe", partial(write_request, writer=writer, index=index), 1, args.queue_size),
+            ]
+            Pipeline(source, stages, args.status_interval).run()
+        print(f"📦 Batch ids are tracked in {manifest.path}")
+    engine.collector.close()
+
+    metrics.write_snapshot()
+    print(f"✂️ Prompt reduction:\n{reduction_report(metrics.snapshot()['counters'])}")
+    print(get_llm_cache().report())
+    print(f"⏰ Total time taken: {time.time() - start_time:.2f} seconds")
+
+
+if __name__ == "__main__":
+    main()
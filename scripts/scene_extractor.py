@@ -1,41 +1,255 @@
+"""
+Splits multi-scene manim files into one standalone file per Scene class.
+
+Each scene is extracted statically: the file is parsed and the scene class is kept
+together with the module-level imports, configuration statements and the helpers,
+constants and base classes it transitively uses. Only files that cannot be analysed
+statically (syntax errors, globals()/exec tricks, scenes defined dynamically) fall
+back to the LLM.
+
+Usage
+-----
+    python -m scripts.scene_extractor --input_dir sampled/manim --output_dir sampled/manim_scenes
+"""
+import argparse
+import ast
 import os
-import re
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
 
-from scripts.compile.code_fixer import generate_extracted_scene
+from scripts.config import LLM_MAX_CONCURRENCY
 
 MANIM_DIR = "../sampled/manim"
 OUTPUT_DIR = "../sampled/manim_scenes"
-if not os.path.exists(OUTPUT_DIR):
-    os.makedirs(OUTPUT_DIR)
-#
-for root, _, files in os.walk(MANIM_DIR):
-    for f in files:
-        if f.endswith(".py"):
-            file_path = os.path.join(root, f)
-            try:
-                with open(file_path, 'r', encoding='utf-8') as file:
-                    content = file.read()
-                    scenes = re.findall(r'class\s+([A-Za-z_][\w]*)\s*\(\s*Scene\s*\)', content)
-                    if not scenes:
-                        print(f"No scenes found in {file_path}")
-                        continue
-                    if len(scenes) == 1:
-                        scene_filename = f"{os.path.splitext(f)[0]}_{scene}.py"
-                        scene_path = os.path.join(OUTPUT_DIR, scene_filename)
-                        with open(scene_path, 'w', encoding='utf-8') as scene_file:
-                            scene_file.write(scene_code)
-                        continue
-                    for scene in scenes:
-                        scene_code = generate_extracted_scene(content, scene)
-
-                        scene_code = content if scene_code == "No change needed" else scene_code
-                        if scene_code:
-                            scene_filename = f"{os.path.splitext(f)[0]}_{scene}.py"
-                            scene_path = os.path.join(OUTPUT_DIR, scene_filename)
-                            with open(scene_path, 'w', encoding='utf-8') as scene_file:
-                                scene_file.write(scene_code)
-                            print(f"Extracted scene '{scene}' to {scene_path}")
 
+# Names whose use means the set of referenced globals cannot be determined statically
+DYNAMIC_NAMES = {"globals", "locals", "vars", "exec", "eval", "__import__", "importlib"}
+
+
+def bound_names(stmt):
+    """
+    Module-level names a top-level statement binds (not descending into function or class bodies).
+    """
+    names = set()
+    stack = [stmt]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(node.name)
+            stack.extend(node.decorator_list)
+            if isinstance(node, ast.ClassDef):
+                stack.extend(node.bases)
+            continue
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names:
+                if alias.name != "*":
+                    names.add((alias.asname or alias.name).split(".")[0])
+            continue
+        if isinstance(node, ast.Name) and isinstance(node.ctx, (ast.Store, ast.Del)):
+            names.add(node.id)
+        stack.extend(ast.iter_child_nodes(node))
+    return names
+
+
+def used_names(stmt):
+    return {node.id for node in ast.walk(stmt) if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load)}
+
+
+def base_name(expr):
+    if isinstance(expr, ast.Name):
+        return expr.id
+    if isinstance(expr, ast.Attribute):
+        return expr.attr
+    return None
+
+
+def find_scene_classes(tree):
+    """
+    Top-level classes deriving from a manim scene (Scene, ThreeDScene, ... or a local scene class).
+    """
+    classes = {stmt.name: stmt for stmt in tree.body if isinstance(stmt, ast.ClassDef)}
+    scenes = []
+    changed = True
+    while changed:
+        changed = False
+        for name, cls in classes.items():
+            if name in scenes:
+                continue
+            for base in map(base_name, cls.bases):
+                if base in scenes or (base not in classes and base and base.endswith("Scene")):
+                    scenes.append(name)
+                    changed = True
+                    break
+    return [name for name in classes if name in scenes]
+
+
+def is_main_guard(stmt):
+    return (isinstance(stmt, ast.If) and isinstance(stmt.test, ast.Compare)
+            and isinstance(stmt.test.left, ast.Name) and stmt.test.left.id == "__name__")
+
+
+def statement_lines(stmt):
+    first = min([stmt.lineno] + [d.lineno for d in getattr(stmt, "decorator_list", [])])
+    return first, stmt.end_lineno
+
+
+def extract_scene(code, scene_name, tree=None):
+    """
+    Builds a standalone file for one scene class of a manim module.
+
+    Returns:
+        The extracted source code.
+
+    Raises:
+        ValueError: If the scene cannot be extracted statically.
+    """
+    tree = tree or ast.parse(code)
+    scenes = set(find_scene_classes(tree))
+    if scene_name not in scenes:
+        raise ValueError(f"Scene {scene_name} is not a top-level scene class")
+
+    definitions = {}
+    side_effects = []
+    for index, stmt in enumerate(tree.body):
+        if is_main_guard(stmt):
+            continue
+        names = bound_names(stmt)
+        if isinstance(stmt, (ast.Import, ast.ImportFrom)):
+            side_effects.append(index)
+        elif not names:
+            # configuration like `config.frame_rate = 30`; render calls of other scenes are dropped
+            if not (used_names(stmt) & (scenes - {scene_name})):
+                side_effects.append(index)
+        for name in names:
+            definitions.setdefault(name, []).append(index)
+
+    target = next(i for i, stmt in enumerate(tree.body)
+                  if isinstance(stmt, ast.ClassDef) and stmt.name == scene_name)
+    keep = set()
+    pending = [target] + side_effects
+    while pending:
+        index = pending.pop()
+        if index in keep:
+            continue
+        keep.add(index)
+        uses = used_names(tree.body[index])
+        if uses & DYNAMIC_NAMES:
+            raise ValueError(f"{scene_name} uses {sorted(uses & DYNAMIC_NAMES)}")
+        for name in uses:
+            pending.extend(definitions.get(name, []))
+
+    lines = code.splitlines()
+    parts = []
+    previous = None
+    for index in sorted(keep):
+        first, last = statement_lines(tree.body[index])
+        if previous is not None and index == previous + 1:
+            # adjacent statements keep the original spacing and comments between them
+            parts[-1] += "\n" + "\n".join(lines[tree.body[previous].end_lineno:last])
+        else:
+            parts.append("\n".join(lines[first - 1:last]))
+        previous = index
+    return "\n\n\n".join(parts) + "\n"
+
+
+def write_scene(output_dir, file_path, scene, scene_code):
+    scene_path = Path(output_dir) / f"{Path(file_path).stem}_{scene}.py"
+    scene_path.write_text(scene_code, encoding="utf-8")
+    return scene_path
+
+
+def split_file(file_path, output_dir):
+    """
+    Extracts every scene of one file. Runs in a worker process.
+
+    Returns:
+        (paths of the scene files written, scenes that need the LLM fallback)
+    """
+    with open(file_path, "r", encoding="utf-8") as file:
+        content = file.read()
+    try:
+        tree = ast.parse(content)
+    except SyntaxError as e:
+        print(f"⚠️ Cannot parse {file_path}: {e}")
+        return [], [(file_path, None)]
+
+    scenes = find_scene_classes(tree)
+    if not scenes:
+        print(f"No scenes found in {file_path}")
+        return [], []
+    if len(scenes) == 1:
+        return [write_scene(output_dir, file_path, scenes[0], content)], []
+
+    written = []
+    fallbacks = []
+    for scene in scenes:
+        try:
+            scene_code = extract_scene(content, scene, tree)
+        except ValueError as e:
+            print(f"⚠️ {file_path}: {e}, falling back to the LLM")
+            fallbacks.append((file_path, scene))
+            continue
+        written.append(write_scene(output_dir, file_path, scene, scene_code))
+    return written, fallbacks
+
+
+def extract_with_llm(file_path, scene, output_dir):
+    # imported here: the static path (and prompt_reduction) should not load the LLM and render stages
+    from scripts.compile.code_fixer import generate_extracted_scene
+    from scripts.compile.render_engine import SCENE_CLASS_RE
+
+    with open(file_path, "r", encoding="utf-8") as file:
+        content = file.read()
+    scenes = [scene] if scene else SCENE_CLASS_RE.findall(content)
+    for scene in scenes:
+        scene_code = generate_extracted_scene(content, scene)
+        scene_code = content if scene_code == "No change needed" else scene_code
+        if scene_code:
+            scene_path = write_scene(output_dir, file_path, scene, scene_code)
+            print(f"Extracted scene '{scene}' to {scene_path} with the LLM")
+
+
+def iter_python_files(input_dir):
+    for root, _, files in os.walk(input_dir):
+        for f in files:
+            if f.endswith(".py"):
+                yield os.path.join(root, f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Split manim files into one file per scene.")
+    parser.add_argument("--input_dir", type=str, default=MANIM_DIR)
+    parser.add_argument("--output_dir", type=str, default=OUTPUT_DIR)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--no_llm", action="store_true", help="Skip scenes that cannot be extracted statically")
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    files = list(iter_python_files(args.input_dir))
+
+    written = 0
+    fallbacks = []
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = [executor.submit(split_file, path, args.output_dir) for path in files]
+        for path, future in zip(files, futures):
+            try:
+                scene_files, failed = future.result()
             except Exception as e:
-                print(f"Error reading {file_path}: {e}")
-                continue
\ No newline at end of file
+                print(f"Error reading {path}: {e}")
+                continue
+            written += len(scene_files)
+            fallbacks += failed
+    print(f"✅ Extracted {written} scenes from {len(files)} files, {len(fallbacks)} need the LLM")
+
+    if fallbacks and not args.no_llm:
+        with ThreadPoolExecutor(max_workers=LLM_MAX_CONCURRENCY) as executor:
+            futures = [executor.submit(extract_with_llm, path, scene, args.output_dir) for path, scene in fallbacks]
+            for (path, scene), future in zip(fallbacks, futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"Error extracting {scene or 'scenes'} from {path}: {e}")
+
+
+if __name__ == "__main__":
+    main()
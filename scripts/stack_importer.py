@@ -1,42 +1,42 @@
-from datasets import load_dataset
+import argparse
 import os
-import sys
 
-datatype = sys.argv[1] if len(sys.argv) > 1 else "tex"
-if datatype not in ["tex", "md", "js"]:
-    raise ValueError("Invalid datatype. Choose from 'tex', 'md', or 'js'.")
+from scripts.util.stack import stream_stack
 
-max_len = sys.argv[2] if len(sys.argv) > 2 else 10
-
-tex_dataset = load_dataset("bigcode/the-stack-dedup", data_dir="data/tex", split="train", streaming=True)
-md_dataset = load_dataset("bigcode/the-stack-dedup", data_dir="data/markdown", split="train", streaming=True)
-js_dataset = load_dataset("bigcode/the-stack-dedup", data_dir="data/javascript", split="train", streaming=True)
+# Per datatype: The Stack directory and the filter for slide decks.
 # More potential datasets:
 # rmarkdown rmd
 # jupyter notebook ipynb
 # revealjs html html
+SLIDE_SOURCES = {
+    "tex": ("data/tex", lambda x: "\\documentclass{beamer}" in x.get("content", "")),
+    "md": ("data/markdown", lambda x: "marp:" in x.get("content", "")),
+    "js": ("data/javascript",
+           lambda x: "reveal.js" in x.get("content", "") or "Reveal.initialize" in x.get("content", "")),
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Save slide decks (beamer, marp, reveal.js) from The Stack.")
+    parser.add_argument("datatype", choices=list(SLIDE_SOURCES), nargs="?", default="tex")
+    parser.add_argument("max_len", type=int, nargs="?", default=10, help="Index of the last example to save")
+    args = parser.parse_args(argv)
+    datatype = args.datatype
+
+    # Only the selected directory is streamed
+    data_dir, slide_filter = SLIDE_SOURCES[datatype]
+    dataset = stream_stack(data_dir).filter(slide_filter)
+
+    for i, example in enumerate(dataset):
+        print(f"\n--- Example {i} ---")
+        print("Content preview:\n", example["content"][:1000])
+        filename = f"{datatype}/example{i}.{datatype}"
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        with open(filename, "w", encoding='utf-8') as f:
+            f.write(example["content"])
+        if i >= args.max_len:
+            break
+
 
-# Filters
-beamer_slides = tex_dataset.filter(lambda x: "\\documentclass{beamer}" in x.get("content", ""))
-reveal_slides = js_dataset.filter(lambda x: "reveal.js" in x.get("content", "") or "Reveal.initialize" in x.get("content", ""))
-marp_slides = md_dataset.filter(lambda x: "marp:" in x.get("content", ""))
-
-# Take and print 3 examples safely
-if datatype == "tex":
-    dataset = beamer_slides
-elif datatype == "md":
-    dataset = marp_slides
-elif datatype == "js":
-    dataset = reveal_slides
-else:
-    raise ValueError("Invalid datatype. Choose from 'tex', 'md', or 'js'.")
-
-for i, example in enumerate(dataset):
-    print(f"\n--- Example {i} ---")
-    print("Content preview:\n", example["content"][:1000])
-    filename = f"{datatype}/example{i}.{datatype}"
-    os.makedirs(os.path.dirname(filename), exist_ok=True)
-    with open(filename, "w", encoding='utf-8') as f:
-        f.write(example["content"])
-    if i >= max_len:
-        break
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,385 @@
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from scripts.config import OPEN_AI_API_KEY
+from scripts.util.metrics import metrics
+
+ENDPOINT = "/v1/responses"
+COMPLETION_WINDOW = "24h"
+POLL_INTERVAL = 30  # seconds
+MAX_POLL_INTERVAL = 600  # seconds
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+# Unfinished requests of batches in these states can be submitted again; a "failed" batch did
+# not pass input validation and would fail the same way.
+RESUBMIT_STATUSES = {"expired", "cancelled"}
+RETRYABLE_ERROR_CODES = {"batch_expired", "batch_cancelled", "rate_limit_exceeded", "server_error"}
+# The Batch API accepts input files of up to 200 MB and 50,000 requests
+MAX_BATCH_BYTES = 190 * 1024 * 1024
+MAX_BATCH_REQUESTS = 50_000
+UPLOAD_WORKERS = 4
+INGESTED = "ingested"  # manifest status once a finished batch's results have been processed
+
+_client = None
+
+
+def get_openai_client():
+    """
+    Synchronous client for the Files and Batches APIs, created on first use.
+    """
+    global _client
+    if _client is None:
+        from openai import OpenAI
+
+        _client = OpenAI(api_key=OPEN_AI_API_KEY or os.getenv("OPENAI_API_KEY"))
+    return _client
+
+
+def batch_line(custom_id, body):
+    return {"custom_id": custom_id, "method": "POST", "url": ENDPOINT, "body": body}
+
+
+def write_batch_input(requests, jsonl_path):
+    """
+    Writes (custom_id, request body) pairs as a Batch API input file and returns the request count.
+    """
+    count = 0
+    with open(jsonl_path, "w", encoding="utf-8") as f:
+        for custom_id, body in requests:
+            f.write(json.dumps(batch_line(custom_id, body), ensure_ascii=False) + "\n")
+            count += 1
+    return count
+
+
+class ShardWriter:
+    """
+    Writes batch input lines into numbered shards (<name>_000.jsonl, ...), starting a new shard
+    before one would exceed max_bytes or max_requests. on_shard(path, requests) is called for
+    every finished shard, so uploads can start while later shards are still being written.
+    """
+
+    def __init__(self, work_dir, name, max_bytes=MAX_BATCH_BYTES, max_requests=MAX_BATCH_REQUESTS, on_shard=None):
+        self.work_dir = Path(work_dir)
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+        self.name = name
+        self.max_bytes = max_bytes
+        self.max_requests = max_requests
+        self.on_shard = on_shard
+        self.shards = []
+        self._file = None
+        self._path = None
+        self._bytes = 0
+        self._requests = 0
+
+    def write(self, record):
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        if self._file and (self._bytes + len(line) > self.max_bytes or self._requests >= self.max_requests):
+            self._finish_shard()
+        if self._file is None:
+            self._path = self.work_dir / f"{self.name}_{len(self.shards):03d}.jsonl"
+            self._file = open(self._path, "wb")
+        self._file.write(line)
+        self._bytes += len(line)
+        self._requests += 1
+
+    def _finish_shard(self):
+        self._file.close()
+        self.shards.append((self._path, self._requests))
+        if self.on_shard:
+            self.on_shard(self._path, self._requests)
+        self._file = None
+        self._bytes = self._requests = 0
+
+    def close(self):
+        if self._file:
+            self._finish_shard()
+        return self.shards
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class BatchManifest:
+    """
+    Append-only JSONL log of the batches of one stage. Every state change appends a record;
+    the latest record per batch id wins.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def record(self, batch_id, **fields):
+        line = json.dumps({"batch_id": batch_id, "time": time.time(), **fields}, ensure_ascii=False) + "\n"
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+    def batches(self):
+        batches = {}
+        if self.path.exists():
+            for entry in iter_jsonl(self.path):
+                batches.setdefault(entry["batch_id"], {}).update(entry)
+        return batches
+
+
+def submit_shard(jsonl_path, requests, manifest, metadata=None):
+    batch = submit_batch(jsonl_path, metadata)
+    manifest.record(batch.id, input=str(jsonl_path), requests=requests, status=batch.status,
+                    metadata=metadata or {})
+    return batch.id
+
+
+class ShardUploader:
+    """
+    Uploads shards and creates their batches on a thread pool as they are finished.
+    Use as the on_shard callback of a ShardWriter; leaving the context waits for all uploads.
+    """
+
+    def __init__(self, manifest, metadata=None, workers=UPLOAD_WORKERS):
+        self.manifest = manifest
+        self.metadata = metadata
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._futures = {}
+
+    def __call__(self, jsonl_path, requests):
+        future = self._executor.submit(submit_shard, jsonl_path, requests, self.manifest, self.metadata)
+        self._futures[future] = jsonl_path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._executor.shutdown(wait=True)
+        failed = 0
+        for future, jsonl_path in self._futures.items():
+            if future.exception():
+                print(f"⚠️ Upload of {jsonl_path} failed: {future.exception()}")
+                failed += 1
+        print(f"📦 {len(self._futures) - failed} batches created, {failed} uploads failed")
+
+
+def submit_batch(jsonl_path, metadata=None):
+    """
+    Uploads a JSONL input file and creates a batch for it.
+
+    Returns:
+        The created batch object.
+    """
+    client = get_openai_client()
+    with open(jsonl_path, "rb") as f:
+        batch_input_file = client.files.create(file=f, purpose="batch")
+    batch = client.batches.create(
+        input_file_id=batch_input_file.id,
+        endpoint=ENDPOINT,
+        completion_window=COMPLETION_WINDOW,
+        metadata=metadata or {},
+    )
+    print(f"📦 Batch {batch.id} created for {jsonl_path}")
+    metrics.event("batch_submitted", batch_id=batch.id, input=str(jsonl_path))
+    return batch
+
+
+def wait_for_batch(batch_id, poll_interval=POLL_INTERVAL):
+    """
+    Polls a batch with growing, jittered intervals until it reaches a terminal status.
+    """
+    client = get_openai_client()
+    delay = poll_interval
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        if batch.status in TERMINAL_STATUSES:
+            print(f"📦 Batch {batch_id} finished with status {batch.status}")
+            return batch
+        counts = batch.request_counts
+        print(f"💤 Batch {batch_id}: {batch.status} ({counts.completed}/{counts.total} done)")
+        time.sleep(delay * random.uniform(0.8, 1.2))
+        delay = min(MAX_POLL_INTERVAL, delay * 1.5)
+
+
+def download_file(file_id, path):
+    """
+    Streams a Files API file to disk without holding it in memory.
+    """
+    client = get_openai_client()
+    with client.files.with_streaming_response.content(file_id) as response:
+        response.stream_to_file(path)
+    return Path(path)
+
+
+def iter_jsonl(path):
+    with open(path, "r", encoding="utf-8") as f:
+        for line_num, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                print(f"⚠️ Error decoding JSON on line {line_num} of {path}")
+
+
+def file_ids(paths):
+    """
+    Batch custom_ids for files, mapped to their paths: the file stem plus a short hash of the
+    resolved path, so same-named files from different directories do not collide and a resumed
+    batch maps its results back to the same files.
+    """
+    return {f"{Path(path).stem}_{hashlib.sha1(str(Path(path).resolve()).encode('utf-8')).hexdigest()[:8]}": path
+            for path in paths}
+
+
+def output_stems(ids):
+    """
+    File stem to write each custom_id's result under: the input's own stem, or the custom_id
+    where several inputs share a stem.
+    """
+    stems = {custom_id: Path(path).stem for custom_id, path in ids.items()}
+    counts = Counter(stems.values())
+    return {custom_id: stem if counts[stem] == 1 else custom_id for custom_id, stem in stems.items()}
+
+
+def response_text(entry):
+    """
+    Output text of a successful /v1/responses batch result line, or None.
+    """
+    response = entry.get("response") or {}
+    if response.get("status_code") != 200:
+        return None
+    for item in response["body"].get("output", []):
+        for content in item.get("content") or []:
+            if content.get("type") == "output_text":
+                return content["text"]
+    return None
+
+
+def is_retryable(entry):
+    """
+    True if a failed batch result line is worth submitting again: the request expired or was
+    cancelled with its batch, hit a rate limit or a server error. Invalid requests are not.
+    """
+    error = entry.get("error") or {}
+    if error.get("code") in RETRYABLE_ERROR_CODES:
+        return True
+    status_code = (entry.get("response") or {}).get("status_code") or 0
+    return status_code == 429 or status_code >= 500
+
+
+def batch_errors(batch):
+    """
+    Input validation errors of a failed batch, as "line N: message" strings.
+    """
+    errors = getattr(batch.errors, "data", None) or []
+    return [f"line {error.line}: {error.message}" if error.line else error.message for error in errors]
+
+
+def iter_batch_entries(batch, work_dir):
+    """
+    Downloads a finished batch's output and error files into work_dir and yields their lines.
+    """
+    for file_id, name in ((batch.output_file_id, "output"), (batch.error_file_id, "errors")):
+        if not file_id:
+            continue
+        path = download_file(file_id, Path(work_dir) / f"{batch.id}_{name}.jsonl")
+        yield from iter_jsonl(path)
+
+
+def entry_usage(entry):
+    return ((entry.get("response") or {}).get("body") or {}).get("usage")
+
+
+def iter_batch_results(batch, work_dir):
+    """
+    Yields (custom_id, output text or None, usage dict or None) for every request of a
+    finished batch.
+    """
+    for entry in iter_batch_entries(batch, work_dir):
+        yield entry.get("custom_id"), response_text(entry), entry_usage(entry)
+
+
+def run_batch(requests, work_dir, name, metadata=None, poll_interval=POLL_INTERVAL):
+    """
+    Writes, submits and waits for one batch. The batch id is kept in work_dir/<name>_batch.json
+    until all results were consumed, so an interrupted run resumes the same batch instead of
+    submitting it again.
+
+    Yields:
+        (custom_id, output text or None, usage) for every request of the finished batch.
+
+    Raises:
+        ValueError: If the batch failed input validation. Its state is dropped, so the next
+            run submits the (corrected) requests as a new batch.
+    """
+    work_dir = Path(work_dir)
+    work_dir.mkdir(parents=True, exist_ok=True)
+    state_path = work_dir / f"{name}_batch.json"
+
+    if state_path.exists():
+        batch_id = json.loads(state_path.read_text(encoding="utf-8"))["batch_id"]
+        print(f"🔁 Resuming batch {batch_id}")
+    else:
+        jsonl_path = work_dir / f"{name}_input.jsonl"
+        count = write_batch_input(requests, jsonl_path)
+        if not count:
+            print("Nothing to submit.")
+            return
+        batch_id = submit_batch(jsonl_path, metadata).id
+        state_path.write_text(json.dumps({"batch_id": batch_id, "requests": count}), encoding="utf-8")
+
+    batch = wait_for_batch(batch_id, poll_interval)
+    if batch.status == "failed":
+        state_path.unlink()
+        raise ValueError(f"Batch {batch_id} failed validation: {'; '.join(batch_errors(batch)) or 'no details'}")
+    yield from iter_batch_results(batch, work_dir)
+    state_path.unlink()
+
+
+def retrieve_batch(batch_id):
+    try:
+        return batch_id, get_openai_client().batches.retrieve(batch_id)
+    except Exception as e:
+        return batch_id, e
+
+
+def poll_batches(manifest, on_finished, poll_interval=POLL_INTERVAL, workers=UPLOAD_WORKERS):
+    """
+    Polls every unfinished batch of the manifest concurrently, each on its own growing, jittered
+    interval, and calls on_finished(batch) once for every batch that reaches a terminal status.
+    Handled batches are marked as ingested, so the poller can be stopped and restarted at any time.
+    Returns when no batch is left, including batches that on_finished submitted.
+    """
+    next_poll = {}
+    delays = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while True:
+            entries = manifest.batches()
+            pending = [batch_id for batch_id, entry in entries.items() if entry.get("status") != INGESTED]
+            if not pending:
+                return
+            now = time.monotonic()
+            due = [batch_id for batch_id in pending if next_poll.get(batch_id, 0) <= now]
+            for batch_id, batch in executor.map(retrieve_batch, due):
+                if isinstance(batch, Exception):
+                    print(f"⚠️ Could not retrieve batch {batch_id}: {batch}")
+                elif batch.status in TERMINAL_STATUSES:
+                    print(f"📦 Batch {batch_id} finished with status {batch.status}")
+                    on_finished(batch)
+                    manifest.record(batch_id, status=INGESTED, final_status=batch.status)
+                    continue
+                elif batch.status != entries[batch_id].get("status"):
+                    counts = batch.request_counts
+                    print(f"💤 Batch {batch_id}: {batch.status} ({counts.completed}/{counts.total} done)")
+                    manifest.record(batch_id, status=batch.status)
+                delay = delays.get(batch_id, poll_interval)
+                next_poll[batch_id] = time.monotonic() + delay * random.uniform(0.8, 1.2)
+                delays[batch_id] = min(MAX_POLL_INTERVAL, delay * 1.5)
+            time.sleep(max(0, min(next_poll.get(batch_id, 0) for batch_id in pending) - time.monotonic()))
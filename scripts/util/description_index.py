@@ -0,0 +1,121 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+PENDING = "pending"
+DESCRIBED = "described"
+FAILED = "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS samples (
+    key TEXT NOT NULL,
+    custom_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    updated REAL NOT NULL,
+    PRIMARY KEY (key, custom_id)
+);
+CREATE INDEX IF NOT EXISTS samples_custom_id ON samples (custom_id, status);
+"""
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DescriptionIndex:
+    """
+    Tracks which samples already have (or are waiting for) a description, keyed on the video's
+    content hash, the source code's hash and the prompt version (plus the custom_id, so identical
+    renders under different names are tracked separately). File hashes are cached by
+    path, size and mtime, so unchanged files are not read again.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def file_hash(self, path):
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        with self._lock:
+            row = self._conn.execute("SELECT size, mtime_ns, sha256 FROM files WHERE path = ?", (path,)).fetchone()
+        if row and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            return row[2]
+        sha = file_sha256(path)
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)",
+                               (path, stat.st_size, stat.st_mtime_ns, sha))
+            self._conn.commit()
+        return sha
+
+    def sample_key(self, video_path, code_path, prompt_version):
+        payload = [self.file_hash(video_path), self.file_hash(code_path), prompt_version]
+        return hashlib.sha256(json.dumps(payload).encode("utf-8")).hexdigest()
+
+    def status(self, key, custom_id):
+        with self._lock:
+            row = self._conn.execute("SELECT status FROM samples WHERE key = ? AND custom_id = ?",
+                                     (key, custom_id)).fetchone()
+        return row[0] if row else None
+
+    def needs_description(self, key, custom_id):
+        """
+        False for samples that are described or still waiting in a batch.
+        """
+        return self.status(key, custom_id) in (None, FAILED)
+
+    def _set(self, key, custom_id, status):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO samples VALUES (?, ?, ?, ?)",
+                               (key, custom_id, status, time.time()))
+            self._conn.commit()
+
+    def mark_pending(self, key, custom_id):
+        self._set(key, custom_id, PENDING)
+
+    def mark_described(self, key, custom_id):
+        self._set(key, custom_id, DESCRIBED)
+
+    def _resolve(self, custom_id, status):
+        """
+        Moves the newest pending sample of a custom_id to the given status and returns its key.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT key FROM samples WHERE custom_id = ? AND status = ? ORDER BY updated DESC LIMIT 1",
+                (custom_id, PENDING),
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE samples SET status = ?, updated = ? WHERE key = ? AND custom_id = ?",
+                               (status, time.time(), row[0], custom_id))
+            self._conn.commit()
+        return row[0]
+
+    def resolve_described(self, custom_id):
+        return self._resolve(custom_id, DESCRIBED)
+
+    def resolve_failed(self, custom_id):
+        return self._resolve(custom_id, FAILED)
+
+    def counts(self):
+        with self._lock:
+            return dict(self._conn.execute("SELECT status, COUNT(*) FROM samples GROUP BY status").fetchall())
@@ -0,0 +1,151 @@
+import heapq
+
+import cv2
+import numpy as np
+
+try:
+    import av
+except ImportError:  # fall back to sequential OpenCV reads
+    av = None
+
+STATS_WIDTH = 160  # frames are compared at this width
+BLANK_VARIANCE = 10  # gray-level variance below which a frame counts as blank
+MODES = ("even", "scene")
+
+
+def _scaled_size(width, height, max_dim):
+    if not max_dim or max(width, height) <= max_dim:
+        return width, height
+    scale = max_dim / max(width, height)
+    # even sizes keep the YUV -> BGR conversion exact
+    return max(2, round(width * scale) // 2 * 2), max(2, round(height * scale) // 2 * 2)
+
+
+def _iter_frames_av(video_path, max_dim):
+    with av.open(video_path) as container:
+        stream = container.streams.video[0]
+        stream.thread_type = "AUTO"
+        width, height = _scaled_size(stream.codec_context.width, stream.codec_context.height, max_dim)
+        for frame in container.decode(stream):
+            # scaled by swscale during the color conversion
+            yield frame.to_ndarray(format="bgr24", width=width, height=height)
+
+
+def _iter_frames_cv2(video_path, max_dim):
+    cap = cv2.VideoCapture(video_path)
+    try:
+        while True:
+            success, frame = cap.read()
+            if not success:
+                return
+            height, width = frame.shape[:2]
+            size = _scaled_size(width, height, max_dim)
+            if size != (width, height):
+                frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+            yield frame
+    finally:
+        cap.release()
+
+
+def frame_count(video_path):
+    """
+    Frame count from the container metadata, or its duration times the frame rate where the
+    count is missing (0 if both are unknown). Does not decode anything.
+    """
+    if av is not None:
+        with av.open(video_path) as container:
+            stream = container.streams.video[0]
+            if stream.frames:
+                return stream.frames
+            if stream.duration:
+                duration = float(stream.duration * stream.time_base)
+            else:
+                duration = (container.duration or 0) / av.time_base
+            return int(duration * float(stream.average_rate or 0))
+    cap = cv2.VideoCapture(video_path)
+    count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    return max(count, 0)
+
+
+def iter_frames(video_path, max_dim=None):
+    """
+    Decodes a video once, front to back, yielding BGR frames no larger than max_dim.
+    """
+    if av is not None:
+        return _iter_frames_av(video_path, max_dim)
+    return _iter_frames_cv2(video_path, max_dim)
+
+
+def _thin(kept, stride, limit):
+    # Halves the sampling rate of the reservoir until it holds at most limit frames.
+    while len(kept) > limit:
+        stride *= 2
+        kept = [(index, frame) for index, frame in kept if index % stride == 0]
+    return kept, stride
+
+
+def sample_keyframes(video_path, count=0, mode="even", max_dim=1024, blank_variance=BLANK_VARIANCE):
+    """
+    Picks the first and last non-blank frames of a video plus `count` frames in between, in a
+    single sequential decode. With mode "even" the extra frames are evenly spaced over the
+    video; a target on a blank frame moves to the next non-blank one, and videos without a
+    known length are sampled from a bounded reservoir of evenly spaced frames. With mode
+    "scene" they are the frames with the largest change from the frame before.
+
+    Returns:
+        List of (frame index, BGR frame) in video order, starting with the first and ending with
+        the last non-blank frame (the same frame twice if there is only one), or None if the
+        video has no non-blank frame.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Invalid keyframe mode. Choose from {MODES}.")
+    total = frame_count(video_path) if count and mode == "even" else 0
+    targets = {round(total * (i + 1) / (count + 1)) for i in range(count)} if total else set()
+    reservoir = count and mode == "even" and not total
+    limit, stride = 4 * count, 1
+
+    first = last = None
+    picked = []  # evenly spaced frames, or a min-heap of (change, index, frame) for scene changes
+    pending = 0  # targets that fell on a blank frame (or the first one) and wait for the next frame
+    previous = None
+    for index, frame in enumerate(iter_frames(video_path, max_dim)):
+        height, width = frame.shape[:2]
+        small = cv2.resize(frame, (STATS_WIDTH, max(1, height * STATS_WIDTH // width)), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        blank = gray.var() <= blank_variance
+
+        if not blank:
+            if first is None:
+                first = (index, frame)
+            last = (index, frame)
+        usable = not blank and first[0] != index
+        if mode == "even" and index in targets:
+            pending += 1
+        if count and usable:
+            if reservoir:
+                if index % stride == 0:
+                    picked, stride = _thin(picked + [(index, frame)], stride, limit)
+            elif mode == "even" and pending:
+                picked.append((index, frame))
+                pending -= 1
+            elif mode == "scene" and previous is not None:
+                change = float(np.mean(cv2.absdiff(gray, previous))) / 255
+                item = (change, index, frame)
+                if len(picked) < count:
+                    heapq.heappush(picked, item)
+                elif change > picked[0][0]:
+                    heapq.heapreplace(picked, item)
+        previous = gray
+
+    if first is None:
+        return None
+    if mode == "scene":
+        middle = sorted((item[-2], item[-1]) for item in picked)
+    else:
+        middle = [item for item in picked if first[0] < item[0] < last[0]]
+        if reservoir and len(middle) > count:
+            spots = sorted({round((len(middle) - 1) * (i + 1) / (count + 1)) for i in range(count)})
+            middle = [middle[spot] for spot in spots]
+    # a single non-blank frame is both the first and the last
+    return [first] + [(index, frame) for index, frame in middle if first[0] < index < last[0]] + [last]
@@ -0,0 +1,176 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+
+from scripts.config import LLM_CACHE_ENABLED, LLM_CACHE_MAX_MB, LLM_CACHE_PATH
+from scripts.util.metrics import metrics
+
+EVICT_TO = 0.9  # after eviction the cache is at most this fraction of max_bytes
+
+# The total size of all values is kept in meta by triggers, so a write does not have to sum
+# the whole table to decide whether to evict. A cache file from before the meta table gets
+# its total computed once.
+SCHEMA = """
+BEGIN IMMEDIATE;
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+INSERT OR IGNORE INTO meta (name, value) SELECT 'total_size', COALESCE(SUM(size), 0) FROM responses;
+CREATE TRIGGER IF NOT EXISTS responses_insert AFTER INSERT ON responses BEGIN
+    UPDATE meta SET value = value + NEW.size WHERE name = 'total_size';
+END;
+CREATE TRIGGER IF NOT EXISTS responses_update AFTER UPDATE OF size ON responses BEGIN
+    UPDATE meta SET value = value + NEW.size - OLD.size WHERE name = 'total_size';
+END;
+CREATE TRIGGER IF NOT EXISTS responses_delete AFTER DELETE ON responses BEGIN
+    UPDATE meta SET value = value - OLD.size WHERE name = 'total_size';
+END;
+COMMIT;
+"""
+
+
+def hash_text(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def cache_key(model, template, template_version, temperature, *inputs):
+    """
+    Content address of a generation: model, prompt template (its text hash and version),
+    temperature and the hashes of the inputs (code, error message, ...).
+    """
+    payload = {
+        "model": model,
+        "template": hash_text(template),
+        "template_version": template_version,
+        "temperature": temperature,
+        "inputs": [hash_text(str(value)) for value in inputs],
+    }
+    return hash_text(json.dumps(payload, sort_keys=True))
+
+
+class LLMCache:
+    """
+    Persistent response cache in a single SQLite file. Values are zlib-compressed; when the
+    file grows past max_bytes the least recently used entries are evicted. Safe to share
+    between threads, and between processes through SQLite's own locking.
+    """
+
+    def __init__(self, path=LLM_CACHE_PATH, max_bytes=LLM_CACHE_MAX_MB * 1024 * 1024, enabled=LLM_CACHE_ENABLED):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connection(self):
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute("SELECT value FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                metrics.incr("llm_cache.miss")
+                return None
+            conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+            conn.commit()
+            self.hits += 1
+        metrics.incr("llm_cache.hit")
+        return zlib.decompress(row[0]).decode("utf-8")
+
+    def put(self, key, text):
+        if not self.enabled:
+            return
+        value = zlib.compress(text.encode("utf-8"), 9)
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            # an upsert rather than INSERT OR REPLACE: REPLACE deletes without firing the delete trigger
+            conn.execute(
+                "INSERT INTO responses (key, value, size, created, last_access) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value, size = excluded.size, "
+                "created = excluded.created, last_access = excluded.last_access",
+                (key, value, len(value), now, now),
+            )
+            conn.commit()
+            self._evict(conn)
+
+    @staticmethod
+    def _total_size(conn):
+        return conn.execute("SELECT value FROM meta WHERE name = 'total_size'").fetchone()[0]
+
+    def _evict(self, conn):
+        total = self._total_size(conn)
+        if total <= self.max_bytes:
+            return
+        target = total - int(self.max_bytes * EVICT_TO)
+        freed = 0
+        keys = []
+        for key, size in conn.execute("SELECT key, size FROM responses ORDER BY last_access"):
+            keys.append((key,))
+            freed += size
+            if freed >= target:
+                break
+        conn.executemany("DELETE FROM responses WHERE key = ?", keys)
+        conn.commit()
+        metrics.incr("llm_cache.evicted", len(keys))
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        stats = {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+        if self.enabled:
+            with self._lock:
+                conn = self._connection()
+                entries = conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+                size = self._total_size(conn)
+            stats.update(entries=entries, bytes=size)
+        return stats
+
+    def report(self):
+        stats = self.stats()
+        if not stats["enabled"]:
+            return "LLM cache disabled"
+        return (f"LLM cache: {stats['hits']} hits, {stats['misses']} misses "
+                f"({stats['hit_rate']:.0%} hit rate), {stats['entries']} entries, {stats['bytes'] / 1e6:.1f} MB")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMCache()
+        return _cache
+
+
+def disable_llm_cache():
+    """
+    Opt-out for a run (e.g. --no_cache); lookups and stores become no-ops.
+    """
+    get_llm_cache().enabled = False
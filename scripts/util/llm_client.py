@@ -0,0 +1,213 @@
+import asyncio
+import random
+import threading
+import time
+
+from scripts.config import (
+    LLM_MAX_CONCURRENCY, LLM_MAX_RETRIES, LLM_REQUESTS_PER_MINUTE, LLM_TOKENS_PER_MINUTE, OPEN_AI_API_KEY
+)
+from scripts.util.metrics import metrics
+
+EXPECTED_OUTPUT_TOKENS = 2000  # reserved per request until the real usage is known
+CHARS_PER_TOKEN = 4
+BASE_DELAY = 1.0  # seconds
+MAX_DELAY = 60.0  # seconds
+INCREASE_AFTER = 20  # successful requests before the concurrency limit grows by one
+
+
+class TokenBucket:
+    """
+    Refills `per_minute` units evenly over a minute. The balance may go negative when a request
+    turns out larger than reserved; later acquires then wait until it has been paid back.
+    """
+
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount=1):
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def charge(self, amount):
+        """
+        Books extra usage after the fact (may push the balance below zero).
+        """
+        self._refill()
+        self.tokens -= amount
+
+
+class AdaptiveLimiter:
+    """
+    Concurrency limit that halves when the API throttles and grows by one after a run of
+    successful requests (additive increase, multiplicative decrease).
+    """
+
+    def __init__(self, max_limit, min_limit=1):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.limit = max_limit
+        self.active = 0
+        self._successes = 0
+        self._condition = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.active < self.limit)
+            self.active += 1
+
+    async def __aexit__(self, *exc):
+        async with self._condition:
+            self.active -= 1
+            self._condition.notify_all()
+
+    async def on_success(self):
+        async with self._condition:
+            self._successes += 1
+            if self._successes >= INCREASE_AFTER and self.limit < self.max_limit:
+                self.limit += 1
+                self._successes = 0
+                self._condition.notify_all()
+
+    async def on_throttle(self):
+        async with self._condition:
+            self.limit = max(self.min_limit, self.limit // 2)
+            self._successes = 0
+        metrics.event("llm_throttle", concurrency=self.limit)
+
+
+def is_rate_limited(error):
+    import openai
+
+    return isinstance(error, openai.RateLimitError)
+
+
+def is_retryable(error):
+    import openai
+
+    if isinstance(error, (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+
+def retry_after(error):
+    """
+    Seconds the server asked us to wait, if it sent a Retry-After header.
+    """
+    response = getattr(error, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def estimate_tokens(request):
+    return len(str(request.get("input", ""))) // CHARS_PER_TOKEN + EXPECTED_OUTPUT_TOKENS
+
+
+class LLMClient:
+    """
+    Shared OpenAI Responses client for all LLM-calling stages.
+
+    Requests run on one background event loop, so synchronous callers on worker threads and
+    asyncio callers on their own loops share the same concurrency limit, request/token buckets
+    and retry policy. Rate limit and 5xx errors are retried with jittered exponential backoff,
+    and throttling halves the concurrency limit until requests succeed again.
+    """
+
+    def __init__(self, max_concurrency=LLM_MAX_CONCURRENCY, requests_per_minute=LLM_REQUESTS_PER_MINUTE,
+                 tokens_per_minute=LLM_TOKENS_PER_MINUTE, max_retries=LLM_MAX_RETRIES, api_key=OPEN_AI_API_KEY):
+        self.max_concurrency = max_concurrency
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_retries = max_retries
+        self.api_key = api_key
+        self._loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run_loop, name="llm-client", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        # The SDK is imported here, so only stages that send requests pay for it
+        from openai import AsyncOpenAI
+
+        # Loop-bound primitives have to be created on the loop that uses them.
+        self._client = AsyncOpenAI(api_key=self.api_key, max_retries=0)
+        self._limiter = AdaptiveLimiter(self.max_concurrency)
+        self._requests = TokenBucket(self.requests_per_minute)
+        self._tokens = TokenBucket(self.tokens_per_minute)
+        self._ready.set()
+        self._loop.run_forever()
+
+    async def _create(self, **request):
+        reserved = estimate_tokens(request)
+        for attempt in range(self.max_retries + 1):
+            await self._requests.acquire()
+            await self._tokens.acquire(reserved)
+            try:
+                async with self._limiter:
+                    with metrics.timer("llm", model=request.get("model"), attempt=attempt):
+                        response = await self._client.responses.create(**request)
+            except Exception as e:
+                if not is_retryable(e) or attempt == self.max_retries:
+                    metrics.incr("llm.failed")
+                    raise
+                if is_rate_limited(e):
+                    metrics.incr("llm.throttled")
+                    await self._limiter.on_throttle()
+                metrics.incr("llm.retries")
+                delay = retry_after(e) or random.uniform(0, min(MAX_DELAY, BASE_DELAY * 2 ** attempt))
+                print(f"⏳ {type(e).__name__}, retrying in {delay:.1f}s (attempt {attempt + 1}/{self.max_retries})")
+                await asyncio.sleep(delay)
+                continue
+
+            await self._limiter.on_success()
+            usage = getattr(response, "usage", None)
+            if usage is not None and usage.total_tokens > reserved:
+                self._tokens.charge(usage.total_tokens - reserved)
+            return response
+
+    def create(self, **request):
+        """
+        Blocking `responses.create`; safe to call from any thread.
+        """
+        return asyncio.run_coroutine_threadsafe(self._create(**request), self._loop).result()
+
+    async def acreate(self, **request):
+        """
+        Awaitable `responses.create`; can be awaited from any event loop.
+        """
+        future = asyncio.run_coroutine_threadsafe(self._create(**request), self._loop)
+        return await asyncio.wrap_future(future)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_llm_client():
+    """
+    Returns the process-wide client, creating it on first use.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = LLMClient()
+        return _client
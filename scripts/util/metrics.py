@@ -0,0 +1,242 @@
+import atexit
+import bisect
+import json
+import multiprocessing.util
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+RUN_DIR_ENV = "PIPELINE_RUN_DIR"
+SNAPSHOT_INTERVAL = 30  # seconds
+
+# Upper bounds (seconds) of the latency histogram buckets; the last bucket is open-ended.
+LATENCY_BUCKETS = [0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000]
+
+
+class Histogram:
+    """
+    Fixed-bucket latency histogram. Buckets from several processes can be summed, which keeps
+    the per-process snapshots mergeable.
+    """
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, q):
+        """
+        Upper bound of the bucket containing the q-th percentile (0 < q <= 100).
+        """
+        if not self.count:
+            return None
+        rank = q / 100 * self.count
+        seen = 0
+        for bound, count in zip(self.bounds + [self.max], self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": round(self.total, 6),
+            "min": self.min,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "bounds": self.bounds,
+            "buckets": self.counts,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        hist = cls(data["bounds"])
+        hist.counts = list(data["buckets"])
+        hist.count = data["count"]
+        hist.total = data["sum"]
+        hist.min = data["min"]
+        hist.max = data["max"]
+        return hist
+
+    def merge(self, other):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.total += other.total
+        for attr, pick in (("min", min), ("max", max)):
+            values = [v for v in (getattr(self, attr), getattr(other, attr)) if v is not None]
+            setattr(self, attr, pick(values) if values else None)
+
+
+class Metrics:
+    """
+    Counters, per-stage latency histograms and a structured JSONL run log.
+
+    All updates are guarded by a lock, so worker threads can share one instance. Each process
+    keeps its own state and writes its own snapshot file (metrics_<pid>.json) into the run
+    directory; merge_snapshots() combines them. Run log lines are appended with a single
+    O_APPEND write each, so lines from concurrent processes never interleave.
+    """
+
+    def __init__(self):
+        self._reset()
+        atexit.register(self.write_snapshot)
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # Runs in the forked child before it starts any thread: it closes its copy of the
+        # parent's run log, drops the parent's counters and re-attaches on first use.
+        if self._log_fd is not None:
+            os.close(self._log_fd)
+        self._reset()
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._configure_lock = threading.Lock()
+        self._pid = os.getpid()
+        self.counters = {}
+        self.histograms = {}
+        self.run_dir = None
+        self._log_fd = None
+        self._snapshot_thread = None
+        self._stop = threading.Event()
+        self._finalizer = None
+
+    def _ensure_process(self):
+        # Spawned and forked workers re-attach to the run directory of their parent.
+        if self.run_dir is None and os.environ.get(RUN_DIR_ENV):
+            self.configure(os.environ[RUN_DIR_ENV])
+
+    def configure(self, run_dir, snapshot_interval=SNAPSHOT_INTERVAL):
+        """
+        Starts writing the run log and periodic snapshots to run_dir. Child processes pick the
+        directory up from the environment. Calling it again for the same directory is a no-op;
+        for another directory the old run log and snapshot thread are closed first.
+        """
+        run_dir = Path(run_dir)
+        with self._configure_lock:
+            if self.run_dir == run_dir:
+                return self
+            run_dir.mkdir(parents=True, exist_ok=True)
+            os.environ[RUN_DIR_ENV] = str(run_dir)
+            log_fd = os.open(run_dir / "events.jsonl", os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            self._stop.set()
+            self._stop = threading.Event()
+            with self._lock:
+                old_fd, self._log_fd = self._log_fd, log_fd
+                self.run_dir = run_dir
+            if old_fd is not None:
+                os.close(old_fd)
+
+            self._snapshot_thread = threading.Thread(
+                target=self._snapshot_loop, args=(snapshot_interval, self._stop), daemon=True
+            )
+            self._snapshot_thread.start()
+            if self._finalizer is None:
+                # atexit does not run in multiprocessing workers (they leave through os._exit);
+                # their finalizers do, so pool workers write their final snapshot on shutdown.
+                self._finalizer = multiprocessing.util.Finalize(None, self.write_snapshot, exitpriority=10)
+        return self
+
+    def incr(self, name, value=1):
+        self._ensure_process()
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, stage, seconds):
+        self._ensure_process()
+        with self._lock:
+            hist = self.histograms.get(stage)
+            if hist is None:
+                hist = self.histograms[stage] = Histogram()
+            hist.observe(seconds)
+
+    @contextmanager
+    def timer(self, stage, **fields):
+        """
+        Records the duration of the block in the stage histogram and the run log.
+        """
+        start = time.perf_counter()
+        status = "ok"
+        try:
+            yield
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            self.observe(stage, elapsed)
+            self.event(stage, status=status, seconds=round(elapsed, 4), **fields)
+
+    def event(self, kind, **fields):
+        """
+        Appends one structured record to the run log (no-op until configure() was called).
+        """
+        self._ensure_process()
+        if self._log_fd is None:
+            return
+        record = {"time": time.time(), "pid": self._pid, "event": kind, **fields}
+        line = (json.dumps(record, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+        with self._lock:
+            os.write(self._log_fd, line)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "time": time.time(),
+                "pid": self._pid,
+                "counters": dict(self.counters),
+                "histograms": {stage: hist.to_dict() for stage, hist in self.histograms.items()},
+            }
+
+    def write_snapshot(self):
+        if self.run_dir is None or os.getpid() != self._pid:
+            return
+        path = self.run_dir / f"metrics_{self._pid}.json"
+        tmp_path = path.with_suffix(".json.tmp")
+        tmp_path.write_text(json.dumps(self.snapshot(), indent=2), encoding="utf-8")
+        os.replace(tmp_path, path)
+
+    def _snapshot_loop(self, interval, stop):
+        while not stop.wait(interval):
+            self.write_snapshot()
+
+
+def merge_snapshots(run_dir):
+    """
+    Combines the per-process snapshot files of a run into one summary.
+    """
+    counters = {}
+    histograms = {}
+    for path in sorted(Path(run_dir).glob("metrics_*.json")):
+        data = json.loads(path.read_text(encoding="utf-8"))
+        for name, value in data["counters"].items():
+            counters[name] = counters.get(name, 0) + value
+        for stage, hist_data in data["histograms"].items():
+            hist = Histogram.from_dict(hist_data)
+            if stage in histograms:
+                histograms[stage].merge(hist)
+            else:
+                histograms[stage] = hist
+    return {
+        "counters": counters,
+        "histograms": {stage: hist.to_dict() for stage, hist in histograms.items()},
+    }
+
+
+metrics = Metrics()
@@ -1,30 +1,86 @@
-import os
+import threading
 
-from openai import OpenAI
-from dotenv import load_dotenv
-load_dotenv()
-client = OpenAI(
-    api_key=os.getenv("OPEN_AI_API_KEY")  # Replace with your OpenAI API key
-)
+from scripts.util.llm_cache import cache_key, get_llm_cache
+from scripts.util.llm_client import get_llm_client
+from scripts.util.metrics import metrics
+
+PROMPT_VERSION = 1  # bump to invalidate cached generations after changing how prompts are built
 
 token_usage = {
     "input_tokens": 0,
     "output_tokens": 0,
     "total_tokens": 0
 }
+token_usage_lock = threading.Lock()
 
-def generate(prompt, content, filename, model = 'gpt-4.1'):
-    response = client.responses.create(
-        model=model,
-        input=[
+def record_usage(usage):
+    """
+    Adds a response's token usage to the shared totals; safe to call from worker threads.
+    """
+    with token_usage_lock:
+        token_usage["input_tokens"] += usage.input_tokens
+        token_usage["output_tokens"] += usage.output_tokens
+        token_usage["total_tokens"] += usage.total_tokens
+    metrics.incr("llm.input_tokens", usage.input_tokens)
+    metrics.incr("llm.output_tokens", usage.output_tokens)
+
+
+def strip_code_fences(text):
+    return text.replace('```python', '').replace('```', '').strip()
+
+
+def extract_code(response):
+    return strip_code_fences(response.output_text)
+
+
+def record_usage_dict(usage):
+    """
+    record_usage for the plain usage dicts found in Batch API result files.
+    """
+    with token_usage_lock:
+        for name in token_usage:
+            token_usage[name] += usage.get(name, 0)
+    metrics.incr("llm.input_tokens", usage.get("input_tokens", 0))
+    metrics.incr("llm.output_tokens", usage.get("output_tokens", 0))
+
+
+def generation_key(prompt, content, filename, model, temperature=0.5):
+    return cache_key(model, prompt, PROMPT_VERSION, temperature, filename, content)
+
+
+def build_request(prompt, content, filename, model):
+    return {
+        "model": model,
+        "input": [
             {"role": "user", "content": prompt + filename + "\n\n" + content}
         ],
-        temperature=0.5,
-    )
-    usage = response.usage
-    token_usage["input_tokens"] += usage.input_tokens
-    token_usage["output_tokens"] += usage.output_tokens
-    token_usage["total_tokens"] += usage.total_tokens
-    print(token_usage)
-    extracted_code = response.output_text.replace('```python', '').replace('```', '').strip()
-    return extracted_code
\ No newline at end of file
+        "temperature": 0.5,
+    }
+
+
+def generate(prompt, content, filename, model = 'gpt-4.1'):
+    request = build_request(prompt, content, filename, model)
+    key = generation_key(prompt, content, filename, model, request["temperature"])
+    cached = get_llm_cache().get(key)
+    if cached is not None:
+        return cached
+
+    response = get_llm_client().create(**request)
+    record_usage(response.usage)
+    extracted_code = extract_code(response)
+    get_llm_cache().put(key, extracted_code)
+    return extracted_code
+
+
+async def agenerate(prompt, content, filename, model = 'gpt-4.1'):
+    request = build_request(prompt, content, filename, model)
+    key = generation_key(prompt, content, filename, model, request["temperature"])
+    cached = get_llm_cache().get(key)
+    if cached is not None:
+        return cached
+
+    response = await get_llm_client().acreate(**request)
+    record_usage(response.usage)
+    extracted_code = extract_code(response)
+    get_llm_cache().put(key, extracted_code)
+    return extracted_code
@@ -0,0 +1,46 @@
+import subprocess
+import tempfile
+
+MAX_OUTPUT_BYTES = 16 * 1024
+
+
+def read_bounded(file, max_bytes=MAX_OUTPUT_BYTES):
+    """
+    Reads at most max_bytes of a captured output file, keeping its head and tail.
+    """
+    file.seek(0, 2)
+    size = file.tell()
+    file.seek(0)
+    if size <= max_bytes:
+        return file.read().decode("utf-8", errors="replace")
+
+    half = max_bytes // 2
+    head = file.read(half).decode("utf-8", errors="replace")
+    file.seek(size - half)
+    tail = file.read().decode("utf-8", errors="replace")
+    return f"{head}\n... [{size - 2 * half} bytes truncated] ...\n{tail}"
+
+
+def run_captured(command, timeout=None, max_bytes=MAX_OUTPUT_BYTES, **kwargs):
+    """
+    Runs a command like subprocess.run(capture_output=True, text=True), but spools the child's
+    stdout/stderr to temporary files and returns only their head and tail, so a chatty render
+    cannot grow the parent's memory.
+
+    Raises:
+        subprocess.TimeoutExpired: If the command runs longer than timeout. The child is killed
+            and the exception carries the truncated output.
+    """
+    with tempfile.TemporaryFile() as out, tempfile.TemporaryFile() as err:
+        process = subprocess.Popen(command, stdout=out, stderr=err, **kwargs)
+        try:
+            returncode = process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+            raise subprocess.TimeoutExpired(
+                command, timeout, output=read_bounded(out, max_bytes), stderr=read_bounded(err, max_bytes)
+            )
+        return subprocess.CompletedProcess(
+            command, returncode, stdout=read_bounded(out, max_bytes), stderr=read_bounded(err, max_bytes)
+        )
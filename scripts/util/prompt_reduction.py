@@ -0,0 +1,168 @@
+import ast
+import io
+import re
+import tokenize
+
+from scripts.scene_extractor import extract_scene, find_scene_classes
+from scripts.util.metrics import metrics
+from scripts.util.tokens import count_tokens
+
+LIBRARY_PATH_RE = re.compile(r"site-packages|dist-packages|[/\\]lib[/\\]python\d|<frozen ")
+FRAME_RE = re.compile(r'^\s*File "([^"]+)", line \d+, in \S+|^\s*[│|]?\s*([\w./\\:-]+\.py):\d+ in \S+')
+PROGRESS_RE = re.compile(r"\d+%\|.*\|\s*\d+/\d+|it/s\]")
+MAX_ERROR_LINES = 80
+MAX_ERROR_CHARS = 6000
+
+
+def docstring_nodes(tree):
+    """
+    Docstring expressions that can be deleted without leaving an empty body.
+    """
+    for node in ast.walk(tree):
+        if not isinstance(node, (ast.Module, ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)):
+            continue
+        body = node.body
+        if (len(body) > 1 and isinstance(body[0], ast.Expr) and isinstance(body[0].value, ast.Constant)
+                and isinstance(body[0].value.value, str) and body[1].lineno > body[0].end_lineno):
+            yield body[0]
+
+
+def unreachable_nodes(tree):
+    """
+    Statements that follow a return/raise/break/continue in the same block.
+    """
+    for node in ast.walk(tree):
+        for field in ("body", "orelse", "finalbody"):
+            block = getattr(node, field, None)
+            if not isinstance(block, list):
+                continue
+            for index, stmt in enumerate(block[:-1]):
+                if isinstance(stmt, (ast.Return, ast.Raise, ast.Break, ast.Continue)):
+                    yield from (dead for dead in block[index + 1:] if dead.lineno > stmt.end_lineno)
+                    break
+
+
+def strip_code(code):
+    """
+    Removes comments, docstrings and unreachable statements. The code is returned unchanged
+    if it does not parse before or after stripping.
+    """
+    try:
+        tree = ast.parse(code)
+        tokens = list(tokenize.generate_tokens(io.StringIO(code).readline))
+    except (SyntaxError, tokenize.TokenError, IndentationError):
+        return code
+
+    lines = code.splitlines()
+    drop = set()
+    for node in list(docstring_nodes(tree)) + list(unreachable_nodes(tree)):
+        drop.update(range(node.lineno - 1, node.end_lineno))
+    for token in tokens:
+        if token.type != tokenize.COMMENT:
+            continue
+        row, col = token.start
+        line = lines[row - 1]
+        if not line[:col].strip():
+            drop.add(row - 1)
+        else:
+            lines[row - 1] = line[:col].rstrip()
+
+    kept = []
+    for index, line in enumerate(lines):
+        if index in drop:
+            continue
+        if not line.strip() and kept and not kept[-1].strip():
+            continue
+        kept.append(line)
+    stripped = "\n".join(kept).strip("\n") + "\n"
+
+    try:
+        ast.parse(stripped)
+    except SyntaxError:
+        return code
+    return stripped
+
+
+def drop_other_scenes(code, scene):
+    """
+    Keeps only the given scene class and what it depends on (see scene_extractor.extract_scene).
+    """
+    try:
+        tree = ast.parse(code)
+        if len(find_scene_classes(tree)) < 2:
+            return code
+        return extract_scene(code, scene, tree)
+    except (SyntaxError, ValueError):
+        return code
+
+
+def reduce_code(code, scene=None):
+    if scene:
+        code = drop_other_scenes(code, scene)
+    return strip_code(code)
+
+
+def trim_traceback(err_msg, max_lines=MAX_ERROR_LINES, max_chars=MAX_ERROR_CHARS):
+    """
+    Shortens an error log to what the fixer needs: the header, the frames in the user's
+    script, the innermost library frame and the exception itself. Progress bars are dropped.
+    """
+    lines = [line for line in err_msg.splitlines() if not PROGRESS_RE.search(line)]
+
+    # split into a head and frames (a frame line plus the lines below it)
+    head, frames, current = [], [], None
+    for line in lines:
+        match = FRAME_RE.match(line)
+        if match:
+            current = [match.group(1) or match.group(2), [line]]
+            frames.append(current)
+        elif current is not None:
+            current[1].append(line)
+        else:
+            head.append(line)
+    if frames:
+        kept, omitted = [], 0
+        for index, (path, frame_lines) in enumerate(frames):
+            # the last frame also carries the exception message, so it is always kept
+            if LIBRARY_PATH_RE.search(path) and index != len(frames) - 1:
+                omitted += 1
+                continue
+            if omitted:
+                kept.append(f"  ... {omitted} library frame(s) omitted")
+                omitted = 0
+            kept += frame_lines
+        lines = head[:10] + kept
+
+    if len(lines) > max_lines:
+        lines = lines[:max_lines // 4] + ["..."] + lines[-(max_lines - max_lines // 4):]
+    trimmed = "\n".join(lines)
+    if len(trimmed) > max_chars:
+        trimmed = trimmed[:max_chars // 4] + "\n...\n" + trimmed[-(max_chars - max_chars // 4):]
+    return trimmed
+
+
+def record_reduction(stage, original, reduced):
+    """
+    Counts the tokens saved by a reduction and records them per stage.
+    """
+    before = count_tokens(original)
+    after = count_tokens(reduced)
+    metrics.incr(f"prompt.{stage}.tokens_before", before)
+    metrics.incr(f"prompt.{stage}.tokens_after", after)
+    metrics.event("prompt_reduction", stage=stage, tokens_before=before, tokens_after=after)
+    return before - after
+
+
+def reduction_report(counters):
+    """
+    Tokens saved per stage, from the prompt.* counters of a metrics snapshot.
+    """
+    stages = sorted({name.split(".")[1] for name in counters if name.startswith("prompt.")})
+    lines = []
+    for stage in stages:
+        before = counters.get(f"prompt.{stage}.tokens_before", 0)
+        after = counters.get(f"prompt.{stage}.tokens_after", 0)
+        saved = before - after
+        lines.append(f"  {stage:<16} {before:>10} -> {after:>10} tokens ({saved / before:.0%} saved)"
+                     if before else f"  {stage:<16} no requests")
+    return "\n".join(lines) or "  no prompts reduced"
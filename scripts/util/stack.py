@@ -0,0 +1,22 @@
+STACK_DATASET = "bigcode/the-stack-dedup"
+
+
+def stream_stack(data_dir):
+    """
+    Streams one language directory of The Stack (e.g. "data/python"). `datasets` is imported
+    here, not at module level, since importing it takes seconds.
+    """
+    from datasets import load_dataset
+
+    return load_dataset(STACK_DATASET, data_dir=data_dir, split="train", streaming=True)
+
+
+def iter_parquet(path, batch_size=1024):
+    """
+    Streams the rows of a local parquet file with The Stack's columns as dicts, like
+    stream_stack does for the hub dataset (e.g. the synthetic corpus of the benchmark).
+    """
+    import pyarrow.parquet as pq
+
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size):
+        yield from batch.to_pylist()
@@ -0,0 +1,99 @@
+import hashlib
+import json
+import math
+import re
+
+from scripts.config import PROJECT_ROOT
+
+try:
+    import tiktoken
+except ImportError:  # the regex approximation below is close enough for planning
+    tiktoken = None
+
+TOKEN_CACHE_PATH = PROJECT_ROOT / ".cache" / "token_counts.json"
+
+# USD per 1M tokens: (input, output)
+MODEL_PRICES = {
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4o": (2.50, 10.00),
+    "claude-opus-4": (15.00, 75.00),
+    "claude-sonnet-4": (3.00, 15.00),
+}
+BATCH_DISCOUNT = 0.5
+
+# Rough BPE pre-tokenization: words, numbers, single symbols and whitespace runs.
+# Long words are split into chunks, as BPE vocabularies rarely cover them whole.
+PIECE_RE = re.compile(r"[A-Za-z]+|\d{1,3}|[^\sA-Za-z\d]|\s+")
+CHARS_PER_WORD_TOKEN = 4
+
+
+def approximate_tokens(text):
+    count = 0
+    for piece in PIECE_RE.findall(text):
+        if piece[0].isalpha():
+            count += math.ceil(len(piece) / CHARS_PER_WORD_TOKEN)
+        elif piece.isspace():
+            # indentation of code collapses into few tokens
+            count += 1 if len(piece) <= 4 or "\n" not in piece else 2
+        else:
+            count += 1
+    return count
+
+
+_encoding = None
+
+
+def tokenizer_name():
+    return "tiktoken-o200k_base" if tiktoken is not None else "approx-v1"
+
+
+def count_tokens(text):
+    """
+    Number of tokens in text: exact with tiktoken if it is installed, otherwise approximated.
+    """
+    global _encoding
+    if tiktoken is None:
+        return approximate_tokens(text)
+    if _encoding is None:
+        _encoding = tiktoken.get_encoding("o200k_base")
+    return len(_encoding.encode(text, disallowed_special=()))
+
+
+def token_cost(model, input_tokens, output_tokens, batch=False):
+    input_price, output_price = MODEL_PRICES[model]
+    cost = (input_tokens * input_price + output_tokens * output_price) / 1_000_000
+    return cost * BATCH_DISCOUNT if batch else cost
+
+
+class TokenCountCache:
+    """
+    Token counts keyed by content hash and tokenizer, persisted as one JSON file,
+    so unchanged files are not tokenized again on the next run.
+    """
+
+    def __init__(self, path=TOKEN_CACHE_PATH):
+        self.path = path
+        self.counts = {}
+        self.dirty = False
+        if path.is_file():
+            with open(path, "r", encoding="utf-8") as f:
+                self.counts = json.load(f)
+
+    def count(self, text):
+        key = f"{tokenizer_name()}:{hashlib.sha256(text.encode('utf-8')).hexdigest()}"
+        tokens = self.counts.get(key)
+        if tokens is None:
+            tokens = self.counts[key] = count_tokens(text)
+            self.dirty = True
+        return tokens
+
+    def save(self):
+        if not self.dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.counts, f)
+        tmp.replace(self.path)
+        self.dirty = False
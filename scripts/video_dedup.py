@@ -0,0 +1,256 @@
+"""
+Finds rendered videos that show the same animation, so only one of each group is
+described and packed. Augmented variants and near-duplicate Stack scripts often render
+to visually identical videos.
+
+Each video gets a perceptual fingerprint: a 64-bit difference hash (dHash) of each of a
+few evenly spaced keyframes, computed on tiny grayscale thumbnails, so re-encodes,
+resolution and frame rate changes do not matter. Near-identical fingerprints are found
+with multi-index hashing: the fingerprint is split into threshold + 1 chunks, and two
+fingerprints within `threshold` bits of each other agree exactly on at least one chunk,
+so only videos sharing a chunk are compared instead of all pairs.
+
+The result is <output_dir>/duplicates.json, mapping every duplicate video to the video
+kept for its group. description_extractor.py and dataset_packer.py skip the duplicates
+when given --duplicates. Fingerprints are cached by path, size and mtime in
+<output_dir>/fingerprints.jsonl, so re-runs only decode new videos.
+
+Usage
+-----
+    python -m scripts.video_dedup --video_dirs rendered/manim_scenes rendered/matplotlib_fixed
+"""
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from scripts.compile.normalize_videos import PARTIAL_DIR
+from scripts.util.keyframes import sample_keyframes
+
+DUPLICATES_FILE = "duplicates.json"
+FINGERPRINTS_FILE = "fingerprints.jsonl"
+FRAMES = 4  # keyframes per fingerprint, first and last included
+HASH_SIZE = 8  # each keyframe hashes to HASH_SIZE x HASH_SIZE bits
+THUMBNAIL_DIM = 160  # keyframes are decoded at most this large
+THRESHOLD = 8  # fingerprints at most this many bits apart are duplicates
+
+
+def dhash(frames, hash_size=HASH_SIZE):
+    """
+    Difference hashes of a stack of BGR frames: one bit per pixel of a (hash_size + 1) x hash_size
+    grayscale thumbnail, set where the pixel is brighter than its left neighbour.
+
+    Returns:
+        The packed hashes of all frames, hash_size ** 2 bits per frame.
+    """
+    thumbnails = np.stack([
+        cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+        for frame in frames
+    ]).astype(np.int16)
+    bits = thumbnails[:, :, 1:] > thumbnails[:, :, :-1]
+    return np.packbits(bits.reshape(len(frames), -1), axis=1).tobytes()
+
+
+def video_fingerprint(video_path, frames=FRAMES):
+    """
+    Fingerprint of a video as a hex string: the dHashes of `frames` evenly spaced keyframes
+    between its first and last non-blank frame. None for videos without a non-blank frame.
+    """
+    keyframes = sample_keyframes(str(video_path), count=max(frames - 2, 0), mode="even", max_dim=THUMBNAIL_DIM)
+    if not keyframes:
+        return None
+    # short videos have fewer distinct keyframes; repeat them to the fixed length
+    picks = np.linspace(0, len(keyframes) - 1, frames).round().astype(int)
+    return dhash([keyframes[i][1] for i in picks]).hex()
+
+
+def fingerprint_job(video_path, frames):
+    try:
+        return video_fingerprint(video_path, frames)
+    except Exception as e:
+        print(f"⚠️ Cannot fingerprint {video_path}: {e}")
+        return None
+
+
+class HammingIndex:
+    """
+    Multi-index hashing over fixed-length binary codes. Codes are split into threshold + 1
+    chunks, each with its own hash table; lookups only compare against codes that share at
+    least one chunk exactly, which every code within `threshold` bits does.
+    """
+
+    def __init__(self, codes, threshold=THRESHOLD):
+        """
+        Args:
+            codes: uint64 array of shape (number of codes, bits // 64).
+            threshold: Most differing bits for a match.
+        """
+        bits = codes.shape[1] * 64
+        if (threshold + 1) * 8 > bits:
+            raise ValueError(f"Threshold {threshold} is too large for {bits}-bit codes")
+        self.codes = codes
+        self.threshold = threshold
+        unpacked = np.unpackbits(codes.view(np.uint8), axis=1)
+        self.keys = []
+        self.tables = []
+        for chunk in np.array_split(np.arange(bits), threshold + 1):
+            keys = list(map(bytes, np.packbits(unpacked[:, chunk], axis=1)))
+            table = {}
+            for i, key in enumerate(keys):
+                table.setdefault(key, []).append(i)
+            self.keys.append(keys)
+            self.tables.append(table)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def query(self, i):
+        """
+        Indices of the other codes within threshold bits of code i, with their distances.
+        """
+        candidates = set()
+        for keys, table in zip(self.keys, self.tables):
+            candidates.update(table[keys[i]])
+        candidates.discard(i)
+        if not candidates:
+            return []
+        candidates = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+        distances = np.bitwise_count(self.codes[candidates] ^ self.codes[i]).sum(axis=1)
+        close = distances <= self.threshold
+        return list(zip(candidates[close].tolist(), distances[close].tolist()))
+
+
+def find_duplicates(fingerprints, threshold=THRESHOLD):
+    """
+    Groups near-identical fingerprints.
+
+    Args:
+        fingerprints: (video path, hex fingerprint) pairs, all of the same length. The first
+            video of each group, in this order, is the one that is kept.
+
+    Returns:
+        Dict mapping each duplicate video to the video kept for its group.
+    """
+    if not fingerprints:
+        return {}
+    paths = [path for path, _ in fingerprints]
+    codes = np.frombuffer(b"".join(bytes.fromhex(fp) for _, fp in fingerprints), dtype=np.uint64)
+    index = HammingIndex(codes.reshape(len(paths), -1), threshold)
+    parent = list(range(len(paths)))
+
+    def root(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i in range(len(paths)):
+        for j, _ in index.query(i):
+            a, b = root(i), root(j)
+            if a != b:
+                parent[max(a, b)] = min(a, b)  # the earlier video stays the representative
+    return {paths[i]: paths[root(i)] for i in range(len(paths)) if root(i) != i}
+
+
+def iter_videos(video_dirs):
+    for video_dir in video_dirs:
+        for path in sorted(Path(video_dir).rglob("*.mp4")):
+            if PARTIAL_DIR not in path.parts:
+                yield str(path.resolve())
+
+
+def load_fingerprint_cache(cache_path, frames):
+    """
+    Maps video paths to (size, mtime_ns, fingerprint) from earlier runs with the same frame count.
+    """
+    cache = {}
+    if not os.path.exists(cache_path):
+        return cache
+    with open(cache_path, "r", encoding="utf-8") as f:
+        for line in f:
+            entry = json.loads(line)
+            if entry.get("frames") == frames:
+                cache[entry["video"]] = (entry["size"], entry["mtime_ns"], entry["fingerprint"])
+    return cache
+
+
+def fingerprint_videos(video_paths, cache_path, frames=FRAMES, workers=None):
+    """
+    Fingerprints of the given videos, decoding only those that are new or changed since they
+    were cached. New fingerprints are appended to the cache as they are computed.
+
+    Returns:
+        (video path, fingerprint) pairs in input order, without videos that have no fingerprint.
+    """
+    cache = load_fingerprint_cache(cache_path, frames)
+    stats = {path: os.stat(path) for path in video_paths}
+    fingerprints = {}
+    pending = []
+    for path in video_paths:
+        cached = cache.get(path)
+        if cached and cached[:2] == (stats[path].st_size, stats[path].st_mtime_ns):
+            fingerprints[path] = cached[2]
+        else:
+            pending.append(path)
+    print(f"🔎 Fingerprinting {len(pending)} videos ({len(fingerprints)} cached)")
+
+    with ProcessPoolExecutor(max_workers=workers) as executor, open(cache_path, "a", encoding="utf-8") as f:
+        results = executor.map(fingerprint_job, pending, [frames] * len(pending), chunksize=8)
+        for path, fingerprint in zip(pending, results):
+            fingerprints[path] = fingerprint
+            entry = {"video": path, "size": stats[path].st_size, "mtime_ns": stats[path].st_mtime_ns,
+                     "frames": frames, "fingerprint": fingerprint}
+            f.write(json.dumps(entry) + "\n")
+    return [(path, fingerprints[path]) for path in video_paths if fingerprints[path]]
+
+
+def load_duplicates(path):
+    """
+    Maps resolved paths of duplicate videos to the video kept for their group. Empty if path is None.
+    """
+    if not path:
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)["duplicates"]
+
+
+def is_duplicate(video_path, duplicates):
+    return bool(duplicates) and str(Path(video_path).resolve()) in duplicates
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find rendered videos that show the same animation.")
+    parser.add_argument("--video_dirs", type=str, nargs="+", default=["../rendered"],
+                        help="Directories searched recursively for videos")
+    parser.add_argument("--output_dir", type=str, default="../output/dedup")
+    parser.add_argument("--threshold", type=int, default=THRESHOLD,
+                        help=f"Most differing fingerprint bits (of {FRAMES * HASH_SIZE ** 2}) for a duplicate")
+    parser.add_argument("--frames", type=int, default=FRAMES, help="Keyframes per fingerprint")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Decoding processes")
+    args = parser.parse_args()
+    if args.frames < 1:
+        parser.error("--frames must be at least 1")
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    videos = list(iter_videos(args.video_dirs))
+    fingerprints = fingerprint_videos(videos, os.path.join(args.output_dir, FINGERPRINTS_FILE),
+                                      args.frames, args.workers)
+    duplicates = find_duplicates(fingerprints, args.threshold)
+
+    groups = {}
+    for duplicate, kept in duplicates.items():
+        groups.setdefault(kept, []).append(duplicate)
+    output_path = os.path.join(args.output_dir, DUPLICATES_FILE)
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump({"threshold": args.threshold, "frames": args.frames, "duplicates": duplicates,
+                   "groups": groups}, f, indent=2)
+    print(f"✅ {len(duplicates)} duplicates in {len(groups)} groups among {len(fingerprints)} videos, "
+          f"written to {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import json
+from types import SimpleNamespace
+
+from scripts.util import batch_jobs
+from scripts.util.batch_jobs import INGESTED, BatchManifest, ShardWriter, poll_batches
+
+
+def test_shard_writer_splits_by_request_count_and_size(tmp_path):
+    finished = []
+    with ShardWriter(tmp_path, "input", max_bytes=200, max_requests=3,
+                     on_shard=lambda path, requests: finished.append(requests)) as writer:
+        for i in range(7):
+            writer.write({"custom_id": f"id{i}", "body": {}})
+        writer.write({"custom_id": "big", "body": {"text": "x" * 150}})
+
+    assert finished == [3, 3, 1, 1]
+    assert [requests for _, requests in writer.shards] == finished
+    lines = [json.loads(line) for path, _ in writer.shards for line in open(path, encoding="utf-8")]
+    assert [line["custom_id"] for line in lines] == [f"id{i}" for i in range(7)] + ["big"]
+
+
+def test_manifest_keeps_the_latest_record_per_batch(tmp_path):
+    manifest = BatchManifest(tmp_path / "batches.jsonl")
+    manifest.record("b1", input="a.jsonl", status="validating")
+    manifest.record("b2", status="in_progress")
+    manifest.record("b1", status="completed")
+
+    batches = BatchManifest(tmp_path / "batches.jsonl").batches()
+
+    assert batches["b1"]["status"] == "completed" and batches["b1"]["input"] == "a.jsonl"
+    assert batches["b2"]["status"] == "in_progress"
+
+
+def test_poll_batches_handles_each_batch_once_including_resubmits(tmp_path, monkeypatch):
+    manifest = BatchManifest(tmp_path / "batches.jsonl")
+    manifest.record("b1", status="validating")
+    polls = {}
+
+    def retrieve(batch_id):
+        polls[batch_id] = polls.get(batch_id, 0) + 1
+        status = "completed" if polls[batch_id] >= 3 else "in_progress"
+        counts = SimpleNamespace(completed=0, total=1)
+        return batch_id, SimpleNamespace(id=batch_id, status=status, request_counts=counts)
+
+    finished = []
+
+    def on_finished(batch):
+        finished.append(batch.id)
+        if batch.id == "b1":
+            manifest.record("b2", status="validating", retry_of="b1")
+
+    monkeypatch.setattr(batch_jobs, "retrieve_batch", retrieve)
+    poll_batches(manifest, on_finished, poll_interval=0.01)
+
+    assert finished == ["b1", "b2"]
+    assert {entry["status"] for entry in manifest.batches().values()} == {INGESTED}
@@ -0,0 +1,23 @@
+from scripts.benchmark.run import find_regressions
+
+
+def results(wall=10.0, throughput=2.0, p95=1.0, fast_p50=0.001, operations=None):
+    return {"phases": {"manim": {
+        "wall": wall, "cpu_user": 5.0, "cpu_system": 1.0, "max_rss_mb": 200.0,
+        "stages": {"render": {"throughput": throughput, "p50": fast_p50, "p95": p95}},
+        "operations": operations or {},
+    }}}
+
+
+def test_slower_and_lower_throughput_runs_are_regressions():
+    regressions = find_regressions(results(wall=13.0, throughput=1.5), results())
+
+    assert {metric for metric, *_ in regressions} == {"manim.wall", "manim.render.throughput"}
+
+
+def test_improvements_noise_and_new_metrics_are_not_regressions():
+    baseline = results()
+    current = results(wall=8.0, throughput=3.0, p95=1.1, fast_p50=0.004,
+                      operations={"llm": {"p50": 5.0, "p95": 9.0}})
+
+    assert find_regressions(current, baseline) == []
@@ -0,0 +1,24 @@
+from scripts.compile import code_fixer
+from scripts.util import llm_cache
+
+
+def test_resumed_batch_caches_fixes_of_same_named_scripts(tmp_path, monkeypatch):
+    cache = llm_cache.LLMCache(path=tmp_path / "cache.sqlite3")
+    monkeypatch.setattr(llm_cache, "_cache", cache)
+    failures = {}
+    for folder in ("a", "b"):
+        script = tmp_path / folder / "scene.py"
+        script.parent.mkdir()
+        script.write_text(f"print('{folder}')\n", encoding="utf-8")
+        failures[script] = f"NameError in {folder}"
+
+    def resumed_batch(requests, **kwargs):
+        # a resumed batch yields the stored results without consuming the request generator
+        return [(custom_id, f"fixed {custom_id}", None) for custom_id in code_fixer.file_ids(failures)]
+
+    monkeypatch.setattr(code_fixer, "run_batch", resumed_batch)
+    code_fixer.fix_batch(failures, tmp_path / "out")
+
+    written = sorted(path.name for path in (tmp_path / "out").glob("*.py"))
+    assert len(written) == 2 and all(name.startswith("scene_") for name in written)
+    assert cache.stats()["entries"] == 2
@@ -0,0 +1,30 @@
+import threading
+
+from scripts.compile.collector import RenderCollector, iter_manifest
+
+
+def test_following_a_finished_manifest_ends(tmp_path):
+    collector = RenderCollector(tmp_path)
+    collector.register(tmp_path / "a.mp4", tmp_path / "a.py", "manim")
+    collector.close()
+
+    records = list(iter_manifest(collector.manifest_path, follow=True, poll_interval=0.01))
+
+    assert [record["video"] for record in records] == [str((tmp_path / "a.mp4").resolve())]
+
+
+def test_follower_waits_for_the_running_render(tmp_path):
+    RenderCollector(tmp_path).close()  # an earlier, finished run
+    collector = RenderCollector(tmp_path)
+    collector.register(tmp_path / "a.mp4", tmp_path / "a.py", "manim")
+
+    def finish():
+        collector.register(tmp_path / "b.mp4", tmp_path / "b.py", "manim")
+        collector.close()
+
+    timer = threading.Timer(0.2, finish)
+    timer.start()
+    records = list(iter_manifest(collector.manifest_path, follow=True, poll_interval=0.01))
+    timer.join()
+
+    assert [record["video"].rsplit("/", 1)[-1] for record in records] == ["a.mp4", "b.mp4"]
@@ -0,0 +1,34 @@
+import pytest
+
+from scripts.compile.compile_matplotlib import probe_matplot_script
+
+pytest.importorskip("matplotlib")
+
+CLASS_BASED = '''"""Grows a line."""
+from __future__ import annotations
+
+import matplotlib.pyplot as plt
+from matplotlib.animation import FuncAnimation
+
+
+class Growth:
+    def __init__(self):
+        self.fig, self.ax = plt.subplots()
+        (self.line,) = self.ax.plot([], [])
+        self.anim = FuncAnimation(self.fig, self.update, frames=50)
+
+    def update(self, i):
+        self.line.set_data(range(i), range(i))
+        return (self.line,)
+
+
+Growth().anim.save("growth.mp4", fps=10)
+'''
+
+
+def test_probe_passes_class_based_script_with_future_import(tmp_path):
+    script = tmp_path / "growth.py"
+    script.write_text(CLASS_BASED, encoding="utf-8")
+
+    assert probe_matplot_script(script, tmp_path / "growth_probe.py") is None
+    assert not (tmp_path / "growth.mp4").exists()
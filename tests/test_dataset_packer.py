@@ -0,0 +1,11 @@
+from scripts.dataset_packer import saved_keyframes
+
+
+def test_saved_keyframes_match_only_the_sample(tmp_path):
+    for name in ["example_3_first.jpg", "example_3_frame12.jpg", "example_3_frame2.jpg", "example_3_last.jpg",
+                 "example_3_frameX.jpg", "example_3_1_first.jpg", "example_3_1_frame4.jpg"]:
+        (tmp_path / name).touch()
+
+    names = [path.rsplit("/", 1)[-1] for path in saved_keyframes(str(tmp_path), "example_3")]
+
+    assert names == ["example_3_first.jpg", "example_3_frame2.jpg", "example_3_frame12.jpg", "example_3_last.jpg"]
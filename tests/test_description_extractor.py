@@ -0,0 +1,65 @@
+import json
+from types import SimpleNamespace
+
+from scripts import description_extractor
+from scripts.util.batch_jobs import BatchManifest
+
+
+class FakeIndex:
+    def __init__(self):
+        self.failed = set()
+
+    def resolve_described(self, custom_id):
+        return custom_id
+
+    def resolve_failed(self, custom_id):
+        self.failed.add(custom_id)
+
+
+def finished_batch(tmp_path, status, results, custom_ids, errors=None):
+    input_path = tmp_path / "input.jsonl"
+    input_path.write_text("".join(json.dumps({"custom_id": custom_id, "body": {}}) + "\n"
+                                  for custom_id in custom_ids), encoding="utf-8")
+    manifest = BatchManifest(tmp_path / "batches.jsonl")
+    manifest.record("batch_1", input=str(input_path), requests=len(custom_ids), status=status)
+    batch = SimpleNamespace(id="batch_1", status=status, errors=SimpleNamespace(data=errors or []))
+    return batch, manifest, results
+
+
+def run_ingest(tmp_path, monkeypatch, batch, manifest, results):
+    submitted = []
+    monkeypatch.setattr(description_extractor, "iter_batch_entries", lambda batch, work_dir: iter(results))
+    monkeypatch.setattr(description_extractor, "submit_shard",
+                        lambda path, requests, manifest, metadata=None: submitted.append(path) or "batch_2")
+    index = FakeIndex()
+    description_extractor.ingest_batch(batch, str(tmp_path), manifest, index, {})
+    return index, submitted
+
+
+def test_failed_validation_is_not_resubmitted(tmp_path, monkeypatch):
+    error = SimpleNamespace(line=1, message="Invalid model", code="invalid_request")
+    batch, manifest, results = finished_batch(tmp_path, "failed", [], ["a", "b"], errors=[error])
+
+    index, submitted = run_ingest(tmp_path, monkeypatch, batch, manifest, results)
+
+    assert submitted == []
+    assert index.failed == {"a", "b"}
+    assert manifest.batches()["batch_1"]["errors"] == ["line 1: Invalid model"]
+
+
+def test_only_retryable_requests_are_resubmitted(tmp_path, monkeypatch):
+    results = [
+        {"custom_id": "ok", "response": {"status_code": 200, "body": {
+            "output": [{"content": [{"type": "output_text", "text": "A circle grows."}]}]}}},
+        {"custom_id": "limited", "response": {"status_code": 429, "body": {}}},
+        {"custom_id": "invalid", "response": {"status_code": 400, "body": {}}},
+    ]
+    batch, manifest, results = finished_batch(tmp_path, "expired", results,
+                                              ["ok", "limited", "invalid", "missing"])
+
+    index, submitted = run_ingest(tmp_path, monkeypatch, batch, manifest, results)
+
+    assert index.failed == {"invalid"}
+    resubmitted = {json.loads(line)["custom_id"] for path in submitted
+                   for line in open(path, encoding="utf-8")}
+    assert resubmitted == {"limited", "missing"}
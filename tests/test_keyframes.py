@@ -0,0 +1,49 @@
+import cv2
+import numpy as np
+
+from scripts.util import keyframes
+from scripts.util.keyframes import sample_keyframes
+
+
+def write_video(path, frames):
+    height, width = frames[0].shape[:2]
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), 15, (width, height))
+    for frame in frames:
+        writer.write(frame)
+    writer.release()
+
+
+def test_single_frame_video_gives_first_and_last(tmp_path):
+    rng = np.random.default_rng(0)
+    path = tmp_path / "one.avi"
+    write_video(path, [rng.integers(0, 256, (64, 64, 3), dtype=np.uint8)])
+
+    frames = sample_keyframes(str(path), count=2)
+
+    assert [index for index, _ in frames] == [0, 0]
+
+
+def numbered_frames(count, blank=()):
+    rng = np.random.default_rng(1)
+    return [np.zeros((64, 64, 3), dtype=np.uint8) if i in blank
+            else rng.integers(0, 256, (64, 64, 3), dtype=np.uint8) for i in range(count)]
+
+
+def test_unknown_frame_count_still_gives_middle_frames(tmp_path, monkeypatch):
+    path = tmp_path / "stream.avi"
+    write_video(path, numbered_frames(40))
+    monkeypatch.setattr(keyframes, "frame_count", lambda video_path: 0)
+
+    indices = [index for index, _ in sample_keyframes(str(path), count=3)]
+
+    assert len(indices) == 5 and indices[0] == 0 and indices[-1] == 39
+    assert indices == sorted(set(indices))
+
+
+def test_blank_target_moves_to_next_frame(tmp_path):
+    path = tmp_path / "fade.avi"
+    write_video(path, numbered_frames(20, blank={10, 11}))
+
+    indices = [index for index, _ in sample_keyframes(str(path), count=1)]
+
+    assert indices == [0, 12, 19]
@@ -0,0 +1,37 @@
+import random
+import sqlite3
+import string
+
+from scripts.util.llm_cache import LLMCache
+
+
+def table_size(path):
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+
+def test_running_total_follows_puts_and_evictions(tmp_path):
+    path = tmp_path / "cache.sqlite3"
+    cache = LLMCache(path=path, max_bytes=10_000)
+    for i in range(50):
+        cache.put(f"key{i}", "".join(random.Random(i).choices(string.ascii_letters, k=1000)))
+    cache.put("key49", "short")
+
+    stats = cache.stats()
+    assert stats["bytes"] == table_size(path)
+    assert 0 < stats["bytes"] <= 10_000
+    assert cache.get("key0") is None
+    assert cache.get("key49") == "short"
+
+
+def test_total_of_cache_without_meta_table(tmp_path):
+    path = tmp_path / "cache.sqlite3"
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE responses (key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, "
+                     "created REAL NOT NULL, last_access REAL NOT NULL)")
+        conn.execute("INSERT INTO responses VALUES ('old', x'00', 123, 0, 0)")
+
+    cache = LLMCache(path=path)
+    cache.put("new", "text")
+
+    assert cache.stats()["bytes"] == table_size(path) > 123
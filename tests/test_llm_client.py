@@ -0,0 +1,64 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import openai
+
+from scripts.util.llm_client import AdaptiveLimiter, LLMClient, TokenBucket
+
+
+def test_token_bucket_waits_for_refill():
+    async def drain():
+        bucket = TokenBucket(per_minute=600)  # 10 per second
+        await bucket.acquire(600)
+        start = time.monotonic()
+        await bucket.acquire(2)
+        return time.monotonic() - start
+
+    assert 0.1 <= asyncio.run(drain()) < 1
+
+
+def test_adaptive_limiter_bounds_concurrency_and_halves_on_throttle():
+    async def run():
+        limiter = AdaptiveLimiter(max_limit=4)
+        peak = active = 0
+
+        async def job():
+            nonlocal peak, active
+            async with limiter:
+                active += 1
+                peak = max(peak, active)
+                await asyncio.sleep(0.01)
+                active -= 1
+
+        await asyncio.gather(*(job() for _ in range(12)))
+        await limiter.on_throttle()
+        return peak, limiter.limit
+
+    assert asyncio.run(run()) == (4, 2)
+
+
+class FlakyResponses:
+    """Answers with a 429 first, then succeeds."""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def create(self, **request):
+        self.calls += 1
+        if self.calls == 1:
+            response = SimpleNamespace(status_code=429, headers={"retry-after": "0.01"}, request=None)
+            raise openai.RateLimitError("Rate limit reached", response=response, body=None)
+        return SimpleNamespace(output_text="ok", usage=None)
+
+
+def test_rate_limited_request_is_retried():
+    client = LLMClient(max_concurrency=4, max_retries=2, api_key="test")
+    responses = FlakyResponses()
+    client._client = SimpleNamespace(responses=responses)
+
+    response = client.create(model="gpt-4.1", input="hi")
+
+    assert response.output_text == "ok"
+    assert responses.calls == 2
+    assert client._limiter.limit == 2
@@ -0,0 +1,36 @@
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from scripts.util.metrics import RUN_DIR_ENV, Metrics, metrics
+
+
+def count_in_worker(_):
+    metrics.incr("worker.tasks")
+    return os.getpid()
+
+
+def test_configure_twice_keeps_one_writer_and_thread(tmp_path, monkeypatch):
+    monkeypatch.delenv(RUN_DIR_ENV, raising=False)
+    instance = Metrics()
+    instance.configure(tmp_path)
+    fd, thread = instance._log_fd, instance._snapshot_thread
+    instance.configure(tmp_path)
+
+    assert (instance._log_fd, instance._snapshot_thread) == (fd, thread)
+
+    instance.configure(tmp_path / "other")
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+    instance._stop.set()
+
+
+def test_pool_workers_write_their_snapshot_on_shutdown(tmp_path, monkeypatch):
+    monkeypatch.setenv(RUN_DIR_ENV, str(tmp_path))
+    context = multiprocessing.get_context("fork")
+    with ProcessPoolExecutor(max_workers=2, mp_context=context) as executor:
+        pids = set(executor.map(count_in_worker, range(8)))
+
+    snapshots = [json.loads((tmp_path / f"metrics_{pid}.json").read_text()) for pid in pids]
+    assert sum(s["counters"]["worker.tasks"] for s in snapshots) == 8
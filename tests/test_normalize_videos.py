@@ -0,0 +1,39 @@
+import errno
+import subprocess
+
+import pytest
+
+from scripts.compile import normalize_videos
+from scripts.compile.normalize_videos import VideoSpec, normalize_video
+
+
+def fake_ffmpeg(command, timeout=None):
+    with open(command[-1], "wb") as f:
+        f.write(b"partial")
+    return subprocess.CompletedProcess(command, 0, stdout="", stderr="")
+
+
+def test_missing_ffmpeg_is_a_value_error(tmp_path, monkeypatch):
+    src = tmp_path / "in.mp4"
+    src.write_bytes(b"video")
+
+    def missing(command, timeout=None):
+        raise FileNotFoundError(errno.ENOENT, "No such file or directory", command[0])
+
+    monkeypatch.setattr(normalize_videos, "run_captured", missing)
+    with pytest.raises(ValueError):
+        normalize_video(src, tmp_path / "out" / "in.mp4", VideoSpec())
+
+
+def test_full_disk_leaves_no_part_file(tmp_path, monkeypatch):
+    src = tmp_path / "in.mp4"
+    src.write_bytes(b"video")
+
+    def full_disk(source, target):
+        raise OSError(errno.ENOSPC, "No space left on device")
+
+    monkeypatch.setattr(normalize_videos, "run_captured", fake_ffmpeg)
+    monkeypatch.setattr(normalize_videos.os, "replace", full_disk)
+    with pytest.raises(ValueError):
+        normalize_video(src, tmp_path / "out" / "in.mp4", VideoSpec())
+    assert list((tmp_path / "out").iterdir()) == []
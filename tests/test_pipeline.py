@@ -0,0 +1,46 @@
+import threading
+
+from scripts.pipeline import Pipeline, Stage
+
+
+def run_with_timeout(pipeline, timeout=10):
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(counts=pipeline.run()), daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "pipeline did not finish"
+    return result["counts"]
+
+
+def test_multi_worker_stages_finish_and_drop_failed_items():
+    collected = []
+    lock = threading.Lock()
+
+    def square(n):
+        if n == 5:
+            raise ValueError("bad item")
+        return [n * n]
+
+    def collect(n):
+        with lock:
+            collected.append(n)
+        return ()
+
+    pipeline = Pipeline(range(20), [Stage("square", square, workers=3, queue_size=2),
+                                    Stage("collect", collect, workers=2, queue_size=2)], status_interval=60)
+    counts = run_with_timeout(pipeline)
+
+    assert sorted(collected) == [n * n for n in range(20) if n != 5]
+    assert (counts["square"]["in"], counts["square"]["out"], counts["square"]["failed"]) == (20, 19, 1)
+    assert counts["collect"]["in"] == 19
+
+
+def test_failing_source_still_ends_the_pipeline():
+    def source():
+        yield from range(3)
+        raise OSError("corpus unreadable")
+
+    pipeline = Pipeline(source(), [Stage("pass", lambda n: [n], workers=2)], status_interval=60)
+    counts = run_with_timeout(pipeline)
+
+    assert counts["pass"]["out"] == 3
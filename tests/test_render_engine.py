@@ -0,0 +1,32 @@
+from types import SimpleNamespace
+
+from scripts.compile import compile_manim
+from scripts.compile.render_engine import ManimBackend, RenderEngine, RenderPolicy
+
+SCRIPT = """from manim import *
+
+
+class Broken(Scene):
+    def construct(self):
+        self.play(Create(Circle()))
+"""
+
+
+def failing_manim(command, timeout=None, env=None, **kwargs):
+    return SimpleNamespace(returncode=1, stdout="", stderr="NameError: name 'Circle' is not defined")
+
+
+def test_manim_failure_writes_one_error_log(tmp_path, monkeypatch):
+    monkeypatch.setenv("RENDER_SCRATCH_DIR", str(tmp_path / "scratch"))
+    monkeypatch.setattr(compile_manim, "run_captured", failing_manim)
+    script = tmp_path / "example_1.py"
+    script.write_text(SCRIPT, encoding="utf-8")
+    err_dir = tmp_path / "err"
+    policy = RenderPolicy(fix_attempts=0, rule_fixes=False, install_dependencies=False)
+    engine = RenderEngine(ManimBackend(), tmp_path / "rendered", err_dir, policy=policy, workers=1, fixer=None)
+
+    results = engine.render_file(script)
+    engine.collector.close()
+
+    assert [result.error for result in results] == ["NameError: name 'Circle' is not defined"]
+    assert [path.name for path in err_dir.iterdir()] == ["example_1_Broken.txt"]
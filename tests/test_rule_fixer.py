@@ -0,0 +1,37 @@
+from scripts.compile.rule_fixer import find_rule_fix
+
+FADES = """from manim import *
+
+
+class Intro(Scene):
+    def construct(self):
+        title = TextMobject("Hi")
+        self.play(FadeInFrom(title, LEFT, run_time=2))
+        self.play(FadeInFromDown(title))
+        self.play(FadeOutAndShift(title, direction=UP + RIGHT))
+"""
+
+
+def test_directional_fades_become_shift():
+    rule, fixed = find_rule_fix(FADES, "NameError: name 'FadeInFrom' is not defined")
+
+    assert rule == "renamed_manim_api"
+    assert 'title = Text("Hi")' in fixed
+    assert "FadeIn(title, shift=-LEFT, run_time=2)" in fixed
+    assert "FadeIn(title, shift=-DOWN)" in fixed
+    assert "FadeOut(title, shift=UP + RIGHT)" in fixed
+
+
+def test_changed_animations_are_left_to_the_llm():
+    code = "from manim import *\nself.play(ShowCreationThenDestruction(line))\n"
+    assert find_rule_fix(code, "NameError: name 'ShowCreationThenDestruction' is not defined") is None
+
+
+def test_fork_rule_only_claims_fork_errors():
+    code = "from manimlib.imports import *\n\n\nclass A(Scene):\n    pass\n"
+    assert find_rule_fix(code, "AttributeError: 'Circle' object has no attribute 'foo'") is None
+    rule, fixed = find_rule_fix(code, "ModuleNotFoundError: No module named 'manimlib.imports'")
+    assert rule == "manim_fork_imports"
+    assert fixed.startswith("from manim import *\n")
+    rule, _ = find_rule_fix(code, 'File "/usr/lib/python3/site-packages/manimlib/scene/scene.py", line 3\nNameError')
+    assert rule == "manim_fork_imports"
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from scripts.video_dedup import HammingIndex, find_duplicates
+
+
+def flip_bits(fingerprint, bits):
+    data = bytearray(bytes.fromhex(fingerprint))
+    for bit in bits:
+        data[bit // 8] ^= 1 << (bit % 8)
+    return data.hex()
+
+
+def random_fingerprint(rng):
+    return rng.integers(0, 256, 32, dtype=np.uint8).tobytes().hex()  # 4 frames x 64 bits
+
+
+def test_near_pair_is_found_and_far_pair_is_not():
+    rng = np.random.default_rng(0)
+    original, other = random_fingerprint(rng), random_fingerprint(rng)
+    fingerprints = [
+        ("a.mp4", original),
+        ("b.mp4", other),
+        ("a_copy.mp4", flip_bits(original, [3, 70, 200])),
+        ("a_far.mp4", flip_bits(original, range(0, 256, 16))),  # 16 bits apart
+    ]
+
+    assert find_duplicates(fingerprints, threshold=8) == {"a_copy.mp4": "a.mp4"}
+
+
+def test_chained_duplicates_keep_the_first_video():
+    rng = np.random.default_rng(1)
+    base = random_fingerprint(rng)
+    middle = flip_bits(base, range(6))
+    last = flip_bits(middle, range(100, 106))  # 12 bits from base, 6 from middle
+
+    duplicates = find_duplicates([("1.mp4", base), ("2.mp4", middle), ("3.mp4", last)], threshold=8)
+
+    assert duplicates == {"2.mp4": "1.mp4", "3.mp4": "1.mp4"}
+
+
+def test_index_matches_brute_force():
+    rng = np.random.default_rng(2)
+    codes = rng.integers(0, 2 ** 63, (200, 4), dtype=np.uint64)
+    for i in range(0, 200, 10):
+        codes[i + 1] = codes[i] ^ np.uint64(0b1011)  # plant a pair 3 bits apart
+    index = HammingIndex(codes, threshold=6)
+    distances = np.bitwise_count(codes[:, None, :] ^ codes[None, :, :]).sum(axis=2)
+
+    for i in range(len(codes)):
+        expected = {int(j) for j in np.flatnonzero(distances[i] <= 6) if j != i}
+        assert {j for j, _ in index.query(i)} == expected
+
+
+def test_threshold_too_large_for_code_length():
+    with pytest.raises(ValueError):
+        HammingIndex(np.zeros((2, 1), dtype=np.uint64), threshold=8)